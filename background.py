@@ -0,0 +1,119 @@
+import time
+import tkinter as tk
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageTk
+
+
+class BackgroundResizer:
+    """
+    Keeps a label's background image sized to its window.
+
+    Configure events are debounced, events that don't change the window size
+    (moves, child widget geometry changes) are ignored and the LANCZOS
+    resampling runs on a worker thread. Only the PhotoImage creation happens
+    on the Tk main thread, as Tk needs, once per size: the PhotoImages of
+    recent sizes are kept in a small LRU, so going back to one of them is
+    just a label update.
+    Time spent in Tk-side handlers and in resampling is recorded, see stats().
+    """
+
+    def __init__(self, root, label, image, delay_ms=80, cache_size=8, poll_ms=15):
+        self.root = root
+        self.label = label
+        self.image = image
+        self.delay_ms = delay_ms
+        self.cache_size = cache_size
+        self.poll_ms = poll_ms
+        self.counts = {"events": 0, "ignored": 0, "renders": 0, "cache_hits": 0}
+        # seconds spent per Tk-side handler call and per resample
+        self.frame_times = deque(maxlen=1000)
+        self.resample_times = deque(maxlen=1000)
+        self._size = None
+        self._pending = None
+        self._cache = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def on_configure(self, event):
+        start = time.perf_counter()
+        self.counts["events"] += 1
+        size = (event.width, event.height)
+        if event.widget is not self.root or size == self._size or min(size) < 1:
+            self.counts["ignored"] += 1
+        else:
+            self._size = size
+            # restart the debounce timer, only the last size of a burst renders
+            if self._pending is not None:
+                self.root.after_cancel(self._pending)
+            self._pending = self.root.after(self.delay_ms, self._render)
+        self.frame_times.append(time.perf_counter() - start)
+
+    def _render(self):
+        self._pending = None
+        size = self._size
+        photo = self._cache.get(size)
+        if photo is not None:
+            self.counts["cache_hits"] += 1
+            self._cache.move_to_end(size)
+            self._show(photo)
+            return
+        future = self._executor.submit(self._resample, size)
+        self.root.after(self.poll_ms, self._poll, future, size)
+
+    def _resample(self, size):
+        # runs on the worker thread, PIL releases the GIL while resampling
+        start = time.perf_counter()
+        image = self.image.resize(size, Image.Resampling.LANCZOS)
+        self.resample_times.append(time.perf_counter() - start)
+        return image
+
+    def _poll(self, future, size):
+        if not future.done():
+            self.root.after(self.poll_ms, self._poll, future, size)
+            return
+        start = time.perf_counter()
+        photo = ImageTk.PhotoImage(future.result())
+        self.frame_times.append(time.perf_counter() - start)
+        self._cache[size] = photo
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        # a newer size may have been requested while this one was resampled
+        if size == self._size:
+            self._show(photo)
+
+    def _show(self, photo):
+        start = time.perf_counter()
+        self.label.config(image=photo)
+        self.label.image = photo  # Keep a reference to avoid garbage collection
+        self.counts["renders"] += 1
+        self.frame_times.append(time.perf_counter() - start)
+
+    def stats(self):
+        """Counters plus median / 95th percentile / max timings in ms."""
+
+        def summary(times):
+            if not times:
+                return {"count": 0}
+            ordered = sorted(times)
+            return {
+                "count": len(ordered),
+                "p50_ms": ordered[len(ordered) // 2] * 1000,
+                "p95_ms": ordered[int(len(ordered) * 0.95)] * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+
+        return {
+            **self.counts,
+            "frame": summary(self.frame_times),
+            "resample": summary(self.resample_times),
+        }
+
+    def close(self):
+        if self._pending is not None:
+            try:
+                self.root.after_cancel(self._pending)
+            except tk.TclError:
+                pass  # the window is already gone
+            self._pending = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
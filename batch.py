@@ -0,0 +1,197 @@
+"""
+Generate meal plans for every profile in a user_data.csv style file.
+
+    python batch.py user_data.csv -o plans.csv [--db dietify.db]
+
+Users are grouped by their filter key (diet type, preference, health
+condition, goal), so each distinct key is only evaluated once however many
+users share it. With --db, the profiles and plans are also bulk upserted
+into the profile store (see profile_store.py), keyed by the "User ID"
+column the file must then have.
+"""
+import argparse
+import csv
+import json
+import sys
+
+from catalog import get_catalog
+from engine import MEALS, filter_key, recommend
+from profile_store import ProfileStore
+
+
+def read_profiles(path):
+    """Stream the rows of a user_data.csv style file as dicts."""
+    with open(path, newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def profile_filter_key(row):
+    return filter_key(
+        row.get("Diet Type"),
+        row.get("Diet Preference"),
+        row.get("Health Condition"),
+        row.get("Fitness Goal"),
+    )
+
+
+def recommend_batch(rows, catalog=None, stats=None):
+    """
+    Yield (row, meal_plan) for each profile row, in input order. Rows with
+    a diet type, preference, condition or goal that isn't known are skipped.
+    Rows sharing a filter key share one meal plan object, so treat the
+    plans as read-only.
+    :param rows: Iterable of user_data.csv style dicts.
+    :param stats: Optional dict, filled with "users", "unique_keys" and
+        "skipped" counts, and "first_skipped" (line, message) if any.
+    """
+    if catalog is None:
+        catalog = get_catalog()
+    plans = {}
+    users = skipped = 0
+    first_skipped = None
+    for line, row in enumerate(rows, start=2):
+        try:
+            key = profile_filter_key(row)
+        except ValueError as e:
+            skipped += 1
+            if first_skipped is None:
+                first_skipped = (line, str(e))
+            continue
+        meal_plan = plans.get(key)
+        if meal_plan is None:
+            diet_type, diet_preference, health_condition, diet_goal = key
+            meal_plan = plans[key] = recommend(
+                diet_type=diet_type,
+                diet_preference=diet_preference,
+                health_condition=health_condition,
+                diet_goal=diet_goal,
+                catalog=catalog,
+            )
+        users += 1
+        yield row, meal_plan
+    if stats is not None:
+        stats["users"] = users
+        stats["unique_keys"] = len(plans)
+        stats["skipped"] = skipped
+        if first_skipped is not None:
+            stats["first_skipped"] = first_skipped
+
+
+# user_data.csv column -> profile store field
+PROFILE_COLUMNS = {
+    "Age": "age",
+    "Height (cm)": "height",
+    "Weight (kg)": "weight",
+    "BMI": "bmi",
+    "Diet Type": "diet_type",
+    "Diet Preference": "diet_preference",
+    "Health Condition": "health_condition",
+    "Fitness Goal": "diet_goal",
+}
+ID_COLUMN = "User ID"
+SAVE_BATCH_ROWS = 10_000
+
+
+def stored_profile(row):
+    """Profile store dict for a row, None when the row has no user id."""
+    user_id = (row.get(ID_COLUMN) or "").strip()
+    if not user_id:
+        return None
+    profile = {field: row.get(column) or None for column, field in PROFILE_COLUMNS.items()}
+    profile["user_id"] = user_id
+    return profile
+
+
+def save_results(results, store, stats=None):
+    """
+    Pass `results` through, saving them to `store` in batched transactions.
+    :param stats: Optional dict, filled with the "unsaved" count of rows
+        without a user id.
+    """
+    batch = []
+    unsaved = 0
+    for row, meal_plan in results:
+        profile = stored_profile(row)
+        if profile is None:
+            unsaved += 1
+            yield row, meal_plan
+            continue
+        batch.append((profile, meal_plan))
+        if len(batch) >= SAVE_BATCH_ROWS:
+            store.save(batch)
+            batch = []
+        yield row, meal_plan
+    if batch:
+        store.save(batch)
+    if stats is not None:
+        stats["unsaved"] = unsaved
+
+
+def write_csv(results, out):
+    writer = None
+    for row, meal_plan in results:
+        if writer is None:
+            fieldnames = list(row) + [meal.capitalize() for meal in MEALS]
+            writer = csv.DictWriter(out, fieldnames=fieldnames)
+            writer.writeheader()
+        writer.writerow(
+            {
+                **row,
+                **{meal.capitalize(): "; ".join(meal_plan[meal]) for meal in MEALS},
+            }
+        )
+
+
+def write_jsonl(results, out):
+    for row, meal_plan in results:
+        out.write(json.dumps({"profile": row, "meal_plan": meal_plan}) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("users", help="user_data.csv style input file")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--catalog", help="food catalog csv (default: food_data.csv)")
+    parser.add_argument("--db", help="profile store to save the profiles and plans to")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        # line numbers aren't stable across files, so stored users need ids
+        with open(args.users, newline="") as f:
+            header = next(csv.reader(f), [])
+        if ID_COLUMN not in header:
+            parser.error(f"--db needs a {ID_COLUMN!r} column to key the stored profiles")
+
+    catalog = get_catalog(args.catalog) if args.catalog else get_catalog()
+    stats = {}
+    results = recommend_batch(read_profiles(args.users), catalog, stats)
+    store = ProfileStore(args.db) if args.db else None
+    if store is not None:
+        results = save_results(results, store, stats)
+    write = write_csv if args.format == "csv" else write_jsonl
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        write(results, out)
+    finally:
+        if args.output:
+            out.close()
+        if store is not None:
+            store.close()
+    print(
+        f"{stats['users']} users, {stats['unique_keys']} unique filter keys",
+        file=sys.stderr,
+    )
+    if stats.get("skipped"):
+        line, message = stats["first_skipped"]
+        print(
+            f"{stats['skipped']} rows with unknown values skipped, first on line {line}: {message}",
+            file=sys.stderr,
+        )
+    if stats.get("unsaved"):
+        print(f"{stats['unsaved']} rows without a {ID_COLUMN} not saved", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
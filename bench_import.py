@@ -0,0 +1,69 @@
+"""
+Check the import-time budget of the recommendation path.
+
+    python bench_import.py [--budget-ms 250] [--repeat 5]
+
+Each module is imported in a fresh interpreter. The check fails (exit
+status 1) when the median import time is over budget, or when the module
+pulls in a GUI or pandas import that only the csv fallback should need.
+tests/test_import_budget.py runs the same check with the test suite.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# modules that must stay importable without the GUI stack or pandas
+ENGINE_MODULES = ["engine", "batch", "catalog", "ranking", "rules"]
+FORBIDDEN_IMPORTS = ["pandas", "PIL", "tkinter", "PyQt6"]
+BUDGET_MS = 250.0  # median import time per module, checked by tests/test_import_budget.py
+
+IMPORT_SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {here!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "forbidden": [name for name in {forbidden!r} if name in sys.modules],
+}}))
+"""
+
+
+def time_import(module):
+    snippet = IMPORT_SNIPPET.format(here=HERE, module=module, forbidden=FORBIDDEN_IMPORTS)
+    output = subprocess.run(
+        [sys.executable, "-c", snippet], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the engine import-time budget")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in ENGINE_MODULES:
+        runs = [time_import(module) for _ in range(args.repeat)]
+        median_ms = statistics.median(run["seconds"] for run in runs) * 1000
+        forbidden = sorted({name for run in runs for name in run["forbidden"]})
+        status = "ok"
+        if median_ms > args.budget_ms:
+            status = f"over budget ({args.budget_ms:.0f} ms)"
+        if forbidden:
+            status = "imports " + ", ".join(forbidden)
+        failed = failed or status != "ok"
+        print(f"{module:>8}: median {median_ms:.1f} ms  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
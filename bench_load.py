@@ -0,0 +1,81 @@
+"""
+Compare cold-start catalog load times: csv parsing vs the binary store.
+
+    python bench_load.py --rows 100000 --repeat 5
+
+Each load runs in a fresh interpreter so nothing is cached in-process.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+from catalog import DEFAULT_PATH
+from catalog_store import convert
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+LOAD_SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {here!r})
+from catalog import FoodCatalog
+start = time.perf_counter()
+catalog = FoodCatalog({csv!r}, store_path={store!r}, use_store={use_store!r}).refresh()
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "rows": len(catalog), "from": catalog.loaded_from}}))
+"""
+
+
+def make_catalog(rows, path):
+    """Write a catalog of `rows` rows by repeating food_data.csv with renamed items."""
+    base = pd.read_csv(DEFAULT_PATH)
+    copies = -(-rows // len(base))
+    frame = pd.concat([base] * copies, ignore_index=True).iloc[:rows]
+    frame["Food_items"] = frame["Food_items"] + " #" + frame.index.astype(str)
+    frame.to_csv(path, index=False)
+
+
+def time_load(csv_path, store_path, use_store):
+    snippet = LOAD_SNIPPET.format(
+        here=HERE, csv=csv_path, store=store_path, use_store=use_store
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", snippet], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark catalog load times")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "food_data.csv")
+        store_path = os.path.join(tmp, "food_data.dietcat")
+        make_catalog(args.rows, csv_path)
+        convert(csv_path, store_path)
+        print(
+            f"{args.rows} rows: csv {os.path.getsize(csv_path)} bytes, "
+            f"store {os.path.getsize(store_path)} bytes"
+        )
+        for label, use_store in [("csv", False), ("store", True)]:
+            times = [
+                time_load(csv_path, store_path, use_store)["seconds"]
+                for _ in range(args.repeat)
+            ]
+            print(
+                f"{label:>5}: median {statistics.median(times) * 1000:.1f} ms, "
+                f"min {min(times) * 1000:.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Solve-time benchmark for the meal plan optimizer.
+
+    python bench_optimizer.py [--repeat 20]
+
+Times optimize_meal() on random candidate pools of growing size, then full
+optimized recommendations against the plain top-k ones on synthetic
+catalogs.
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+import engine
+from meal_optimizer import optimize_meal
+from synthetic import synthetic_catalog
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, max(times) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the meal plan optimizer")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    print("optimize_meal (k=4)")
+    for pool_size in [10, 20, 40, 80, 160]:
+        for target in [200, 600, 1000]:
+            calories = rng.uniform(20, 600, pool_size)
+            values = rng.uniform(0, 40, pool_size)
+            median, worst = timed(
+                lambda: optimize_meal(calories, values, target, 4), args.repeat
+            )
+            print(
+                f"  pool {pool_size:>4}, target {target:>4} kcal: "
+                f"median {median:.2f} ms, max {worst:.2f} ms"
+            )
+
+    print("recommend, top-k vs optimized (Healthy, High-Protein)")
+    profile = {
+        "age": 30,
+        "height": 175,
+        "weight": 70,
+        "diet_goal": "Healthy",
+        "diet_preference": "High-Protein",
+        "use_cache": False,
+    }
+    for rows in args.sizes:
+        catalog = synthetic_catalog(rows)
+        plain, _ = timed(lambda: engine.recommend(catalog=catalog, **profile), args.repeat)
+        optimized, worst = timed(
+            lambda: engine.recommend(catalog=catalog, optimize=True, **profile),
+            args.repeat,
+        )
+        print(
+            f"  {rows:>9} rows: top-k {plain:.2f} ms, "
+            f"optimized {optimized:.2f} ms (max {worst:.2f} ms)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Stage-by-stage benchmark of the recommendation pipeline.
+
+    python bench_pipeline.py [--sizes 100 10000 1000000] [-o results.json]
+    python bench_pipeline.py --compare old.json new.json
+
+For each catalog size a synthetic catalog (see synthetic.py, so Meal Type
+and Category keep food_data.csv's distributions) is written to a binary
+store, then loaded and run through every combination of diet type,
+preference, health condition and goal. The steps of engine.build_plan()
+are timed separately:
+
+- load: opening the store, including the per-row rule bits
+- load_csv: parsing the same catalog as csv (up to --csv-max-rows)
+- diet_type_filter, condition_filter, goal_filter: the three masks
+- meal_split: the filtered rows of each meal
+- sort: the ranking keys and top-k of each meal
+- meal_selection: looking up the chosen food names
+
+Each stage is summarized over all combinations (median, p95, max and
+total), and the results go to a JSON file together with the machine and
+library versions. --compare prints the change per stage between two files.
+Runs are reproducible for a given --seed.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from catalog import MEAL_BITS, FoodCatalog
+from catalog_store import write_store
+from engine import (
+    DIET_PREFERENCES,
+    DIET_TYPES,
+    ITEMS_PER_MEAL,
+    MEALS,
+    build_plan,
+    diet_goals,
+    filter_key,
+    health_conditions,
+)
+from ranking import sort_keys, top_k
+from synthetic import synthetic_data
+
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+STAGES = [
+    "diet_type_filter",
+    "condition_filter",
+    "goal_filter",
+    "meal_split",
+    "sort",
+    "meal_selection",
+]
+
+
+def summary(times):
+    times = np.asarray(times) * 1000
+    return {
+        "count": len(times),
+        "p50_ms": float(np.median(times)),
+        "p95_ms": float(np.percentile(times, 95)),
+        "max_ms": float(times.max()),
+        "total_ms": float(times.sum()),
+    }
+
+
+def timed_plan(catalog, key):
+    """The steps of engine.build_plan(), returning (meal_plan, stage times)."""
+    diet_type, diet_preference, health_conditions, diet_goal = key
+    times = {}
+
+    start = time.perf_counter()
+    if diet_type != "All":
+        mask = catalog.category_mask(diet_type)
+    else:
+        mask = np.ones(len(catalog), dtype=bool)
+    times["diet_type_filter"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    catalog.rule_mask([("condition", condition) for condition in health_conditions], out=mask)
+    times["condition_filter"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    catalog.rule_mask([("goal", diet_goal)], out=mask)
+    rows = np.flatnonzero(mask)
+    times["goal_filter"] = time.perf_counter() - start
+    if diet_goal == "None":
+        diet_preference = "None"
+
+    start = time.perf_counter()
+    meal_bits = catalog.meal_bits[rows]
+    in_meals = {meal: rows[(meal_bits & MEAL_BITS[meal]) != 0] for meal in MEALS}
+    times["meal_split"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    best = {
+        meal: top_k(in_meal, sort_keys(catalog.columns, in_meal, diet_preference), ITEMS_PER_MEAL)
+        for meal, in_meal in in_meals.items()
+    }
+    times["sort"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    meal_plan = {meal: catalog.names[rows].tolist() for meal, rows in best.items()}
+    times["meal_selection"] = time.perf_counter() - start
+    return meal_plan, times
+
+
+def time_csv_load(catalog, directory):
+    path = os.path.join(directory, "catalog.csv")
+    catalog.frame.to_csv(path, index=False)
+    start = time.perf_counter()
+    FoodCatalog(path, use_store=False).refresh()
+    return time.perf_counter() - start
+
+
+def bench_size(rows, args, combos):
+    data = synthetic_data(rows, seed=args.seed)
+    result = {"rows": rows, "combinations": len(combos), "repeat": args.repeat}
+    with tempfile.TemporaryDirectory() as directory:
+        store_path = os.path.join(directory, "catalog.dietcat")
+        write_store(store_path, data, (0, 0))
+        del data
+        start = time.perf_counter()
+        catalog = FoodCatalog(store_path).refresh()
+        result["load"] = summary([time.perf_counter() - start])
+        if rows <= args.csv_max_rows:
+            result["load_csv"] = summary([time_csv_load(catalog, directory)])
+
+        stage_times = {stage: [] for stage in STAGES}
+        totals = []
+        for combo in combos:
+            key = filter_key(*combo)
+            # the timed steps must add up to the real thing
+            meal_plan, _ = timed_plan(catalog, key)
+            if meal_plan != build_plan(catalog, key):
+                raise AssertionError(f"timed plan differs from build_plan for {key}")
+            for _ in range(args.repeat):
+                _, times = timed_plan(catalog, key)
+                for stage, seconds in times.items():
+                    stage_times[stage].append(seconds)
+                totals.append(sum(times.values()))
+        result["stages"] = {stage: summary(times) for stage, times in stage_times.items()}
+        result["per_request"] = summary(totals)
+        del catalog
+    return result
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def print_result(result):
+    print(f"{result['rows']} rows ({result['combinations']} combinations)")
+    print(f"  {'load':<18} {result['load']['p50_ms']:10.2f} ms")
+    if "load_csv" in result:
+        print(f"  {'load_csv':<18} {result['load_csv']['p50_ms']:10.2f} ms")
+    for stage, stats in [*result["stages"].items(), ("per_request", result["per_request"])]:
+        print(
+            f"  {stage:<18} p50 {stats['p50_ms']:8.3f} ms  "
+            f"p95 {stats['p95_ms']:8.3f} ms  max {stats['max_ms']:8.3f} ms"
+        )
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {result["rows"]: result for result in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {result["rows"]: result for result in json.load(f)["results"]}
+    for rows in sorted(old.keys() & new.keys()):
+        print(f"{rows} rows (p50, old -> new)")
+        before, after = old[rows], new[rows]
+        names = ["load", "load_csv", *STAGES, "per_request"]
+        for name in names:
+            a = before["stages"].get(name, before.get(name))
+            b = after["stages"].get(name, after.get(name))
+            if a is None or b is None:
+                continue
+            change = (b["p50_ms"] / a["p50_ms"] - 1) * 100 if a["p50_ms"] else 0.0
+            print(
+                f"  {name:<18} {a['p50_ms']:9.3f} -> {b['p50_ms']:9.3f} ms ({change:+.0f}%)"
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per combination")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv-max-rows", type=int, default=100_000)
+    parser.add_argument("-o", "--output", help="JSON results file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    combos = list(
+        itertools.product(DIET_TYPES, DIET_PREFERENCES, health_conditions(), diet_goals())
+    )
+    results = []
+    for rows in args.sizes:
+        result = bench_size(rows, args, combos)
+        print_result(result)
+        results.append(result)
+
+    if args.output:
+        report = {"environment": environment(), "arguments": vars(args), "results": results}
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Per-week latency benchmark for the weekly planner.
+
+    python bench_weekly.py [--weeks 200] [--sizes 1000 100000 1000000]
+
+Builds a batch of weekly plans for profiles cycling through every filter
+combination, then times re-planning one day and swapping one item on them
+against building the whole week again.
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+from engine import DIET_PREFERENCES, DIET_TYPES, diet_goals, health_conditions
+from synthetic import synthetic_catalog
+from weekly_planner import weekly_plan
+
+
+def summary(times):
+    ordered = np.asarray(times) * 1000
+    return (
+        f"p50 {np.percentile(ordered, 50):.2f} ms, "
+        f"p95 {np.percentile(ordered, 95):.2f} ms, max {ordered.max():.2f} ms"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the weekly planner")
+    parser.add_argument("--weeks", type=int, default=200)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--optimize", action="store_true", help="use calorie targets")
+    args = parser.parse_args(argv)
+
+    combos = list(
+        itertools.product(DIET_TYPES, DIET_PREFERENCES, health_conditions(), diet_goals())
+    )
+    profiles = [
+        {
+            "diet_type": diet_type,
+            "diet_preference": diet_preference,
+            "health_condition": health_condition,
+            "diet_goal": diet_goal,
+            "age": 20 + i % 50,
+            "height": 150 + i % 40,
+            "weight": 50 + i % 45,
+            "optimize": args.optimize,
+        }
+        for i, (diet_type, diet_preference, health_condition, diet_goal) in enumerate(
+            combos[j % len(combos)] for j in range(args.weeks)
+        )
+    ]
+
+    for rows in args.sizes:
+        catalog = synthetic_catalog(rows)
+        planners, build_times = [], []
+        start_batch = time.perf_counter()
+        for profile in profiles:
+            start = time.perf_counter()
+            planners.append(weekly_plan(catalog=catalog, **profile))
+            build_times.append(time.perf_counter() - start)
+        batch = time.perf_counter() - start_batch
+
+        replan_times, swap_times = [], []
+        for i, planner in enumerate(planners):
+            start = time.perf_counter()
+            planner.replan_day(i % len(planner.days))
+            replan_times.append(time.perf_counter() - start)
+            meal = next((m for m, items in planner.days[0].items() if len(items)), None)
+            if meal is not None:
+                start = time.perf_counter()
+                planner.swap_item(0, meal, 0)
+                swap_times.append(time.perf_counter() - start)
+        repeats = sum(planner.repeats() for planner in planners)
+
+        print(f"{rows} rows, {args.weeks} weeks ({args.weeks / batch:.0f} weeks/s)")
+        print(f"  full week:  {summary(build_times)}")
+        print(f"  replan day: {summary(replan_times)}")
+        if swap_times:
+            print(f"  swap item:  {summary(swap_times)}")
+        print(f"  repeated items over all weeks: {repeats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,660 @@
+import copy
+import itertools
+import os
+import threading
+
+import numpy as np
+
+import instrument
+from catalog_store import STORE_SUFFIX, default_store_path, read_store, write_store
+from catalog_wal import CatalogLog, default_wal_path
+from rules import rule_bits
+
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "food_data.csv")
+
+NUTRIENT_COLUMNS = [
+    "Calories",
+    "Fats",
+    "Protein",
+    "Iron",
+    "Carbohydrates",
+    "Fibre",
+    "Sugar",
+    "Sodium",
+]
+
+# column order of food_data.csv, kept when edits are compacted into it
+CSV_COLUMNS = [
+    "Food_items",
+    "Category",
+    *NUTRIENT_COLUMNS[:-1],
+    "Meal Type",
+    "Sodium",
+]
+
+# logged edits after which the log is compacted into the base file
+COMPACT_AFTER = 500
+
+# dtypes used when parsing the catalog, so pandas doesn't have to guess them
+COLUMN_DTYPES = {
+    "Food_items": "string",
+    "Category": "category",
+    "Meal Type": "string",
+    **{column: "float32" for column in NUTRIENT_COLUMNS},
+}
+
+
+# one bit per meal in the "Meal Type" bitmask
+MEAL_BITS = {"breakfast": 1, "lunch": 2, "snack": 4, "dinner": 8}
+
+
+def meal_type_bits(meal_types):
+    """
+    Parse distinct "Lunch, Dinner" style Meal Type strings into uint8 bitmasks.
+    :return: Array with one bitmask per entry of `meal_types`, plus a trailing
+        0 so that the code -1 (missing value) maps to no meal.
+    """
+    unique_bits = np.zeros(len(meal_types) + 1, dtype=np.uint8)
+    for i, value in enumerate(meal_types):
+        for token in str(value).lower().split(","):
+            unique_bits[i] |= MEAL_BITS.get(token.strip(), 0)
+    return unique_bits
+
+
+def read_csv_columns(path):
+    """
+    Parse a catalog csv into the column arrays the catalog works on.
+    Meal Type is parsed once per distinct value, however many rows share it.
+    """
+    import pandas as pd  # only needed when parsing the csv
+
+    frame = pd.read_csv(path, dtype=COLUMN_DTYPES)
+    meal_type_codes, meal_types = pd.factorize(frame["Meal Type"])
+    return {
+        "names": frame["Food_items"].to_numpy(dtype=object),
+        "categories": [str(category) for category in frame["Category"].cat.categories],
+        "category_codes": frame["Category"].cat.codes.to_numpy(),
+        "meal_types": [str(meal_type) for meal_type in meal_types],
+        "meal_type_codes": meal_type_codes,
+        "meal_bits": meal_type_bits(meal_types)[meal_type_codes],
+        "columns": {column: frame[column].to_numpy() for column in NUTRIENT_COLUMNS},
+    }
+
+
+def to_frame(data):
+    """Column arrays (as read_csv_columns returns them) as a pandas DataFrame."""
+    import pandas as pd
+
+    names = data["names"]
+    if not isinstance(names, np.ndarray):
+        names = names.to_numpy()
+    # code -1 (missing) picks the trailing None
+    meal_types = np.array(data["meal_types"] + [None], dtype=object)
+    return pd.DataFrame(
+        {
+            "Food_items": pd.array(names, dtype="string"),
+            "Category": pd.Categorical.from_codes(data["category_codes"], data["categories"]),
+            **data["columns"],
+            "Meal Type": pd.array(meal_types[data["meal_type_codes"]], dtype="string"),
+        }
+    )
+
+
+def _nutrient(value):
+    return np.nan if value is None else value
+
+
+def _checked_item(item):
+    """A food dict for FoodCatalog.upsert() with its values checked and normalized."""
+    unknown = set(item) - set(CSV_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown column(s) {sorted(unknown)}")
+    name = item.get("Food_items")
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("Every item needs a Food_items name")
+    checked = {"Food_items": name.strip()}
+    for column in ("Category", "Meal Type"):
+        if column in item:
+            value = "" if item[column] is None else str(item[column]).strip()
+            checked[column] = value or None
+    for column in NUTRIENT_COLUMNS:
+        if column in item:
+            value = item[column]
+            if value is None or value == "":
+                checked[column] = None
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                value = np.nan
+            if not np.isfinite(value) or value < 0:
+                raise ValueError(f"{column} of {name!r} must be a non-negative number")
+            checked[column] = value
+    return checked
+
+
+_in_memory_ids = itertools.count(1)
+
+
+def _empty_data():
+    return {
+        "names": np.empty(0, dtype=object),
+        "categories": [],
+        "category_codes": np.empty(0, dtype=np.int16),
+        "meal_types": [],
+        "meal_type_codes": np.empty(0, dtype=np.int32),
+        "meal_bits": np.empty(0, dtype=np.uint8),
+        "columns": {column: np.empty(0, dtype=np.float32) for column in NUTRIENT_COLUMNS},
+    }
+
+
+class CatalogSnapshot:
+    """
+    One version of the catalog's arrays. Once FoodCatalog has published a
+    snapshot it is never modified: an edit copies it, changes the copy and
+    publishes that instead. A reader holding a snapshot therefore sees the
+    names, columns and rule bits of one version however long it runs.
+    """
+
+    def __init__(self, data, rule_bits, rule_index, path=None):
+        self.path = path
+        self.names = data["names"]
+        self.columns = data["columns"]
+        self.categories = data["categories"]
+        self.category_codes = data["category_codes"]
+        self.meal_types = data["meal_types"]
+        self.meal_type_codes = data["meal_type_codes"]
+        self.meal_bits = data["meal_bits"]
+        self.rule_bits = rule_bits
+        self.rule_index = rule_index
+        self.fingerprint = None  # set when published
+        self.version = 0
+        self._frame = None
+        self._rows_by_name = None
+
+    def snapshot(self):
+        return self
+
+    def __len__(self):
+        return len(self.names)
+
+    def row_of(self, name):
+        """Row position of the first food called `name` (any case), or None."""
+        if self._rows_by_name is None:
+            rows_by_name = {}
+            for row, value in enumerate(self.names[np.arange(len(self))].tolist()):
+                if isinstance(value, str):
+                    rows_by_name.setdefault(value.strip().lower(), row)
+            self._rows_by_name = rows_by_name
+        return self._rows_by_name.get(name.strip().lower())
+
+    def category_mask(self, category):
+        """Boolean mask of the rows whose Category equals `category` (any case)."""
+        codes = [
+            code
+            for code, name in enumerate(self.categories)
+            if name.lower() == category.lower()
+        ]
+        return np.isin(self.category_codes, codes)
+
+    def rule_mask(self, rules, out=None):
+        """
+        Boolean mask of the rows passing every (kind, name) rule in `rules`.
+        Rules missing from the table (like ("condition", "None")) are ignored.
+        :param out: Optional boolean array to AND into (modified in place).
+        """
+        required = np.uint64(0)
+        for rule in rules:
+            required |= self.rule_index.get(rule, np.uint64(0))
+        mask = (self.rule_bits & required) == required
+        if out is None:
+            return mask
+        return np.logical_and(out, mask, out=out)
+
+    @property
+    def frame(self):
+        """The catalog as a pandas DataFrame, built on first access."""
+        if self._frame is None:
+            self._frame = to_frame(self._data())
+        return self._frame
+
+    def _data(self):
+        return {
+            "names": self.names,
+            "categories": self.categories,
+            "category_codes": self.category_codes,
+            "meal_types": self.meal_types,
+            "meal_type_codes": self.meal_type_codes,
+            "meal_bits": self.meal_bits,
+            "columns": self.columns,
+        }
+
+    # The methods below change the snapshot, so they are only called on a
+    # copy() that hasn't been published yet.
+
+    def copy(self):
+        """A writable copy of the arrays (ones read from a store are memory-mapped read-only)."""
+        names = self.names
+        if not isinstance(names, np.ndarray):
+            names = names[np.arange(len(names))]
+        data = {
+            "names": np.array(names, dtype=object),
+            "categories": list(self.categories),
+            "category_codes": np.array(self.category_codes, dtype=np.int16),
+            "meal_types": list(self.meal_types),
+            "meal_type_codes": np.array(self.meal_type_codes, dtype=np.int32),
+            "meal_bits": np.array(self.meal_bits, dtype=np.uint8),
+            "columns": {
+                column: np.array(values, dtype=np.float32)
+                for column, values in self.columns.items()
+            },
+        }
+        copy = CatalogSnapshot(
+            data, np.array(self.rule_bits, dtype=np.uint64), self.rule_index, self.path
+        )
+        if self._rows_by_name is not None:
+            copy._rows_by_name = dict(self._rows_by_name)
+        return copy
+
+    def _category_code(self, category):
+        if category is None:
+            return -1
+        for code, name in enumerate(self.categories):
+            if name.lower() == category.lower():
+                return code
+        self.categories.append(category)
+        return len(self.categories) - 1
+
+    def _meal_type_code(self, meal_type):
+        if meal_type is None:
+            return -1, 0
+        if meal_type not in self.meal_types:
+            self.meal_types.append(meal_type)
+        return self.meal_types.index(meal_type), meal_type_bits([meal_type])[0]
+
+    def _upsert(self, items):
+        patched = set()
+        added = {}  # new foods by lowercased name, merged if one comes twice
+        for item in items:
+            key = item["Food_items"].lower()
+            row = self.row_of(key)
+            if row is None:
+                added.setdefault(key, {}).update(item)
+                continue
+            # patch the row of the copy
+            for column in NUTRIENT_COLUMNS:
+                if column in item:
+                    self.columns[column][row] = _nutrient(item[column])
+            if "Category" in item:
+                self.category_codes[row] = self._category_code(item["Category"])
+            if "Meal Type" in item:
+                self.meal_type_codes[row], self.meal_bits[row] = self._meal_type_code(
+                    item["Meal Type"]
+                )
+            patched.add(row)
+        if patched:
+            # only the patched rows need their rules evaluated again
+            rows = np.fromiter(patched, dtype=np.int64)
+            self.rule_bits[rows] = rule_bits(
+                {column: values[rows] for column, values in self.columns.items()}
+            )[0]
+        if added:
+            self._append(list(added.values()))
+        return len(added)
+
+    def _append(self, items):
+        first = len(self.names)
+        columns = {
+            column: np.array([_nutrient(item.get(column)) for item in items], dtype=np.float32)
+            for column in NUTRIENT_COLUMNS
+        }
+        meal_codes = [self._meal_type_code(item.get("Meal Type")) for item in items]
+        self.names = np.concatenate(
+            [self.names, np.array([item["Food_items"] for item in items], dtype=object)]
+        )
+        self.columns = {
+            column: np.concatenate([values, columns[column]])
+            for column, values in self.columns.items()
+        }
+        self.category_codes = np.concatenate(
+            [
+                self.category_codes,
+                np.array(
+                    [self._category_code(item.get("Category")) for item in items], dtype=np.int16
+                ),
+            ]
+        )
+        self.meal_type_codes = np.concatenate(
+            [self.meal_type_codes, np.array([code for code, _ in meal_codes], dtype=np.int32)]
+        )
+        self.meal_bits = np.concatenate(
+            [self.meal_bits, np.array([bits for _, bits in meal_codes], dtype=np.uint8)]
+        )
+        self.rule_bits = np.concatenate([self.rule_bits, rule_bits(columns)[0]])
+        if self._rows_by_name is not None:
+            for row, item in enumerate(items, first):
+                self._rows_by_name.setdefault(item["Food_items"].lower(), row)
+
+    def _remove(self, names):
+        rows = [self.row_of(name) for name in names]
+        rows = sorted({row for row in rows if row is not None})
+        if not rows:
+            return 0
+        self.names = np.delete(self.names, rows)
+        self.columns = {column: np.delete(values, rows) for column, values in self.columns.items()}
+        self.category_codes = np.delete(self.category_codes, rows)
+        self.meal_type_codes = np.delete(self.meal_type_codes, rows)
+        self.meal_bits = np.delete(self.meal_bits, rows)
+        self.rule_bits = np.delete(self.rule_bits, rows)
+        self._rows_by_name = None  # positions after the removed rows moved
+        return len(rows)
+
+    def _replay(self, entries):
+        """Apply logged edits; returns how many of them changed anything."""
+        edits = 0
+        for entry in entries:
+            if entry.get("op") == "upsert":
+                self._upsert(entry["items"])
+                edits += 1
+            elif entry.get("op") == "remove":
+                edits += self._remove(entry["names"]) > 0
+        return edits
+
+
+def _current(name, doc=None):
+    # reads go to the snapshot published last
+    return property(lambda self: getattr(self._snapshot, name), doc=doc)
+
+
+class FoodCatalog:
+    """
+    The food table kept in memory for the lifetime of the process.
+    The csv is parsed once and only parsed again when its mtime or size changes.
+    `path` may also point straight at a store, e.g. one written by importer.py.
+    When a binary store (see catalog_store.py) built from the current csv
+    sits next to it, it is memory-mapped instead of parsing the csv; a stale
+    or missing store is rebuilt after falling back to the csv.
+
+    The arrays live in a CatalogSnapshot. upsert() and remove() edit a copy
+    of it and publish the copy with a single reference swap, so code that
+    reads several arrays takes snapshot() once and uses that throughout.
+    Each edit is appended to a write-ahead log next to the csv first,
+    replayed on the next load, and compacted into the csv in the background
+    every `compact_after` edits. A catalog without a file (from_data) keeps
+    its edits in memory only.
+    """
+
+    names = _current("names")
+    columns = _current("columns")
+    categories = _current("categories")
+    category_codes = _current("category_codes")
+    meal_types = _current("meal_types")
+    meal_type_codes = _current("meal_type_codes")
+    meal_bits = _current("meal_bits")
+    rule_bits = _current("rule_bits")
+    rule_index = _current("rule_index")
+    version = _current("version", "Goes up with every load and edit.")
+    frame = _current("frame", "The catalog as a pandas DataFrame, built on first access.")
+    fingerprint = _current(
+        "fingerprint",
+        """
+        Identifies the loaded copy: (path, mtime in ns, size in bytes, edits
+        applied since the process started).
+        """,
+    )
+
+    def __init__(
+        self,
+        path=DEFAULT_PATH,
+        store_path=None,
+        use_store=True,
+        wal_path=None,
+        compact_after=COMPACT_AFTER,
+    ):
+        self.path = path
+        self.store_path = store_path or (path and default_store_path(path))
+        self.use_store = use_store
+        wal_path = wal_path or (path and default_wal_path(path))
+        self.wal = CatalogLog(wal_path) if wal_path else None
+        self.compact_after = compact_after
+        self.loaded_from = None
+        self._snapshot = CatalogSnapshot(_empty_data(), np.empty(0, dtype=np.uint64), {}, path)
+        self._signature = None
+        self._edits = 0
+        self._logged = 0
+        self._log_offset = 0
+        self._lock = threading.Lock()
+        self._compacting = threading.Lock()
+
+    def snapshot(self):
+        """The current version of the arrays, unaffected by later edits."""
+        return self._snapshot
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def row_of(self, name):
+        """Row position of the first food called `name` (any case), or None."""
+        return self._snapshot.row_of(name)
+
+    def category_mask(self, category):
+        """Boolean mask of the rows whose Category equals `category` (any case)."""
+        return self._snapshot.category_mask(category)
+
+    def rule_mask(self, rules, out=None):
+        """Boolean mask of the rows passing every rule, see CatalogSnapshot.rule_mask()."""
+        return self._snapshot.rule_mask(rules, out)
+
+    def _publish(self, snapshot, edits=0):
+        # the only place the current snapshot changes, under self._lock
+        self._edits += edits
+        snapshot.fingerprint = (self.path,) + self._signature + (self._edits,)
+        snapshot.version = self._snapshot.version + 1
+        self._snapshot = snapshot
+
+    def upsert(self, items):
+        """
+        Add foods, or update the ones with the same name (any case). The
+        edit is logged before it is applied, see catalog_wal.py.
+        :param items: Iterable of dicts with "Food_items" and any of the other
+            csv columns; columns left out keep their value (or stay missing
+            for a new food).
+        :return: Number of foods added.
+        """
+        items = [_checked_item(item) for item in items]
+        with self._lock:
+            self._log({"op": "upsert", "items": items})
+            edited = self._snapshot.copy()
+            added = edited._upsert(items)
+            self._publish(edited, edits=1)
+        self._compact_if_due()
+        return added
+
+    def remove(self, names):
+        """
+        Remove the foods called `names` (any case), unknown names are ignored.
+        :return: Number of rows removed.
+        """
+        names = [str(name).strip() for name in names]
+        with self._lock:
+            self._log({"op": "remove", "names": names})
+            removed = 0
+            if any(self._snapshot.row_of(name) is not None for name in names):
+                edited = self._snapshot.copy()
+                removed = edited._remove(names)
+                self._publish(edited, edits=1)
+        self._compact_if_due()
+        return removed
+
+    def _log(self, entry):
+        if self.wal is not None:
+            self._log_offset = self.wal.append([entry])
+            self._logged += 1
+
+    def _replay(self, snapshot, entries):
+        """Publish `snapshot` with `entries` applied to a copy of it."""
+        if not entries:
+            self._publish(snapshot)
+            return
+        with instrument.span("catalog.replay_log"):
+            edited = snapshot.copy()
+            edits = edited._replay(entries)
+        self._publish(edited, edits)
+
+    def _compact_if_due(self):
+        # the lock is taken here and handed to the thread, so edits racing
+        # past the threshold can't start a second compaction
+        if self._logged < self.compact_after or not self._compacting.acquire(blocking=False):
+            return
+        threading.Thread(
+            target=self._compact_and_release, name="catalog-compact", daemon=True
+        ).start()
+
+    def _compact_and_release(self):
+        try:
+            self._compact()
+        finally:
+            self._compacting.release()
+
+    def compact(self):
+        """
+        Write the catalog, edits included, over its base file and drop the
+        log entries that are now part of it. Edits made meanwhile stay in
+        the log. Runs in the background once COMPACT_AFTER edits are logged.
+        """
+        if self.wal is None:
+            return
+        with self._compacting:
+            self._compact()
+
+    def _compact(self):
+        # called with self._compacting held
+        with self._lock:
+            offset = self.wal.size()
+            logged = self._logged
+            snapshot = self._snapshot
+        # a published snapshot doesn't change, later edits copy it
+        data = snapshot._data()
+        data["names"] = np.array(data["names"][np.arange(len(snapshot))], dtype=object)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with instrument.span("catalog.compact"):
+            if self.path.endswith(STORE_SUFFIX):
+                write_store(tmp_path, data, (0, 0))
+            else:
+                frame = to_frame(data)[CSV_COLUMNS]
+                # 7 significant digits round-trip float32 values
+                frame.to_csv(tmp_path, index=False, float_format="%.7g")
+        with self._lock:
+            os.replace(tmp_path, self.path)
+            # what is on disk now is what was loaded plus the log tail
+            self._signature = signature = self._stat()
+            self.wal.drop_before(offset)
+            self._log_offset = self.wal.size()
+            self._logged -= logged
+            # same arrays, new fingerprint
+            current = copy.copy(self._snapshot)
+            current.fingerprint = (self.path,) + signature + (self._edits,)
+            self._snapshot = current
+        if self.use_store and not self.path.endswith(STORE_SUFFIX):
+            try:
+                write_store(self.store_path, data, signature)
+            except OSError:
+                pass
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def refresh(self):
+        """
+        Reload the csv if it changed on disk since the last load, or replay
+        the edits another process appended to the log meanwhile.
+        """
+        if self.path is None:
+            return self
+        signature = self._stat()
+        if signature != self._signature or self.wal.size() != self._log_offset:
+            with self._lock:
+                if signature != self._signature:
+                    self._load(signature)
+                elif self.wal.size() < self._log_offset:
+                    self._load(signature)  # compacted by another process
+                else:
+                    entries, self._log_offset = self.wal.read(self._log_offset)
+                    self._replay(self._snapshot, entries)
+                    self._logged += len(entries)
+        return self
+
+    @classmethod
+    def from_data(cls, data):
+        """
+        A catalog over column arrays that are already in memory (in the shape
+        read_csv_columns returns), e.g. synthetic ones. It has no file behind
+        it, so refresh() never reloads it.
+        """
+        catalog = cls(path=None, use_store=False)
+        # no mtime to tell catalogs apart, so each one gets its own number
+        catalog._signature = (next(_in_memory_ids), len(data["names"]))
+        catalog._publish(catalog._snapshot_of(data))
+        return catalog
+
+    def _load(self, signature):
+        base = self._load_base(signature)
+        self._signature = signature
+        # edits not compacted into the base file yet, published together
+        # with the base so no reader sees it without them
+        entries, self._log_offset = self.wal.read()
+        self._replay(base, entries)
+        self._logged = len(entries)
+
+    def _load_base(self, signature):
+        """Read the base file into a snapshot, not published yet."""
+        data = None
+        if self.path.endswith(STORE_SUFFIX):
+            # an imported catalog (see importer.py) has no csv behind it
+            self.loaded_from = self.path
+            with instrument.span("catalog.read_store"):
+                data = read_store(self.path)
+            return self._snapshot_of(data)
+        if self.use_store:
+            try:
+                with instrument.span("catalog.read_store"):
+                    data = read_store(self.store_path, signature)
+            except (OSError, ValueError):
+                data = None
+        if data is not None:
+            self.loaded_from = self.store_path
+        else:
+            with instrument.span("catalog.read_csv"):
+                data = read_csv_columns(self.path)
+            self.loaded_from = self.path
+            if self.use_store:
+                try:
+                    with instrument.span("catalog.write_store"):
+                        write_store(self.store_path, data, signature)
+                except OSError:
+                    pass  # a read-only directory only costs the faster startup
+        return self._snapshot_of(data)
+
+    def _snapshot_of(self, data):
+        with instrument.span("catalog.rule_bits"):
+            bits, index = rule_bits(data["columns"])
+        return CatalogSnapshot(data, bits, index, self.path)
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(path=DEFAULT_PATH, refresh=True):
+    """
+    Return the shared catalog for `path`, reloaded if the file changed.
+    :param refresh: Set to False to skip checking the file, e.g. on an event
+        loop that refreshes the catalog elsewhere.
+    """
+    with _catalogs_lock:
+        catalog = _catalogs.get(path)
+        if catalog is None:
+            catalog = _catalogs[path] = FoodCatalog(path)
+    return catalog.refresh() if refresh else catalog
@@ -0,0 +1,211 @@
+"""
+Compact columnar binary copy of the food catalog.
+
+    python catalog_store.py food_data.csv [-o food_data.dietcat]
+
+Layout: the magic bytes, the header length (uint64), a JSON header and then
+the raw column arrays, each aligned to 64 bytes so they can be used straight
+from a memory map:
+
+- one float32 array per nutrient column
+- Category and Meal Type as integer codes into tables kept in the header
+- the Meal Type bitmask (uint8)
+- Food_items as an interned string table: per-row int32 codes into a
+  UTF-8 blob of the distinct names plus their int64 offsets
+
+The header also records the mtime and size of the csv it was built from, so
+a stale copy can be detected without reading the csv.
+"""
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+
+
+MAGIC = b"DIETCAT1"
+ALIGNMENT = 64
+STORE_SUFFIX = ".dietcat"
+
+
+def default_store_path(csv_path):
+    return os.path.splitext(csv_path)[0] + STORE_SUFFIX
+
+
+class StringTable:
+    """
+    Read-only array of interned strings. Indexing with an integer array
+    returns a numpy object array, like indexing a plain object array would.
+    """
+
+    def __init__(self, codes, offsets, blob):
+        self.codes = codes
+        self.offsets = offsets
+        self.blob = blob
+        self._cache = {}
+
+    @classmethod
+    def from_strings(cls, strings):
+        """Intern an iterable of strings, None/NA becoming empty strings."""
+        index = {}
+        codes = []
+        for value in strings:
+            value = value if isinstance(value, str) else ""
+            codes.append(index.setdefault(value, len(index)))
+        encoded = [value.encode("utf-8") for value in index]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(value) for value in encoded])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(np.asarray(codes, dtype=np.int32), offsets, blob)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _string(self, code):
+        value = self._cache.get(code)
+        if value is None:
+            start, end = self.offsets[code], self.offsets[code + 1]
+            value = self._cache[code] = self.blob[start:end].tobytes().decode("utf-8")
+        return value
+
+    def __getitem__(self, index):
+        codes = self.codes[index]
+        if np.ndim(codes) == 0:
+            return self._string(int(codes))
+        return np.array([self._string(int(code)) for code in codes], dtype=object)
+
+    def to_numpy(self):
+        return self[np.arange(len(self))]
+
+
+def write_store(path, data, source_signature):
+    """
+    Write catalog arrays (as produced by catalog.read_csv_columns) to `path`.
+    The file is written next to the target and renamed into place, so
+    readers never see a partial file.
+    """
+    names = data["names"]
+    if not isinstance(names, StringTable):
+        names = StringTable.from_strings(names)
+    # asarray doesn't copy arrays that already have the right dtype, which
+    # keeps memory-mapped inputs (see importer.py) out of memory
+    arrays = {
+        "name_codes": np.asarray(names.codes, dtype=np.int32),
+        "name_offsets": np.asarray(names.offsets, dtype=np.int64),
+        "name_blob": np.asarray(names.blob, dtype=np.uint8),
+        "category_codes": np.asarray(data["category_codes"], dtype=np.int16),
+        "meal_type_codes": np.asarray(data["meal_type_codes"], dtype=np.int32),
+        "meal_bits": np.asarray(data["meal_bits"], dtype=np.uint8),
+    }
+    for column, values in data["columns"].items():
+        arrays["column:" + column] = np.asarray(values, dtype=np.float32)
+
+    # lay the arrays out after the header, each on an aligned offset
+    layout = {}
+    offset = 0
+    for name, values in arrays.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        layout[name] = {
+            "dtype": values.dtype.str,
+            "offset": offset,
+            "length": len(values),
+        }
+        offset += values.nbytes
+    header = json.dumps(
+        {
+            "source": {"mtime_ns": source_signature[0], "size": source_signature[1]},
+            "rows": len(names),
+            "categories": list(data["categories"]),
+            "meal_types": list(data["meal_types"]),
+            "arrays": layout,
+        }
+    ).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for name, values in arrays.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(np.ascontiguousarray(values).data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a catalog store")
+        (header_length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_length))
+    header["data_start"] = (
+        -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+    )
+    return header
+
+
+def read_store(path, source_signature=None):
+    """
+    Memory-map a catalog store.
+    :param source_signature: (mtime_ns, size) of the csv; when given and the
+        store was built from a different version, None is returned.
+    :return: Dict in the same shape as catalog.read_csv_columns, or None.
+    """
+    header = read_header(path)
+    if source_signature is not None:
+        source = header["source"]
+        if (source["mtime_ns"], source["size"]) != tuple(source_signature):
+            return None
+
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        start = header["data_start"] + spec["offset"]
+        end = start + spec["length"] * dtype.itemsize
+        arrays[name] = buffer[start:end].view(dtype)
+
+    return {
+        "names": StringTable(
+            arrays["name_codes"], arrays["name_offsets"], arrays["name_blob"]
+        ),
+        "categories": header["categories"],
+        "category_codes": arrays["category_codes"],
+        "meal_types": header["meal_types"],
+        "meal_type_codes": arrays["meal_type_codes"],
+        "meal_bits": arrays["meal_bits"],
+        "columns": {
+            name.split(":", 1)[1]: values
+            for name, values in arrays.items()
+            if name.startswith("column:")
+        },
+    }
+
+
+def convert(csv_path, store_path=None):
+    """Build the binary store for a catalog csv, returning the store path."""
+    from catalog import read_csv_columns
+
+    store_path = store_path or default_store_path(csv_path)
+    stat = os.stat(csv_path)
+    write_store(store_path, read_csv_columns(csv_path), (stat.st_mtime_ns, stat.st_size))
+    return store_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a food catalog csv to the binary store")
+    parser.add_argument("csv", help="food_data.csv style catalog")
+    parser.add_argument("-o", "--output", help="store path (default: <csv name>.dietcat)")
+    args = parser.parse_args(argv)
+    store_path = convert(args.csv, args.output)
+    print(f"wrote {store_path} ({os.path.getsize(store_path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Write-ahead log of catalog edits, see FoodCatalog.upsert() / remove().
+
+One JSON object per line, appended and fsynced before the edit is applied
+to the resident catalog:
+
+    {"op": "upsert", "items": [{"Food_items": "Oats", "Protein": 16.9}]}
+    {"op": "remove", "names": ["Oats"]}
+
+On load the log is replayed on top of the base csv, and other processes
+reading the same catalog replay new entries as they show up. Compaction
+writes the current catalog back to the csv and drops the entries it now
+contains. There should be one writing process per catalog.
+"""
+import json
+import os
+
+
+WAL_SUFFIX = ".wal"
+
+
+def default_wal_path(csv_path):
+    return os.path.splitext(csv_path)[0] + WAL_SUFFIX
+
+
+class CatalogLog:
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, entries):
+        """Append entries and fsync, returning the new end offset."""
+        data = "".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def read(self, start=0):
+        """
+        Entries from byte offset `start` on, and the offset just past the
+        last complete line; an unterminated last line is left for a later read.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                data = f.read()
+        except FileNotFoundError:
+            return [], 0
+        entries = []
+        end = start
+        for line in data.split(b"\n")[:-1]:
+            end += len(line) + 1
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # a crash mid-append leaves a partial line that the next
+                # append runs into, that edit is lost
+                continue
+        return entries, end
+
+    def drop_before(self, offset):
+        """Remove the entries before byte `offset`, keeping later appends."""
+        tail = b""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                tail = f.read()
+        except FileNotFoundError:
+            return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,194 @@
+import re
+
+import numpy as np
+
+import instrument
+from catalog import MEAL_BITS, get_catalog
+from meal_optimizer import daily_targets, optimized_plan
+from plan_cache import PlanCache
+from plan_table import PrecomputedPlans
+from ranking import sort_keys, top_k
+from rules import rule_names
+
+
+MEALS = ("breakfast", "lunch", "snack", "dinner")
+ITEMS_PER_MEAL = 4
+
+DIET_TYPES = ("All", "Veg", "Non-Veg")
+DIET_PREFERENCES = ("None", "High-Protein", "Keto")
+
+# plans only depend on the filter key and the catalog, see recommend()
+plan_cache = PlanCache(maxsize=1024)
+# every single-condition key of the current catalog, once started (server.py)
+precomputed = PrecomputedPlans()
+
+
+def health_conditions():
+    """"None" and the health conditions of the rule table (see rules.py)."""
+    return ("None",) + rule_names("condition")
+
+
+def diet_goals():
+    """"None" and the goals of the rule table (see rules.py)."""
+    return ("None",) + rule_names("goal")
+
+
+def _canonical(value, choices, default, field):
+    """
+    Match `value` against `choices` ignoring case and padding; None and
+    blank values give `default`.
+    :raise ValueError: For any other value.
+    """
+    if value is None:
+        return default
+    text = str(value).strip().lower()
+    if not text:
+        return default
+    for choice in choices:
+        if choice.lower() == text:
+            return choice
+    raise ValueError(f"Unknown {field} {value!r}, expected one of {', '.join(choices)}")
+
+
+def health_conditions_key(health_condition):
+    """
+    Normalize one or several health conditions into a sorted tuple.
+    Accepts a single name, a "Diabetes; Hypertension" style string or any
+    iterable of names; "None" is dropped.
+    :raise ValueError: For a name that isn't in the rule table.
+    """
+    if health_condition is None:
+        return ()
+    if isinstance(health_condition, str):
+        health_condition = re.split(r"[;,]", health_condition)
+    choices = health_conditions()
+    conditions = {
+        _canonical(condition, choices, "None", "health condition")
+        for condition in health_condition
+    }
+    conditions.discard("None")
+    return tuple(sorted(conditions, key=choices.index))
+
+
+def filter_key(diet_type="All", diet_preference="None", health_condition="None", diet_goal="None"):
+    """
+    Normalize the inputs that decide a meal plan into a hashable tuple.
+    Blank values fall back to the same defaults as the GUI. Health
+    conditions and goals are the ones of the rule table, so adding a row
+    there is all it takes to offer a new one.
+    :return: (diet_type, diet_preference, health_conditions, diet_goal), with
+        health_conditions a tuple of condition names (empty for "None").
+    :raise ValueError: For a value that isn't one of the known names.
+    """
+    return (
+        _canonical(diet_type, DIET_TYPES, "All", "diet type"),
+        _canonical(diet_preference, DIET_PREFERENCES, "None", "diet preference"),
+        health_conditions_key(health_condition),
+        _canonical(diet_goal, diet_goals(), "None", "diet goal"),
+    )
+
+
+def filter_mask(catalog, diet_type="All", health_conditions=(), diet_goal="None"):
+    """
+    Boolean mask of the catalog rows passing the diet type, health condition
+    and goal filters. The thresholds come from the rule table in rules.py,
+    precomputed per row as a bitmask by the catalog, so any number of
+    conditions costs a single AND over that array.
+    """
+    if diet_type != "All":
+        mask = catalog.category_mask(diet_type)
+    else:
+        mask = np.ones(len(catalog), dtype=bool)
+    rules = [("condition", condition) for condition in health_conditions]
+    rules.append(("goal", diet_goal))
+    return catalog.rule_mask(rules, out=mask)
+
+
+def build_plan(catalog, key, targets=None):
+    """
+    Evaluate a normalized filter key against the catalog, bypassing the cache.
+    :param targets: Optional daily_targets() dict; when given, each meal's
+        items are picked by the optimizer instead of taking the top ranked.
+    """
+    # one version of the arrays throughout, edits publish a new snapshot
+    catalog = catalog.snapshot()
+    diet_type, diet_preference, health_conditions, diet_goal = key
+    with instrument.span("engine.filter"):
+        rows = np.flatnonzero(filter_mask(catalog, diet_type, health_conditions, diet_goal))
+    # the preference only orders the foods once a goal is picked
+    if diet_goal == "None":
+        diet_preference = "None"
+
+    if targets is not None:
+        with instrument.span("engine.optimize"):
+            return optimized_plan(
+                catalog, rows, diet_preference, targets, MEALS, ITEMS_PER_MEAL
+            )
+
+    meal_plan = {}
+    with instrument.span("engine.rank"):
+        meal_bits = catalog.meal_bits[rows]
+        for meal in MEALS:
+            in_meal = rows[(meal_bits & MEAL_BITS[meal]) != 0]
+            keys = sort_keys(catalog.columns, in_meal, diet_preference)
+            best = top_k(in_meal, keys, ITEMS_PER_MEAL)
+            meal_plan[meal] = catalog.names[best].tolist()
+    return meal_plan
+
+
+def recommend(
+    age=None,
+    height=None,
+    weight=None,
+    diet_type="All",
+    diet_preference="None",
+    health_condition="None",
+    diet_goal="None",
+    catalog=None,
+    use_cache=True,
+    optimize=False,
+):
+    """
+    Build the meal plan for one user profile, without touching any GUI.
+    By default each meal gets its top ranked foods, which only depends on the
+    diet fields, so that is what plans are cached on (together with the
+    catalog fingerprint). With `optimize`, age, height (cm) and weight (kg)
+    set daily calorie and protein targets and the meals are picked to hit
+    them (see meal_optimizer.py); the targets then become part of the key.
+    Once `precomputed.start()` has been called, plans of single-condition keys
+    come from the precomputed table of the catalog (see plan_table.py).
+    :param health_condition: One condition name, or several as a list or a
+        "Diabetes; Hypertension" style string.
+    :param catalog: FoodCatalog to use, defaults to the shared food_data.csv one.
+    :param use_cache: Set to False to always recompute the plan.
+    :param optimize: Pick items for calorie targets, needs age/height/weight.
+    :return: Dict of meal -> list of up to ITEMS_PER_MEAL food names.
+    """
+    key = filter_key(diet_type, diet_preference, health_condition, diet_goal)
+    with instrument.request("recommend", key=key, optimize=optimize):
+        if catalog is None:
+            catalog = get_catalog()
+        targets = None
+        cache_key = key
+        if optimize and None not in (age, height, weight):
+            targets = daily_targets(age, height, weight, key[3])
+            cache_key = key + (targets["calories"], targets["protein"])
+        if not use_cache:
+            return build_plan(catalog, key, targets)
+
+        if targets is None:
+            meal_plan = precomputed.get(key, catalog)
+            if meal_plan is not None:
+                instrument.count("plan_table.hits")
+                return meal_plan
+        # cached under the fingerprint of the version it is built from
+        snapshot = catalog.snapshot()
+        meal_plan = plan_cache.get(cache_key, snapshot.fingerprint)
+        if meal_plan is None:
+            instrument.count("plan_cache.misses")
+            meal_plan = build_plan(snapshot, key, targets)
+            plan_cache.put(cache_key, snapshot.fingerprint, meal_plan)
+        else:
+            instrument.count("plan_cache.hits")
+        # hand out copies so callers can't edit the cached lists
+        return {meal: list(items) for meal, items in meal_plan.items()}
@@ -0,0 +1,365 @@
+"""
+Streaming import of external food datasets into the binary catalog store.
+
+    python importer.py nutrients.csv -o foods.dietcat [--chunk-rows 100000]
+
+The input is read in chunks, so memory stays bounded however large the file
+is: each chunk is normalized, validated and deduplicated, then its arrays
+are appended to spill files next to the output, which are finally laid out
+as a catalog store (see catalog_store.py). Only the set of food names seen
+so far grows with the input, as deduplication needs it.
+
+- column names are matched loosely: case, spaces and punctuation are
+  ignored, common aliases ("fat", "fiber", "Veg/Non-Veg") are known and
+  near misses like "Lucnch" are fuzzy-matched
+- meals come from a "Meal Type" column ("lunch, dinner", "Lunch/Dinner"),
+  and/or from one yes/no column per meal ("BreakFast", "Lucnch", ...)
+- Category is canonicalized to Veg / Non-Veg
+- rows with a missing name, an unknown category, a non-numeric nutrient or
+  one outside NUTRIENT_RANGES are rejected; the first row of each food name
+  (ignoring case) wins
+
+The resulting store can be loaded directly, e.g. get_catalog("foods.dietcat").
+"""
+import argparse
+import difflib
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+from catalog import MEAL_BITS, NUTRIENT_COLUMNS
+from catalog_store import StringTable, write_store
+
+
+CHUNK_ROWS = 100_000
+
+# same order as the categories read_csv_columns gets from pandas
+CATEGORIES = ["Non-Veg", "Veg"]
+
+# plausible values per 100 g; Iron and Sodium are in mg
+NUTRIENT_RANGES = {
+    "Calories": (0, 900),
+    "Fats": (0, 100),
+    "Protein": (0, 100),
+    "Iron": (0, 100),
+    "Carbohydrates": (0, 100),
+    "Fibre": (0, 100),
+    "Sugar": (0, 100),
+    "Sodium": (0, 40_000),
+}
+
+# squashed (lowercase, letters and digits only) aliases of each column
+COLUMN_ALIASES = {
+    "Food_items": ["fooditems", "fooditem", "food", "foodname", "name", "description"],
+    "Category": ["category", "vegnonveg", "vegnonvegetarian", "diettype"],
+    "Meal Type": ["mealtype", "meal", "meals"],
+    "Calories": ["calories", "calorie", "energy", "kcal", "energykcal"],
+    "Fats": ["fats", "fat", "totalfat", "lipids"],
+    "Protein": ["protein", "proteins"],
+    "Iron": ["iron", "ironmg"],
+    "Carbohydrates": ["carbohydrates", "carbohydrate", "carbs", "carb"],
+    "Fibre": ["fibre", "fiber", "dietaryfiber", "dietaryfibre"],
+    "Sugar": ["sugar", "sugars", "totalsugars"],
+    "Sodium": ["sodium", "sodiummg"],
+}
+MEAL_ALIASES = {
+    "breakfast": ["breakfast"],
+    "lunch": ["lunch"],
+    "snack": ["snack", "snacks"],
+    "dinner": ["dinner", "supper"],
+}
+CATEGORY_ALIASES = {
+    "Veg": ["veg", "vegetarian", "vegan", "v", "0"],
+    "Non-Veg": ["nonveg", "nonvegetarian", "nv", "1"],
+}
+TRUE_FLAGS = {"1", "y", "yes", "true", "x"}
+
+
+def _squash(text):
+    return re.sub(r"[^a-z0-9]", "", str(text).lower())
+
+
+def _lookup(text, aliases, cutoff=0.8):
+    """The key of `aliases` whose alias matches `text`, fuzzily, or None."""
+    word = _squash(text)
+    vocabulary = {alias: key for key, names in aliases.items() for alias in names}
+    if word in vocabulary:
+        return vocabulary[word]
+    close = difflib.get_close_matches(word, list(vocabulary), n=1, cutoff=cutoff)
+    return vocabulary[close[0]] if close else None
+
+
+def map_columns(header):
+    """
+    Sort the input column names into catalog columns and per-meal flags.
+    :return: (columns, meal_flags, ignored): catalog column -> input
+        column, meal -> input column, and the unmatched input columns.
+    """
+    columns, meal_flags, ignored = {}, {}, []
+    for name in header:
+        column = _lookup(name, COLUMN_ALIASES)
+        meal = None if column else _lookup(name, MEAL_ALIASES)
+        if column and column not in columns:
+            columns[column] = name
+        elif meal and meal not in meal_flags:
+            meal_flags[meal] = name
+        else:
+            ignored.append(name)
+    return columns, meal_flags, ignored
+
+
+def meal_text_bits(text):
+    """Meal bitmask of a "Lunch, Dinner" / "lunch and dinner" style value."""
+    bits = 0
+    for token in re.split(r"[,;/|&+]|\band\b", str(text).lower()):
+        meal = _lookup(token, MEAL_ALIASES) if token.strip() else None
+        if meal:
+            bits |= MEAL_BITS[meal]
+    return bits
+
+
+def meal_type_name(bits):
+    """Canonical Meal Type string for a bitmask, e.g. "Lunch, Dinner"."""
+    return ", ".join(meal.capitalize() for meal, bit in MEAL_BITS.items() if bits & bit)
+
+
+UNKNOWN_CATEGORY = -2
+
+
+def category_code(value):
+    """Code into CATEGORIES, -1 when blank and UNKNOWN_CATEGORY if unrecognized."""
+    if not str(value).strip():
+        return -1
+    category = _lookup(value, CATEGORY_ALIASES, cutoff=0.9)
+    return CATEGORIES.index(category) if category else UNKNOWN_CATEGORY
+
+
+def _per_unique(series, fn, dtype):
+    """Apply `fn` once per distinct value of `series` (missing values -> fn(""))."""
+    import pandas as pd
+
+    codes, uniques = pd.factorize(series)
+    results = np.array([fn(value) for value in uniques] + [fn("")], dtype=dtype)
+    return results[codes]
+
+
+class _Spill:
+    """Append-only binary files, one per output array."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.dtypes = {}
+        self._files = {}
+
+    def append(self, name, values):
+        values = np.ascontiguousarray(values)
+        if name not in self._files:
+            self.dtypes[name] = values.dtype
+            self._files[name] = open(os.path.join(self.directory, name), "wb")
+        self._files[name].write(values.data)
+
+    def arrays(self):
+        """Memory maps over everything appended, by name."""
+        arrays = {}
+        for name, f in self._files.items():
+            f.close()
+            dtype = self.dtypes[name]
+            if os.path.getsize(f.name):
+                arrays[name] = np.memmap(f.name, dtype=dtype, mode="r")
+            else:
+                arrays[name] = np.zeros(0, dtype=dtype)
+        return arrays
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+
+def _detect_separator(path):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        header = f.readline()
+    return "\t" if header.count("\t") > header.count(",") else ","
+
+
+def import_catalog(source, output, chunk_rows=CHUNK_ROWS, sep=None):
+    """
+    Normalize, validate and deduplicate `source` into a catalog store.
+    :return: Report dict with row counts, rejections by reason and the
+        column mapping that was used.
+    """
+    import pandas as pd
+
+    sep = sep or _detect_separator(source)
+    header = pd.read_csv(source, sep=sep, nrows=0).columns
+    columns, meal_flags, ignored = map_columns(header)
+    if "Food_items" not in columns:
+        raise ValueError(f"{source} has no food name column (got {list(header)})")
+
+    report = {
+        "rows_read": 0,
+        "rows_written": 0,
+        "duplicates": 0,
+        "no_meal_type": 0,
+        "rejected": Counter(),
+        "columns": columns,
+        "meal_flags": meal_flags,
+        "ignored_columns": ignored,
+    }
+    seen = set()  # lowercased names already written
+    blob_size = 0
+    meal_type_codes = {}  # meal bitmask -> index into meal_types
+    meal_types = []
+
+    spill_dir = tempfile.mkdtemp(prefix=".import-", dir=os.path.dirname(os.path.abspath(output)))
+    spill = _Spill(spill_dir)
+    try:
+        spill.append("name_offsets", np.zeros(1, dtype=np.int64))
+        chunks = pd.read_csv(
+            source,
+            sep=sep,
+            dtype=str,
+            keep_default_na=False,
+            chunksize=chunk_rows,
+            encoding_errors="replace",
+        )
+        for chunk in chunks:
+            report["rows_read"] += len(chunk)
+            valid = np.ones(len(chunk), dtype=bool)
+
+            def reject(bad, reason):
+                bad = bad & valid
+                report["rejected"][reason] += int(bad.sum())
+                valid[bad] = False
+
+            names = chunk[columns["Food_items"]].str.strip()
+            reject((names == "").to_numpy(), "missing name")
+
+            if "Category" in columns:
+                category_codes = _per_unique(chunk[columns["Category"]], category_code, np.int16)
+                reject(category_codes == UNKNOWN_CATEGORY, "unknown category")
+            else:
+                # without a category column the foods only match diet type "All"
+                category_codes = np.full(len(chunk), -1, dtype=np.int16)
+
+            nutrients = {}
+            for column in NUTRIENT_COLUMNS:
+                if column not in columns:
+                    nutrients[column] = np.full(len(chunk), np.nan, dtype=np.float32)
+                    continue
+                text = chunk[columns[column]].str.strip()
+                values = pd.to_numeric(text, errors="coerce").to_numpy(dtype=np.float64)
+                reject(np.isnan(values) & (text != "").to_numpy(), f"{column} not a number")
+                low, high = NUTRIENT_RANGES[column]
+                with np.errstate(invalid="ignore"):
+                    reject((values < low) | (values > high), f"{column} out of range")
+                nutrients[column] = values.astype(np.float32)
+
+            meal_bits = np.zeros(len(chunk), dtype=np.uint8)
+            if "Meal Type" in columns:
+                meal_bits |= _per_unique(chunk[columns["Meal Type"]], meal_text_bits, np.uint8)
+            for meal, name in meal_flags.items():
+                flags = chunk[name].str.strip().str.lower().isin(TRUE_FLAGS).to_numpy()
+                meal_bits[flags] |= MEAL_BITS[meal]
+
+            # the first valid row of each name wins, within and across chunks
+            keys = names.str.lower().to_numpy(dtype=object)
+            # rejected rows don't count, so the result doesn't depend on chunking
+            first = np.zeros(len(keys), dtype=bool)
+            first[valid] = ~pd.Series(keys[valid]).duplicated().to_numpy()
+            new = np.fromiter((key not in seen for key in keys), dtype=bool, count=len(keys))
+            duplicate = valid & ~(first & new)
+            report["duplicates"] += int(duplicate.sum())
+            keep = valid & ~duplicate
+            if not keep.any():
+                continue
+            seen.update(keys[keep].tolist())
+
+            encoded = [name.encode("utf-8") for name in names.to_numpy(dtype=object)[keep]]
+            lengths = np.fromiter((len(value) for value in encoded), dtype=np.int64)
+            spill.append("name_blob", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+            spill.append("name_offsets", blob_size + np.cumsum(lengths))
+            blob_size += int(lengths.sum())
+
+            kept_bits = meal_bits[keep]
+            codes = np.full(len(kept_bits), -1, dtype=np.int32)
+            for bits in np.unique(kept_bits).tolist():
+                if bits:
+                    if bits not in meal_type_codes:
+                        meal_type_codes[bits] = len(meal_types)
+                        meal_types.append(meal_type_name(bits))
+                    codes[kept_bits == bits] = meal_type_codes[bits]
+            report["no_meal_type"] += int((kept_bits == 0).sum())
+
+            spill.append("category_codes", category_codes[keep])
+            spill.append("meal_type_codes", codes)
+            spill.append("meal_bits", kept_bits)
+            for column in NUTRIENT_COLUMNS:
+                spill.append("column:" + column, nutrients[column][keep])
+            report["rows_written"] += int(keep.sum())
+
+        for name, dtype in [
+            ("name_blob", np.uint8),
+            ("category_codes", np.int16),
+            ("meal_type_codes", np.int32),
+            ("meal_bits", np.uint8),
+            *(("column:" + column, np.float32) for column in NUTRIENT_COLUMNS),
+        ]:
+            if name not in spill.dtypes:
+                spill.append(name, np.zeros(0, dtype=dtype))
+        arrays = spill.arrays()
+        rows = report["rows_written"]
+        data = {
+            # every name is distinct after deduplication
+            "names": StringTable(
+                np.arange(rows, dtype=np.int32), arrays["name_offsets"], arrays["name_blob"]
+            ),
+            "categories": CATEGORIES,
+            "category_codes": arrays["category_codes"],
+            "meal_types": meal_types,
+            "meal_type_codes": arrays["meal_type_codes"],
+            "meal_bits": arrays["meal_bits"],
+            "columns": {column: arrays["column:" + column] for column in NUTRIENT_COLUMNS},
+        }
+        stat = os.stat(source)
+        write_store(output, data, (stat.st_mtime_ns, stat.st_size))
+        del data, arrays
+    finally:
+        spill.close()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a food dataset into a catalog store")
+    parser.add_argument("source", help="csv or tab separated food dataset")
+    parser.add_argument("-o", "--output", required=True, help="catalog store to write")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--sep", help="field separator (default: detected from the header)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    report = import_catalog(args.source, args.output, args.chunk_rows, args.sep)
+    elapsed = time.perf_counter() - start
+    print(f"columns: {report['columns']}")
+    if report["meal_flags"]:
+        print(f"meal flag columns: {report['meal_flags']}")
+    if report["ignored_columns"]:
+        print(f"ignored columns: {report['ignored_columns']}")
+    print(
+        f"read {report['rows_read']} rows, wrote {report['rows_written']} to "
+        f"{args.output} in {elapsed:.1f} s"
+    )
+    print(f"  duplicates dropped: {report['duplicates']}")
+    print(f"  without a meal type: {report['no_meal_type']}")
+    for reason, count in sorted(report["rejected"].items()):
+        if count:
+            print(f"  rejected, {reason}: {count}")
+
+
+if __name__ == "__main__":
+    main()
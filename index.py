@@ -12,6 +12,8 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtGui import QFont
 import sys
 
+from engine import recommend
+
 
 class DietRecommendationApp(QWidget):
     def __init__(self):
@@ -121,7 +123,7 @@ class DietRecommendationApp(QWidget):
         # Submit Button
         self.submit_button = QPushButton("OUTPUT")
         self.submit_button.setFont(font)
-        self.submit_button.clicked.connect(self.get_user_inputs)
+        self.submit_button.clicked.connect(self.get_output)
         layout.addWidget(self.submit_button)
 
         self.setLayout(layout)
@@ -155,6 +157,34 @@ class DietRecommendationApp(QWidget):
         print(msg)
         # QMessageBox.information(self, "User Inputs", msg)
 
+    def get_output(self):
+        self.get_user_inputs()
+        try:
+            user_age = int(self.age_input.text())
+            user_height = float(self.height_input.text())
+            user_weight = float(self.weight_input.text())
+        except ValueError:
+            QMessageBox.warning(self, "Input Error", "Invalid numerical values entered!")
+            return
+
+        try:
+            meal_plan = recommend(
+                age=user_age,
+                height=user_height,
+                weight=user_weight,
+                diet_type=self.diet_type.currentText(),
+                diet_goal=self.selected_goal if self.selected_goal else "None",
+            )
+        except Exception as e:
+            QMessageBox.critical(self, "File Error", f"Error reading food_data.csv: {e}")
+            return
+
+        msg = "\n\n".join(
+            f"{meal.capitalize()}:\n" + "\n".join(items)
+            for meal, items in meal_plan.items()
+        )
+        QMessageBox.information(self, "Meal Plan Recommendation", msg)
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
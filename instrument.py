@@ -0,0 +1,296 @@
+"""
+Timing spans, counters and histograms for the recommendation path.
+
+    with instrument.request("recommend", diet_goal="Healthy"):
+        with instrument.span("engine.filter"):
+            ...
+
+Every span adds its duration to the histogram of its name. A request is the
+outermost span of one unit of work; it also keeps the breakdown of the spans
+inside it, and the most recent requests are kept so the slowest ones can be
+dumped. A request opened inside another one just counts as a span.
+
+Recording costs a few microseconds per span; DIETIFY_INSTRUMENT=0 turns it
+off. Profiling is off by default. DIETIFY_PROFILE=cprofile (or tracemalloc, or
+both comma separated) or set_profiling() switch it on; requests then carry
+the top functions by cumulative time and/or their peak traced memory. Only
+one request is profiled at a time, concurrent ones are timed as usual.
+
+    python instrument.py --url http://127.0.0.1:8080 [--limit 10]
+
+prints the slowest recent requests of a running server.py.
+"""
+import bisect
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+
+# histogram bucket upper bounds in ms, plus an overflow bucket
+BUCKETS_MS = (
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500,
+)
+RECENT_REQUESTS = 1000
+PROFILE_MODES = ("cprofile", "tracemalloc")
+PROFILE_LINES = 15
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th quantile (max if overflow)."""
+        rank = p * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max_ms,
+            "buckets": {
+                f"le_{bound}": count
+                for bound, count in zip(BUCKETS_MS + ("inf",), self.buckets)
+                if count
+            },
+        }
+
+
+class Recorder:
+    def __init__(self, recent=RECENT_REQUESTS, enabled=True):
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = Counter()
+        self.recent = deque(maxlen=recent)
+        self.profiling = set()
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self._tracemalloc = None  # the module, imported once profiling needs it
+        self._current = contextvars.ContextVar("instrument_request", default=None)
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        ms = seconds * 1000
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(ms)
+        record = self._current.get()
+        if record is not None:
+            record["spans"].append((name, ms))
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += n
+
+    def span(self, name):
+        if not self.enabled:
+            return _NOT_RECORDED
+        return _Span(self, name)
+
+    def request(self, name, **attributes):
+        if not self.enabled:
+            return _NOT_RECORDED
+        if self._current.get() is not None:
+            return _Span(self, name)
+        return _Request(self, name, attributes)
+
+    def set_profiling(self, modes):
+        """Switch profiling to `modes`, any of PROFILE_MODES (empty to stop)."""
+        modes = {mode.strip().lower() for mode in modes if mode.strip()}
+        unknown = modes - set(PROFILE_MODES)
+        if unknown:
+            raise ValueError(f"Unknown profiling mode(s) {sorted(unknown)}")
+        import tracemalloc
+
+        if "tracemalloc" in modes:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._tracemalloc = tracemalloc
+        else:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self._tracemalloc = None
+        self.profiling = modes
+
+    def slowest(self, limit=10):
+        with self._lock:
+            records = list(self.recent)
+        return sorted(records, key=lambda record: record["duration_ms"], reverse=True)[:limit]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "spans": {name: h.snapshot() for name, h in sorted(self.histograms.items())},
+            }
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.recent.clear()
+
+
+class _Span:
+    """Context manager timing one span, see Recorder.span()."""
+
+    __slots__ = ("recorder", "name", "start")
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.recorder.observe(self.name, time.perf_counter() - self.start)
+
+
+class _Request:
+    """Context manager for an outermost span, see Recorder.request()."""
+
+    def __init__(self, recorder, name, attributes):
+        self.recorder = recorder
+        self.record = {"name": name, "attributes": attributes, "spans": []}
+        self.profiler = None
+        self.tracer = None
+        self.profiling = False
+
+    def __enter__(self):
+        recorder = self.recorder
+        self.record["started"] = time.time()
+        self.token = recorder._current.set(self.record)
+        if recorder.profiling and recorder._profile_lock.acquire(blocking=False):
+            self.profiling = True
+            self.tracer = recorder._tracemalloc
+            if self.tracer is not None:
+                self.tracer.reset_peak()
+                self.memory_start = self.tracer.get_traced_memory()[0]
+            if "cprofile" in recorder.profiling:
+                import cProfile
+
+                self.profiler = cProfile.Profile()
+                self.profiler.enable()
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        recorder, record = self.recorder, self.record
+        if self.profiling:
+            if self.profiler is not None:
+                self.profiler.disable()
+                record["profile"] = _profile_text(self.profiler)
+            if self.tracer is not None:
+                peak = self.tracer.get_traced_memory()[1]
+                record["memory_peak_kb"] = (peak - self.memory_start) / 1024
+            recorder._profile_lock.release()
+        recorder._current.reset(self.token)
+        record["duration_ms"] = elapsed * 1000
+        recorder.observe(record["name"], elapsed)
+        with recorder._lock:
+            recorder.recent.append(record)
+
+
+class _NotRecorded:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NOT_RECORDED = _NotRecorded()
+
+
+def _profile_text(profiler):
+    import io
+    import pstats
+
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    return out.getvalue()
+
+
+def format_requests(records, out=sys.stdout):
+    """Print requests with their span breakdown (and profile, if captured)."""
+    if not records:
+        print("no requests recorded", file=out)
+    for record in records:
+        started = time.strftime("%H:%M:%S", time.localtime(record["started"]))
+        attributes = " ".join(f"{k}={v}" for k, v in record["attributes"].items())
+        print(f"{record['duration_ms']:9.3f} ms  {started}  {record['name']} {attributes}", file=out)
+        for name, ms in record["spans"]:
+            print(f"    {ms:9.3f} ms  {name}", file=out)
+        if "memory_peak_kb" in record:
+            print(f"    peak traced memory {record['memory_peak_kb']:.1f} KB", file=out)
+        if "profile" in record:
+            for line in record["profile"].strip().splitlines():
+                print(f"    | {line}", file=out)
+
+
+recorder = Recorder(enabled=os.environ.get("DIETIFY_INSTRUMENT", "1") != "0")
+span = recorder.span
+request = recorder.request
+count = recorder.count
+slowest = recorder.slowest
+snapshot = recorder.snapshot
+set_profiling = recorder.set_profiling
+
+if os.environ.get("DIETIFY_PROFILE"):
+    set_profiling(os.environ["DIETIFY_PROFILE"].split(","))
+
+
+def dump(limit=10, out=sys.stdout):
+    """Print the slowest recent requests of this process."""
+    format_requests(slowest(limit), out)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print the slowest recent requests")
+    parser.add_argument("--url", default="http://127.0.0.1:8080", help="server.py address")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    import urllib.request
+
+    url = f"{args.url.rstrip('/')}/debug/requests?limit={args.limit}"
+    with urllib.request.urlopen(url) as response:
+        records = json.load(response)["requests"]
+    format_requests(records)
+
+
+if __name__ == "__main__":
+    main()
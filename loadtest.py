@@ -0,0 +1,117 @@
+"""
+Load test for server.py on localhost.
+
+    python server.py --port 8080 &
+    python loadtest.py --port 8080 --connections 50 --requests 20000
+
+Each connection sends keep-alive POST /recommend requests with random
+profiles back to back; throughput and latency percentiles are printed at
+the end, together with the server's /metrics.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from engine import DIET_PREFERENCES, DIET_TYPES, diet_goals, health_conditions
+
+
+def random_profile(rng):
+    return {
+        "age": rng.randint(5, 80),
+        "height": rng.randint(140, 200),
+        "weight": rng.randint(40, 120),
+        "diet_type": rng.choice(DIET_TYPES),
+        "diet_preference": rng.choice(DIET_PREFERENCES),
+        "health_condition": rng.sample(health_conditions()[1:], rng.randint(0, 2)),
+        "diet_goal": rng.choice(diet_goals()),
+    }
+
+
+async def request(reader, writer, host, method, path, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(
+        (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "\r\n"
+        ).encode("latin-1")
+        + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, count, seed, latencies, errors):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(count):
+            start = time.perf_counter()
+            status, _ = await request(
+                reader, writer, host, "POST", "/recommend", random_profile(rng)
+            )
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(args):
+    latencies = []
+    errors = []
+    per_connection = args.requests // args.connections
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            client(args.host, args.port, per_connection, seed, latencies, errors)
+            for seed in range(args.connections)
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000
+
+    print(
+        f"{len(latencies)} requests over {args.connections} connections "
+        f"in {elapsed:.2f} s: {len(latencies) / elapsed:.0f} req/s, "
+        f"{len(errors)} errors"
+    )
+    print(
+        f"latency p50 {percentile(0.5):.2f} ms, p95 {percentile(0.95):.2f} ms, "
+        f"p99 {percentile(0.99):.2f} ms, max {latencies[-1] * 1000:.2f} ms"
+    )
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, metrics = await request(reader, writer, args.host, "GET", "/metrics")
+    writer.close()
+    print("server metrics:", json.dumps(metrics, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the recommendation service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=10000)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,32 @@
+import getpass
+import itertools
+import os
+import sys
+import time
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
-from PIL import Image, ImageTk
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+import instrument
+from catalog import get_catalog
+from engine import ITEMS_PER_MEAL, MEALS, diet_goals, health_conditions, recommend
+from profile_store import DEFAULT_DB_PATH, BatchedWriter
+from validation import bmi, first_error, validate
+
+
+# window size and theme
+window_width = 870
+window_height = 690
+app_bg = "#457044"
+app_text_bg = "#e9ffcf"
+app_font_size = 14
+app_label_fsize = 12
+app_font_family = "Arial"
+
+padx_value = 30
+pady_value = 3
+x_value = 60
 
 
 def get_output():
@@ -10,273 +34,267 @@ def get_output():
     user_age = age_entry.get()
     user_height = height_entry.get()
     user_weight = weight_entry.get()
-    user_bmi_text = bmi_label.cget("text")
     user_diet_type = diet_type.get()  # "All", "Veg", or "Non-Veg"
     user_diet_preference = diet_type_preference.get()  # "High-Protein", "Keto", "None"
     user_health_condition = (
-        diet_type_health_conditions.get()
-    )  # "None", "Diabetes", etc.
+        selected_health_conditions()
+    )  # ["None"], ["Diabetes", "Hypertension"], etc.
     user_diet_goal = (
         selected_goal if selected_goal else "None"
     )  # "Weight Loss", "Muscle Gain", "Healthy"
 
-    # Validate user input
-    if not (user_age and user_height and user_weight and user_bmi_text):
-        messagebox.showwarning("Input Error", "Please fill in all the required fields!")
+    # Validate user input, with the same checks as bulk user files
+    ages, heights, weights, codes = validate([user_age], [user_height], [user_weight])
+    error = first_error(codes[0])
+    if error is not None:
+        messagebox.showwarning(*error)
         return
-    if int(user_age) > 80 or int(user_age) < 5:
-        messagebox.showwarning("Age Value Error", "Please provide age between 5 and 80")
+
+    # Build the meal plan from the shared in-memory food catalog, on the
+    # worker thread so the window stays responsive
+    submit_recommendation(
+        age=int(ages[0]),
+        height=float(heights[0]),
+        weight=float(weights[0]),
+        diet_type=user_diet_type,
+        diet_preference=user_diet_preference,
+        health_condition=user_health_condition,
+        diet_goal=user_diet_goal,
+        optimize=True,
+    )
+
+
+# worker thread for the recommendation, only the latest OUTPUT click counts
+recommend_executor = ThreadPoolExecutor(max_workers=1)
+pending_request = None  # (request id, future, profile, start) of the latest click
+request_ids = itertools.count(1)
+poll_interval_ms = 20
+
+
+def submit_recommendation(**profile):
+    global pending_request
+    if pending_request is not None:
+        # a stale request that hasn't started yet is dropped, a running one
+        # is left to finish and its result ignored in poll_recommendation()
+        pending_request[1].cancel()
+    request_id = next(request_ids)
+    future = recommend_executor.submit(recommend, **profile)
+    pending_request = (request_id, future, profile, time.perf_counter())
+    root.after(poll_interval_ms, poll_recommendation, request_id, future)
+
+
+def is_file_error(error):
+    """True for errors reading the food catalog: I/O and csv parse errors."""
+    if isinstance(error, OSError):
+        return True
+    # pandas is only loaded when the csv was read, so only then can it fail
+    errors = sys.modules.get("pandas.errors")
+    return errors is not None and isinstance(error, (errors.ParserError, errors.EmptyDataError))
+
+
+def poll_recommendation(request_id, future):
+    global pending_request, shown_profile, shown_plan
+    if pending_request is None or pending_request[0] != request_id:
+        return  # superseded by a newer click
+    if not future.done():
+        root.after(poll_interval_ms, poll_recommendation, request_id, future)
         return
-    if int(user_height) > 300 or int(user_height) < 60:
-        messagebox.showwarning(
-            "Height Value Error", "Please provide height ( in cm ) between 60 and 300"
-        )
+    profile, started = pending_request[2:]
+    pending_request = None
+    try:
+        meal_plan = future.result()
+    except Exception as e:
+        if is_file_error(e):
+            messagebox.showerror("File Error", f"Error reading food_data.csv: {e}")
+        else:
+            messagebox.showerror("Recommendation Error", f"{type(e).__name__}: {e}")
         return
+    shown_profile, shown_plan = profile, meal_plan
+    save_plan(profile, meal_plan)
+    with instrument.span("gui.show_output_popup"):
+        show_output_popup(meal_plan)
+    # from the OUTPUT click to the plan on screen
+    instrument.recorder.observe("gui.output", time.perf_counter() - started)
+
+
+# plans are saved to the profile store by a background writer, see main()
+plan_writer = None
 
-    if int(user_weight) > 500 or int(user_weight) < 30:
-        messagebox.showwarning("Age Value Error", "Please provide age between 5 and 80")
+
+def save_plan(profile, meal_plan):
+    """Queue the plan and the profile it was made for, returns at once."""
+    if plan_writer is None:
         return
-    try:
-        user_bmi = float(user_bmi_text)
-        user_weight = float(user_weight)
-    except ValueError:
-        messagebox.showwarning("Input Error", "Invalid numerical values entered!")
+    plan_writer.save(
+        {
+            "user_id": os.environ.get("DIETIFY_USER") or getpass.getuser(),
+            "age": profile["age"],
+            "height": profile["height"],
+            "weight": profile["weight"],
+            "bmi": round(profile["weight"] / (profile["height"] / 100) ** 2, 2),
+            "diet_type": profile["diet_type"],
+            "diet_preference": profile["diet_preference"],
+            "health_condition": profile["health_condition"],
+            "diet_goal": profile["diet_goal"],
+        },
+        meal_plan,
+    )
+
+
+# the plan in the result window, kept so single items can be swapped
+shown_profile = None
+shown_plan = None
+
+
+pending_substitute = None  # (request id, future, meal, index, plan) of the latest item click
+
+
+def _find_substitute(item, profile, meal, exclude):
+    # imported here so startup doesn't pay for the substitution index
+    from substitutes import find_substitutes
+
+    return find_substitutes(
+        item,
+        k=1,
+        diet_type=profile["diet_type"],
+        health_condition=profile["health_condition"],
+        diet_goal=profile["diet_goal"],
+        meal=meal,
+        exclude=exclude,
+    )
+
+
+def substitute_item(meal, index):
+    """Replace one item of the shown plan with its closest alternative."""
+    global pending_substitute
+    if shown_plan is None or index >= len(shown_plan[meal]):
         return
+    if pending_substitute is not None:
+        pending_substitute[1].cancel()
+    request_id = next(request_ids)
+    # searched on the recommendation worker, the window stays responsive
+    future = recommend_executor.submit(
+        _find_substitute,
+        shown_plan[meal][index],
+        shown_profile,
+        meal,
+        [item for items in shown_plan.values() for item in items],
+    )
+    pending_substitute = (request_id, future, meal, index, shown_plan)
+    root.after(poll_interval_ms, poll_substitute, request_id, future)
+
 
-    # Load food data
+def poll_substitute(request_id, future):
+    global pending_substitute
+    if pending_substitute is None or pending_substitute[0] != request_id:
+        return  # superseded by a newer click
+    if not future.done():
+        root.after(poll_interval_ms, poll_substitute, request_id, future)
+        return
+    meal, index, plan = pending_substitute[2:]
+    pending_substitute = None
+    if plan is not shown_plan:
+        return  # a new plan was shown in the meantime
     try:
-        df = pd.read_csv("food_data.csv")
-    except Exception as e:
-        messagebox.showerror("File Error", f"Error reading food_data.csv: {e}")
+        substitutes = future.result()
+    except ValueError as e:
+        messagebox.showwarning("Substitute Error", str(e))
         return
+    if not substitutes:
+        messagebox.showinfo("No Substitute", "No other food matches your choices")
+        return
+    shown_plan[meal][index] = substitutes[0]
+    with instrument.span("gui.show_output_popup"):
+        show_output_popup(shown_plan)
+
+
+# result window, built on the first OUTPUT click and reused afterwards
+output_window = None
+meal_item_labels = {}  # meal -> pool of ITEMS_PER_MEAL labels
+meal_columns_x = {"breakfast": x_value, "lunch": 340, "snack": 620, "dinner": 900}
+
+
+def build_output_window():
+    global output_window
+    output_window = tk.Toplevel(root, bg=app_bg)
+    output_window.title("Meal Plan Recommendation")
+    top_level_width = 1300
+    top_level_height = 590
+    output_window.geometry(f"{top_level_width}x{top_level_height}")
+    # closing only hides the window so the next click can reuse it
+    output_window.protocol("WM_DELETE_WINDOW", output_window.withdraw)
+    title_label = tk.Label(
+        output_window,
+        text="DIETIFY",
+        font=(app_font_family, 32, "bold"),
+        bg=app_bg,
+        fg="white",
+        border=0,
+    )
+    title_label.place(x=x_value, y=33)
+    project_name_label = tk.Label(
+        output_window,
+        text="PERSONALIZED DIET RECOMMENDATION SYSTEM",
+        font=(app_font_family, app_font_size),
+        bg=app_text_bg,
+        pady=7,
+        padx=15,
+        border=0,
+    )
+    project_name_label.place(x=x_value, y=95)
 
-    # Filtering function
-    def contains_value(cell_value, target):
-        if pd.isna(cell_value):
-            return False
-        return target.lower() in str(cell_value).lower().split(", ")
-
-    # Filter based on Diet Type
-    if user_diet_type != "All":
-        df = df[df["Category"].str.lower() == user_diet_type.lower()]
-
-    # Filter based on Health Condition
-    if user_health_condition == "High cholesterol":
-        df = df[(df["Fats"] < 15) & (df["Fibre"] > 2) & (df["Sugar"] < 5)]
-    elif user_health_condition == "Diabetes":
-        df = df[(df["Sugar"] < 5) & (df["Fibre"] > 4)]
-    elif user_health_condition == "Hypertension":
-        df = df[df["Sodium"] < 400]  # Assuming Sodium column exists
-    elif user_health_condition == "Iron Deficiency":
-        df = df[df["Iron"] > 2]
-
-    # Filter based on Diet Goal
-    if user_diet_goal == "Weight Loss":
-        df = df[(df["Calories"] <= 300)]
-        # Filter based on Diet Preferences
-        if user_diet_preference == "High-Protein":
-            df = df.sort_values(
-                "Protein", ascending=False
-            )  # Prioritize high-protein foods
-        elif user_diet_preference == "Keto":
-            df = df.sort_values(
-                "Carbohydrates", ascending=True
-            )  # Prioritize low-carb foods
-            df = df.sort_values("Fats", ascending=False)  # High-fat for keto
-
-        # df = df.sort_values(["Fibre", "Protein"], ascending=[False, False])
-
-    elif user_diet_goal == "Muscle Gain":
-        df = df[df["Calories"] >= 300]
-
-        # Filter based on Diet Preferences
-        if user_diet_preference == "High-Protein":
-            df = df.sort_values(
-                "Protein", ascending=False
-            )  # Prioritize high-protein foods
-        elif user_diet_preference == "Keto":
-            df = df.sort_values(
-                "Carbohydrates", ascending=True
-            )  # Prioritize low-carb foods
-            df = df.sort_values("Fats", ascending=False)  # High-fat for keto
-
-        # df = df.sort_values(["Protein", "Fats"], ascending=[False, False])
-
-        # if user_bmi < 18.5:  # Underweight: prioritize higher calories
-        #         df_meal = df_meal[df_meal["Calories"] > 500]
-    elif user_diet_goal == "Healthy":
-        df = df[(df["Calories"] > 100) & (df["Calories"] < 300)]
-        # Filter based on Diet Preferences
-        if user_diet_preference == "High-Protein":
-            df = df.sort_values(
-                "Protein", ascending=False
-            )  # Prioritize high-protein foods
-        elif user_diet_preference == "Keto":
-            df = df.sort_values(
-                "Carbohydrates", ascending=True
-            )  # Prioritize low-carb foods
-            df = df.sort_values("Fats", ascending=False)  # High-fat for keto
-
-        # df = df.sort_values(["Fibre", "Protein"], ascending=[False, False])
-
-    # Create meal plan dictionary
-    meal_plan = {"breakfast": [], "lunch": [], "snack": [], "dinner": []}
-
-    for meal in meal_plan.keys():
-        df_meal = df[df["Meal Type"].apply(lambda x: contains_value(x, meal))]
-        meal_plan[meal] = df_meal["Food_items"].head(4).tolist()
-
-    def show_output_popup():
-        output_window = tk.Toplevel(root, bg=app_bg)
-        output_window.title("Meal Plan Recommendation")
-        top_level_width = 1300
-        top_level_height = 590
-        output_window.geometry(f"{top_level_width}x{top_level_height}")
-        title_label = tk.Label(
+    for meal in MEALS:
+        meal_label = tk.Label(
             output_window,
-            text="DIETIFY",
-            font=(app_font_family, 32, "bold"),
-            bg=app_bg,
-            fg="white",
-            border=0,
-        )
-        title_label.place(x=x_value, y=33)
-        project_name_label = tk.Label(
-            output_window,
-            text="PERSONALIZED DIET RECOMMENDATION SYSTEM",
-            font=(app_font_family, app_font_size),
-            bg=app_text_bg,
-            pady=7,
-            padx=15,
-            border=0,
-        )
-        project_name_label.place(x=x_value, y=95)
-        breakfast_label = tk.Label(
-            output_window,
-            text="Breakfast",
-            font=(app_font_family, 18),
-            bg=app_bg,
-            fg="white",
-            border=0,
-        )
-        breakfast_label.place(x=x_value, y=180)
-        breakfast_label = tk.Label(
-            output_window,
-            text="Breakfast",
-            font=(app_font_family, 19),
-            bg=app_bg,
-            fg="white",
-            border=0,
-        )
-        breakfast_label.place(x=x_value, y=180)
-        frame_inside_ow = tk.Frame(
-            output_window,
-            bg=app_text_bg,
-            border=0,
-            pady=10,
-        )
-        frame_inside_ow.place(x=x_value, y=230, height=250)
-        for meal in meal_plan["breakfast"]:
-            each_meal_label = tk.Label(
-                frame_inside_ow,
-                text=meal.capitalize(),
-                font=(app_bg, 14),
-                bg=app_text_bg,
-                fg="#2b3b0f",
-                border=0,
-                padx=5,  # Adjust padding
-                pady=5,  # Adjust padding
-            )
-            each_meal_label.pack(anchor="w", padx=15)  # Align text to the left
-            # /////////
-        lunch_label = tk.Label(
-            output_window,
-            text="Lunch",
+            text=meal.capitalize(),
             font=(app_font_family, 19),
             bg=app_bg,
             fg="white",
             border=0,
         )
-        lunch_label.place(x=340, y=180)
+        meal_label.place(x=meal_columns_x[meal], y=180)
         frame_inside_ow = tk.Frame(
             output_window,
             bg=app_text_bg,
             border=0,
             pady=10,
         )
-        frame_inside_ow.place(x=340, y=230, height=250)
-        for meal in meal_plan["lunch"]:
+        frame_inside_ow.place(x=meal_columns_x[meal], y=230, height=250)
+        meal_item_labels[meal] = []
+        for i in range(ITEMS_PER_MEAL):
             each_meal_label = tk.Label(
                 frame_inside_ow,
-                text=meal.capitalize(),
-                font=(app_bg, 14),
+                font=(app_font_family, 14),
                 bg=app_text_bg,
                 fg="#2b3b0f",
                 border=0,
                 padx=5,  # Adjust padding
                 pady=5,  # Adjust padding
+                cursor="hand2",
             )
-            each_meal_label.pack(anchor="w", padx=15)
-        # /////////
-        snack_label = tk.Label(
-            output_window,
-            text="Snack",
-            font=(app_font_family, 19),
-            bg=app_bg,
-            fg="white",
-            border=0,
-        )
-        snack_label.place(x=620, y=180)
-        frame_inside_ow = tk.Frame(
-            output_window,
-            bg=app_text_bg,
-            border=0,
-            pady=10,
-        )
-        frame_inside_ow.place(x=620, y=230, height=250)
-        for meal in meal_plan["snack"]:
-            each_meal_label = tk.Label(
-                frame_inside_ow,
-                text=meal.capitalize(),
-                font=(app_bg, 14),
-                bg=app_text_bg,
-                fg="#2b3b0f",
-                border=0,
-                padx=5,  # Adjust padding
-                pady=5,  # Adjust padding
+            # clicking an item swaps it for the most similar allowed food
+            each_meal_label.bind(
+                "<Button-1>", lambda event, m=meal, i=i: substitute_item(m, i)
             )
-            each_meal_label.pack(anchor="w", padx=15)
-        # ///////////////
-        dinner_label = tk.Label(
-            output_window,
-            text="Dinner",
-            font=(app_font_family, 19),
-            bg=app_bg,
-            fg="white",
-            border=0,
-        )
-        dinner_label.place(x=900, y=180)
-        frame_inside_ow = tk.Frame(
-            output_window,
-            bg=app_text_bg,
-            border=0,
-            pady=10,
-        )
-        frame_inside_ow.place(x=900, y=230, height=250)
-        for meal in meal_plan["dinner"]:
-            each_meal_label = tk.Label(
-                frame_inside_ow,
-                text=meal.capitalize(),
-                font=(app_bg, 14),
-                bg=app_text_bg,
-                fg="#2b3b0f",
-                border=0,
-                padx=5,  # Adjust padding
-                pady=5,  # Adjust padding
-            )
-            each_meal_label.pack(anchor="w", padx=15)
+            meal_item_labels[meal].append(each_meal_label)
+
+
+def show_output_popup(meal_plan):
+    if output_window is None or not output_window.winfo_exists():
+        build_output_window()
 
-    show_output_popup()
+    # update the pooled labels in place instead of creating new widgets
+    for meal, labels in meal_item_labels.items():
+        items = meal_plan[meal]
+        for i, each_meal_label in enumerate(labels):
+            if i < len(items):
+                each_meal_label.config(text=items[i].capitalize())
+                each_meal_label.pack(anchor="w", padx=15)  # Align text to the left
+            else:
+                each_meal_label.pack_forget()
+
+    output_window.deiconify()
+    output_window.lift()
 
 
 # function that opens app at the center
@@ -317,309 +335,20 @@ def select_goal(goal):
 def calculate_bmi():
 
     try:
-        height = float(height_entry.get()) / 100  # Convert cm to meters
+        height = float(height_entry.get())
         weight = float(weight_entry.get())
-        bmi = weight / (height**2)
-        bmi_label.config(text=f"{bmi:.2f}")
     except ValueError:
         bmi_label.config(text="")
-
-
-root = tk.Tk()
-root.title("Personalized Diet Recommendation System")
-# print(font.families())
-# Set the window size
-window_width = 870
-window_height = 690
-root.geometry(f"{window_width}x{window_height}")
-app_bg = "#457044"
-app_text_bg = "#e9ffcf"
-app_font_size = 14
-app_label_fsize = 12
-app_font_family = "Arial"
-root.configure(bg=app_bg)
-
-padx_value = 30
-pady_value = 3
-x_value = 60
-
-
-# Center the window
-center_window(root, window_width, window_height)
-
-
-# setting an image to background
-def resize_bg(event):
-    """Resize the background image to fit the window."""
-    global bg_img, bg_photo  # Keep references to avoid garbage collection
-
-    # Resize image to match new window size
-    bg_img = external_img.resize((event.width, event.height), Image.Resampling.LANCZOS)
-    bg_photo = ImageTk.PhotoImage(bg_img)
-
-    # Update label background
-    bg_label.config(image=bg_photo)
-    bg_label.image = bg_photo
-
-
-external_img = Image.open("diet-bg-image.jpg")  # Replace with your image
-bg_photo = ImageTk.PhotoImage(external_img)
-bg_label = tk.Label(root, image=bg_photo, border=0)
-# bg_label.place(x=350, y=170, relwidth=0.6, relheight=0.6)
-bg_label.place(x=480, y=370, relwidth=0.5, relheight=0.5)
-root.bind("<Configure>", resize_bg)
-
-
-# validating the user input
-# def validate_input(new_value, field):
-#     """Validate user input based on the given field type."""
-#     if new_value == "":  # Allow empty field (for deletion)
-#         return True
-#     try:
-#         value = float(new_value)
-#         if field == "age" and (0 <= value <= 100):
-#             return True
-#         elif field in ["height"] and (0 <= value <= 500):
-#             return True
-#         elif field in ["weight"] and (0 <= value <= 500):
-#             return True
-#     except ValueError:
-#         return False  # Reject non-numeric input
-
-#     return False  # Reject values outside the range
-
-
-# validate_age = root.register(lambda new_value: validate_input(new_value, "age"))
-# validate_height = root.register(lambda new_value: validate_input(new_value, "height"))
-# validate_weight = root.register(lambda new_value: validate_input(new_value, "weight"))
-
-
-# GUI ka starting
-title_label = tk.Label(
-    root,
-    text="DIETIFY",
-    font=(app_font_family, 32, "bold"),
-    bg=app_bg,
-    fg="white",
-    border=0,
-)
-title_label.place(x=x_value, y=33)
-project_name_label = tk.Label(
-    root,
-    text="PERSONALIZED DIET RECOMMENDATION SYSTEM",
-    font=(app_font_family, app_font_size),
-    bg=app_text_bg,
-    pady=7,
-    padx=15,
-    border=0,
-)
-project_name_label.place(x=x_value, y=95)
-
-
-# Age Field
-age_label = tk.Label(
-    root,
-    text="AGE",
-    font=(app_font_family, app_label_fsize),
-    bg=app_bg,
-    fg="white",
-    border=0,
-)
-age_label.place(x=x_value, y=170)
-age_entry = tk.Entry(
-    root,
-    font=(app_font_family, app_font_size),
-    bg="white",
-    validate="key",
-    # validatecommand=(validate_age, "%P"),
-    border=0,
-)
-age_entry.place(x=x_value, y=203)
-
-
-# managing diet type
-diet_type_label = tk.Label(
-    root,
-    text="DIET TYPE",
-    font=(app_font_family, app_label_fsize),
-    bg=app_bg,
-    fg="white",
-    border=0,
-)
-diet_type_label.place(x=330, y=170)
-diet_type = ttk.Combobox(
-    root,
-    values=["All", "Veg", "Non-Veg"],
-    state="readonly",
-    font=(app_font_family, app_font_size),
-)
-diet_type.place(x=330, y=200)
-diet_type.current(0)
-
-
-# Height Field
-height_label = tk.Label(
-    root,
-    text="HEIGHT IN CM",
-    font=(app_font_family, app_label_fsize),
-    bg=app_bg,
-    fg="white",
-    border=0,
-)
-height_label.place(x=x_value, y=250)
-height_entry = tk.Entry(
-    root,
-    font=(app_font_family, app_font_size),
-    validate="key",
-    # validatecommand=(validate_height, "%P"),
-    border=0,
-)
-height_entry.place(x=x_value, y=280)
-
-
-# managing diet perferences
-diet_preferences = tk.Label(
-    root,
-    text="DIET PREFERENCES",
-    font=(app_font_family, app_label_fsize),
-    bg=app_bg,
-    fg="white",
-    border=0,
-)
-diet_preferences.place(x=330, y=250)
-diet_type_preference = ttk.Combobox(
-    root,
-    values=["None", "High-Protein", "Keto"],
-    state="readonly",
-    font=(app_font_family, app_font_size),
-)
-diet_type_preference.place(x=330, y=280)
-diet_type_preference.current(0)
-
-
-# Weight Field
-weight_label = tk.Label(
-    root,
-    text="WEIGHT IN KG",
-    font=(app_font_family, app_label_fsize),
-    bg=app_bg,
-    fg="white",
-    border=0,
-)
-weight_label.place(x=x_value, y=330)
-weight_entry = tk.Entry(
-    root,
-    font=(app_font_family, app_font_size),
-    validate="key",
-    # validatecommand=(validate_weight, "%P"),
-    border=0,
-)
-weight_entry.place(x=x_value, y=363)
-
-
-# managing user health conditions
-health_condiiton = tk.Label(
-    root,
-    text="HEALTH CONDITIONS",
-    font=(app_font_family, app_label_fsize),
-    bg=app_bg,
-    fg="white",
-    border=0,
-)
-health_condiiton.place(x=330, y=330)
-diet_type_health_conditions = ttk.Combobox(
-    root,
-    values=[
-        "None",
-        "High cholesterol",
-        "Diabetes",
-        "Hypertension",
-        "Iron Deficiency",
-    ],
-    state="readonly",
-    font=(app_font_family, app_font_size),
-)
-diet_type_health_conditions.place(x=330, y=363)
-diet_type_health_conditions.current(0)
-
-
-# Bind KeyRelease events to calculate BMI
-height_entry.bind("<KeyRelease>", lambda event: calculate_bmi())
-weight_entry.bind("<KeyRelease>", lambda event: calculate_bmi())
-
-
-# managing bmi
-bmi_text_label = tk.Label(
-    root,
-    text="BMI",
-    font=(app_font_family, app_label_fsize),
-    bg=app_bg,
-    fg="white",
-    border=0,
-)
-bmi_text_label.place(x=x_value, y=410)
-bmi_label = tk.Label(
-    root,
-    text="BMI : ",
-    font=(app_font_family, app_font_size),
-    bg="white",
-    width=19,
-    anchor="w",
-    padx=5,
-    pady=1,
-    border=0,
-)
-bmi_label.place(x=x_value, y=440)
-
-
-# managing goal
-selected_goal = None
-goal_label = tk.Label(
-    root,
-    text="FITNESS GOAL",
-    font=(app_font_family, app_label_fsize),
-    bg=app_bg,
-    fg="white",
-    border=0,
-)
-goal_label.place(x=x_value, y=490)
-goals = ["Weight Loss", "Muscle Gain", "Healthy"]
-
-
-goal_buttons = []
-frame = tk.Frame(root, bg=app_bg, border=0)
-frame.place(x=x_value, y=520)
-
-for goal in goals:
-    btn = tk.Button(
-        frame,
-        text=goal,
-        font=(app_font_family, app_font_size),
-        width=13,
-        bg=app_text_bg,
-        command=lambda g=goal: select_goal(g),
-        border=0,
-    )
-    # btn.place(x=x_value, y=520)
-    if goal == "Weight Loss":
-        btn.pack(side="left", padx=(0, 10))
-    elif goal == "Healthy":
-        btn.pack(side="left", padx=(10, 0))
+        return
+    if height > 0:
+        bmi_label.config(text=f"{bmi(height, weight):.2f}")
     else:
-        btn.pack(side="left", padx=10)
-    goal_buttons.append((goal, btn))
+        bmi_label.config(text="")
 
 
-# exit_button = tk.Button(
-#     root,
-#     text="Exit",
-#     font=(app_font_family, app_font_size, "bold"),
-#     bg="red",
-# command=exit_app,
-#     border=0,
-#     width=8,
-# )
-# exit_button.place(x=x_value, y=550)
+def selected_health_conditions():
+    selection = diet_type_health_conditions.curselection()
+    return [diet_type_health_conditions.get(i) for i in selection] or ["None"]
 
 
 def get_user_inputs():
@@ -630,7 +359,7 @@ def get_user_inputs():
         user_bmi = bmi_label.cget("text")  # Get displayed BMI text
         user_diet_type = diet_type.get()
         user_diet__type_preference = diet_type_preference.get()
-        user_health_condition = diet_type_health_conditions.get()
+        user_health_condition = ", ".join(selected_health_conditions())
         user_diet_goal = selected_goal if selected_goal else "None"
 
         print("User Inputs:")
@@ -646,18 +375,310 @@ def get_user_inputs():
         print("Error retrieving user inputs:", e)
 
 
-# Add a button to test retrieving inputs
-test_button = tk.Button(
-    root,
-    font=(app_font_family, app_label_fsize),
-    bg=app_text_bg,
-    text="OUTPUT",
-    command=get_output,
-    width=16,
-    pady=3,
-    border=0,
-)
-test_button.place(x=x_value, y=590)
+selected_goal = None
+
+
+def main():
+    global root, external_img, bg_photo, bg_label, bg_resizer, goal_buttons
+    global plan_writer
+    global age_entry, height_entry, weight_entry, bmi_label
+    global diet_type, diet_type_preference, diet_type_health_conditions
+
+    # PIL is only needed once the window is built
+    from PIL import Image, ImageTk
+
+    from background import BackgroundResizer
+
+    root = tk.Tk()
+    root.title("Personalized Diet Recommendation System")
+    # print(font.families())
+    # Set the window size
+    root.geometry(f"{window_width}x{window_height}")
+    root.configure(bg=app_bg)
+
+    # Center the window
+    center_window(root, window_width, window_height)
+
+    external_img = Image.open("diet-bg-image.jpg")  # Replace with your image
+    bg_photo = ImageTk.PhotoImage(external_img)
+    bg_label = tk.Label(root, image=bg_photo, border=0)
+    # bg_label.place(x=350, y=170, relwidth=0.6, relheight=0.6)
+    bg_label.place(x=480, y=370, relwidth=0.5, relheight=0.5)
+
+    # setting an image to background, resized off the main thread
+    bg_resizer = BackgroundResizer(root, bg_label, external_img)
+    root.bind("<Configure>", bg_resizer.on_configure)
+
+    # validating the user input
+    # def validate_input(new_value, field):
+    #     """Validate user input based on the given field type."""
+    #     if new_value == "":  # Allow empty field (for deletion)
+    #         return True
+    #     try:
+    #         value = float(new_value)
+    #         if field == "age" and (0 <= value <= 100):
+    #             return True
+    #         elif field in ["height"] and (0 <= value <= 500):
+    #             return True
+    #         elif field in ["weight"] and (0 <= value <= 500):
+    #             return True
+    #     except ValueError:
+    #         return False  # Reject non-numeric input
+
+    #     return False  # Reject values outside the range
+
+    # validate_age = root.register(lambda new_value: validate_input(new_value, "age"))
+    # validate_height = root.register(lambda new_value: validate_input(new_value, "height"))
+    # validate_weight = root.register(lambda new_value: validate_input(new_value, "weight"))
+
+    # GUI ka starting
+    title_label = tk.Label(
+        root,
+        text="DIETIFY",
+        font=(app_font_family, 32, "bold"),
+        bg=app_bg,
+        fg="white",
+        border=0,
+    )
+    title_label.place(x=x_value, y=33)
+    project_name_label = tk.Label(
+        root,
+        text="PERSONALIZED DIET RECOMMENDATION SYSTEM",
+        font=(app_font_family, app_font_size),
+        bg=app_text_bg,
+        pady=7,
+        padx=15,
+        border=0,
+    )
+    project_name_label.place(x=x_value, y=95)
+
+    # Age Field
+    age_label = tk.Label(
+        root,
+        text="AGE",
+        font=(app_font_family, app_label_fsize),
+        bg=app_bg,
+        fg="white",
+        border=0,
+    )
+    age_label.place(x=x_value, y=170)
+    age_entry = tk.Entry(
+        root,
+        font=(app_font_family, app_font_size),
+        bg="white",
+        validate="key",
+        # validatecommand=(validate_age, "%P"),
+        border=0,
+    )
+    age_entry.place(x=x_value, y=203)
+
+    # managing diet type
+    diet_type_label = tk.Label(
+        root,
+        text="DIET TYPE",
+        font=(app_font_family, app_label_fsize),
+        bg=app_bg,
+        fg="white",
+        border=0,
+    )
+    diet_type_label.place(x=330, y=170)
+    diet_type = ttk.Combobox(
+        root,
+        values=["All", "Veg", "Non-Veg"],
+        state="readonly",
+        font=(app_font_family, app_font_size),
+    )
+    diet_type.place(x=330, y=200)
+    diet_type.current(0)
+
+    # Height Field
+    height_label = tk.Label(
+        root,
+        text="HEIGHT IN CM",
+        font=(app_font_family, app_label_fsize),
+        bg=app_bg,
+        fg="white",
+        border=0,
+    )
+    height_label.place(x=x_value, y=250)
+    height_entry = tk.Entry(
+        root,
+        font=(app_font_family, app_font_size),
+        validate="key",
+        # validatecommand=(validate_height, "%P"),
+        border=0,
+    )
+    height_entry.place(x=x_value, y=280)
+
+    # managing diet perferences
+    diet_preferences = tk.Label(
+        root,
+        text="DIET PREFERENCES",
+        font=(app_font_family, app_label_fsize),
+        bg=app_bg,
+        fg="white",
+        border=0,
+    )
+    diet_preferences.place(x=330, y=250)
+    diet_type_preference = ttk.Combobox(
+        root,
+        values=["None", "High-Protein", "Keto"],
+        state="readonly",
+        font=(app_font_family, app_font_size),
+    )
+    diet_type_preference.place(x=330, y=280)
+    diet_type_preference.current(0)
+
+    # Weight Field
+    weight_label = tk.Label(
+        root,
+        text="WEIGHT IN KG",
+        font=(app_font_family, app_label_fsize),
+        bg=app_bg,
+        fg="white",
+        border=0,
+    )
+    weight_label.place(x=x_value, y=330)
+    weight_entry = tk.Entry(
+        root,
+        font=(app_font_family, app_font_size),
+        validate="key",
+        # validatecommand=(validate_weight, "%P"),
+        border=0,
+    )
+    weight_entry.place(x=x_value, y=363)
+
+    # managing user health conditions
+    health_condiiton = tk.Label(
+        root,
+        text="HEALTH CONDITIONS",
+        font=(app_font_family, app_label_fsize),
+        bg=app_bg,
+        fg="white",
+        border=0,
+    )
+    health_condiiton.place(x=330, y=330)
+    diet_type_health_conditions = tk.Listbox(
+        root,
+        selectmode="multiple",
+        exportselection=False,
+        height=4,
+        width=20,
+        font=(app_font_family, app_font_size),
+        border=0,
+    )
+    # several conditions can be selected, none selected means "None"
+    for condition in health_conditions()[1:]:
+        diet_type_health_conditions.insert("end", condition)
+    diet_type_health_conditions.place(x=330, y=363)
+
+    # Bind KeyRelease events to calculate BMI
+    height_entry.bind("<KeyRelease>", lambda event: calculate_bmi())
+    weight_entry.bind("<KeyRelease>", lambda event: calculate_bmi())
+
+    # managing bmi
+    bmi_text_label = tk.Label(
+        root,
+        text="BMI",
+        font=(app_font_family, app_label_fsize),
+        bg=app_bg,
+        fg="white",
+        border=0,
+    )
+    bmi_text_label.place(x=x_value, y=410)
+    bmi_label = tk.Label(
+        root,
+        text="BMI : ",
+        font=(app_font_family, app_font_size),
+        bg="white",
+        width=19,
+        anchor="w",
+        padx=5,
+        pady=1,
+        border=0,
+    )
+    bmi_label.place(x=x_value, y=440)
+
+    # managing goal
+    goal_label = tk.Label(
+        root,
+        text="FITNESS GOAL",
+        font=(app_font_family, app_label_fsize),
+        bg=app_bg,
+        fg="white",
+        border=0,
+    )
+    goal_label.place(x=x_value, y=490)
+    goals = diet_goals()[1:]
+
+    goal_buttons = []
+    frame = tk.Frame(root, bg=app_bg, border=0)
+    frame.place(x=x_value, y=520)
+
+    for i, goal in enumerate(goals):
+        btn = tk.Button(
+            frame,
+            text=goal,
+            font=(app_font_family, app_font_size),
+            width=13,
+            bg=app_text_bg,
+            command=lambda g=goal: select_goal(g),
+            border=0,
+        )
+        # btn.place(x=x_value, y=520)
+        # no outer padding on the first and last button
+        btn.pack(side="left", padx=(0 if i == 0 else 10, 0 if i == len(goals) - 1 else 10))
+        goal_buttons.append((goal, btn))
+
+    # exit_button = tk.Button(
+    #     root,
+    #     text="Exit",
+    #     font=(app_font_family, app_font_size, "bold"),
+    #     bg="red",
+    # command=exit_app,
+    #     border=0,
+    #     width=8,
+    # )
+    # exit_button.place(x=x_value, y=550)
+
+    # Add a button to test retrieving inputs
+    test_button = tk.Button(
+        root,
+        font=(app_font_family, app_label_fsize),
+        bg=app_text_bg,
+        text="OUTPUT",
+        command=get_output,
+        width=16,
+        pady=3,
+        border=0,
+    )
+    test_button.place(x=x_value, y=590)
+
+    # load the food catalog once at startup so OUTPUT clicks reuse it. The
+    # precomputed plan table isn't built: the GUI always optimizes for the
+    # profile's calorie targets, which the table doesn't cover.
+    try:
+        get_catalog()
+    except Exception as e:
+        print("Error reading food_data.csv:", e)
+
+    try:
+        plan_writer = BatchedWriter(DEFAULT_DB_PATH)
+    except Exception as e:
+        print("Error opening the profile store:", e)
+
+    root.mainloop()
+
+    bg_resizer.close()
+    if plan_writer is not None:
+        plan_writer.close()
+    recommend_executor.shutdown(wait=False, cancel_futures=True)
+    if os.environ.get("DIETIFY_FRAME_STATS"):
+        print("Background resize stats:", bg_resizer.stats())
+    if os.environ.get("DIETIFY_SLOW_REQUESTS"):
+        print("Span stats:", instrument.snapshot())
+        instrument.dump(int(os.environ["DIETIFY_SLOW_REQUESTS"]))
 
 
-root.mainloop()
+if __name__ == "__main__":
+    main()
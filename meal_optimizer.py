@@ -0,0 +1,198 @@
+"""
+Calorie targets from the user's body measurements, and a meal plan optimizer
+that picks items to hit them.
+
+BMR uses the Mifflin-St Jeor equation. The GUI doesn't ask for sex, so the
+constant is the midpoint of the male (+5) and female (-161) ones. Each meal
+gets a fixed share of the day's calories and protein, and optimize_meal()
+picks up to k items for it with a small knapsack DP over 10 kcal and 2 g
+protein buckets.
+"""
+import time
+
+import numpy as np
+
+from catalog import MEAL_BITS
+from ranking import sort_keys, top_k
+
+
+ACTIVITY_FACTOR = 1.375  # lightly active
+GOAL_CALORIE_ADJUSTMENT = {"Weight Loss": -500, "Muscle Gain": 300}
+MIN_DAILY_CALORIES = 1200
+# grams of protein per kg of body weight
+PROTEIN_PER_KG = {"Muscle Gain": 1.6}
+DEFAULT_PROTEIN_PER_KG = 0.8
+
+MEAL_SHARES = {"breakfast": 0.25, "lunch": 0.35, "snack": 0.10, "dinner": 0.30}
+
+CALORIE_BUCKET = 10  # kcal per DP bucket
+CALORIE_TOLERANCE = 0.10  # meals within 10% of their target count as a hit
+CANDIDATES_PER_MEAL = 40
+PROTEIN_BUCKET = 2  # g per DP bucket
+# value lost per gram of protein below a meal's share of the daily target
+PROTEIN_SHORTFALL_PENALTY = 1.0
+
+
+def bmr(age, height, weight):
+    """Basal metabolic rate in kcal/day, height in cm and weight in kg."""
+    return 10 * weight + 6.25 * height - 5 * age - 78
+
+
+def daily_targets(age, height, weight, diet_goal="None", activity=ACTIVITY_FACTOR):
+    """
+    Daily calorie (TDEE adjusted for the goal) and protein targets.
+    :return: Dict with "calories" (kcal) and "protein" (g).
+    """
+    tdee = bmr(age, height, weight) * activity
+    calories = max(tdee + GOAL_CALORIE_ADJUSTMENT.get(diet_goal, 0), MIN_DAILY_CALORIES)
+    protein = weight * PROTEIN_PER_KG.get(diet_goal, DEFAULT_PROTEIN_PER_KG)
+    return {"calories": round(calories), "protein": round(protein)}
+
+
+def item_values(columns, rows, diet_preference):
+    """What the optimizer maximizes for each item once calories are on target."""
+    if diet_preference == "Keto":
+        return columns["Fats"][rows] - columns["Carbohydrates"][rows]
+    return columns["Protein"][rows]
+
+
+def _add_protein(candidate, protein_weight, cap):
+    """
+    Move DP states up by `protein_weight` (> 0) protein buckets along the
+    last axis, merging all that reach `cap` or beyond into the cap bucket.
+    :return: (shifted states, protein bucket each cap state came from)
+    """
+    shifted = np.full_like(candidate, -np.inf)
+    if protein_weight < cap:
+        shifted[..., protein_weight:cap] = candidate[..., : cap - protein_weight]
+    first = max(cap - protein_weight, 0)
+    tail = candidate[..., first:]
+    best_tail = tail.argmax(axis=-1)
+    shifted[..., cap] = np.take_along_axis(tail, best_tail[..., None], axis=-1)[..., 0]
+    return shifted, best_tail + first
+
+
+def optimize_meal(
+    calories, values, target_calories, k, time_budget=None, protein=None, target_protein=0
+):
+    """
+    Choose between 1 and k items whose calories add up close to the target,
+    maximizing the summed values among the choices within CALORIE_TOLERANCE.
+    When nothing lands within tolerance, the closest calorie total wins.
+    With `protein` (g per item), every gram the choice falls short of
+    `target_protein` costs PROTEIN_SHORTFALL_PENALTY of value.
+
+    0/1 knapsack DP over (items taken, calorie bucket, protein bucket), the
+    protein capped at the target; with n candidates, B calorie and P protein
+    buckets it costs O(n * k * B * P). When `time_budget` (seconds) runs out,
+    the items seen so far are used, which still gives a valid plan.
+    :return: Indices into `calories` / `values`.
+    """
+    n = len(calories)
+    if n == 0 or k < 1:
+        return []
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+
+    buckets = int(2 * target_calories // CALORIE_BUCKET) + 2
+    weights = np.clip(
+        np.rint(np.nan_to_num(calories) / CALORIE_BUCKET).astype(np.int64),
+        0,
+        buckets - 1,
+    )
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    if protein is None or target_protein <= 0:
+        cap = 0
+        protein_weights = np.zeros(n, dtype=np.int64)
+    else:
+        cap = int(np.ceil(target_protein / PROTEIN_BUCKET))
+        protein_weights = np.clip(
+            np.rint(np.nan_to_num(protein) / PROTEIN_BUCKET).astype(np.int64), 0, cap
+        )
+
+    # best[c, b, p]: best value with c items totalling calorie bucket b and
+    # protein bucket p (or more, for p == cap), -inf if unreachable
+    best = np.full((k + 1, buckets, cap + 1), -np.inf)
+    best[0, 0, 0] = 0.0
+    # protein bucket a state came from when item i improved it, else -1
+    came_from = np.full((n, k + 1, buckets, cap + 1), -1, dtype=np.int16)
+    seen = n
+    for i in range(n):
+        if deadline is not None and time.perf_counter() > deadline:
+            seen = i
+            break
+        w, wp = weights[i], protein_weights[i]
+        # every item count at once, all from the states before item i
+        candidate = best[:-1, : buckets - w] + values[i]
+        if wp:
+            candidate, cap_source = _add_protein(candidate, wp, cap)
+        states = best[1:, w:]
+        improved = candidate > states
+        if not improved.any():
+            continue
+        states[improved] = candidate[improved]
+        counts, rows, protein_buckets = np.nonzero(improved)
+        source = protein_buckets - wp
+        if wp:
+            at_cap = protein_buckets == cap
+            source[at_cap] = cap_source[counts[at_cap], rows[at_cap]]
+        came_from[i, counts + 1, rows + w, protein_buckets] = source
+
+    # pick the end state: best score within tolerance, else best score among
+    # the closest calorie totals
+    reachable = np.isfinite(best[1:])
+    if not reachable.any():
+        return []
+    totals = np.arange(buckets) * CALORIE_BUCKET
+    error = np.abs(totals - target_calories)
+    candidates = reachable & (error <= CALORIE_TOLERANCE * target_calories)[None, :, None]
+    if not candidates.any():
+        errors = np.where(reachable, error[None, :, None], np.inf)
+        candidates = errors == errors.min()
+    shortfall = np.zeros(cap + 1)
+    if cap:
+        shortfall = np.maximum(target_protein - np.arange(cap + 1) * PROTEIN_BUCKET, 0)
+    scores = np.where(candidates, best[1:] - PROTEIN_SHORTFALL_PENALTY * shortfall, -np.inf)
+    c, b, p = np.unravel_index(np.argmax(scores), scores.shape)
+    c += 1
+
+    # walk the items backwards to recover the choice
+    chosen = []
+    for i in range(seen - 1, -1, -1):
+        if c and came_from[i, c, b, p] >= 0:
+            chosen.append(i)
+            p = came_from[i, c, b, p]
+            b -= weights[i]
+            c -= 1
+    return chosen[::-1]
+
+
+def optimized_plan(catalog, rows, diet_preference, targets, meals, k, time_budget=0.05):
+    """
+    Meal plan that spreads `targets` over the meals.
+    :param rows: Catalog row positions that passed the filters.
+    :param time_budget: Seconds allowed per meal, see optimize_meal().
+    :return: Dict of meal -> list of food names.
+    """
+    meal_plan = {}
+    used = np.zeros(len(catalog), dtype=bool)
+    meal_bits = catalog.meal_bits[rows]
+    for meal in meals:
+        in_meal = rows[((meal_bits & MEAL_BITS[meal]) != 0) & ~used[rows]]
+        # only the best ranked candidates go into the DP
+        pool = top_k(
+            in_meal, sort_keys(catalog.columns, in_meal, diet_preference), CANDIDATES_PER_MEAL
+        )
+        chosen = pool[
+            optimize_meal(
+                catalog.columns["Calories"][pool],
+                item_values(catalog.columns, pool, diet_preference),
+                targets["calories"] * MEAL_SHARES[meal],
+                k,
+                time_budget,
+                protein=catalog.columns["Protein"][pool],
+                target_protein=targets["protein"] * MEAL_SHARES[meal],
+            )
+        ]
+        used[chosen] = True
+        meal_plan[meal] = catalog.names[chosen].tolist()
+    return meal_plan
@@ -0,0 +1,252 @@
+"""
+Precomputed meal plans for every combination of the GUI's inputs.
+
+    python plan_table.py [--catalog food_data.csv] [--workers 4] [--verify all]
+
+With one health condition at a time the top ranked plan only depends on
+3 diet types x 3 preferences x the health conditions and goals of the rule
+table (plus "None" for each), 3 x 3 x 5 x 4 = 180 filter keys with
+diet_rules.csv as shipped, so they can all be built up front for a catalog
+version. A PlanTable holds them compactly: the distinct food names once,
+and per key and meal the positions of its foods in that list. Looking a
+plan up is a dict access and 16 list reads.
+
+PrecomputedPlans keeps the table of the current catalog. Once a lookup sees
+a different catalog fingerprint it rebuilds the table in the background,
+across worker processes when given an executor, and answers None until the
+new one is ready. Each new table is checked against engine.build_plan() for
+a sample of keys (all of them with --verify all) before it is used.
+"""
+import argparse
+import itertools
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+import instrument
+from catalog import get_catalog
+
+
+# keys checked against the engine before a rebuilt table is used
+VERIFY_SAMPLE = 8
+
+
+def all_keys():
+    """The filter keys of every single-condition input combination."""
+    # imported here, engine imports this module
+    from engine import DIET_PREFERENCES, DIET_TYPES, diet_goals, filter_key, health_conditions
+
+    return [
+        filter_key(*combination)
+        for combination in itertools.product(
+            DIET_TYPES, DIET_PREFERENCES, health_conditions(), diet_goals()
+        )
+    ]
+
+
+class PlanTable:
+    def __init__(self, fingerprint, keys, plans):
+        """
+        :param keys: Filter keys, as engine.filter_key() returns them.
+        :param plans: The meal plan of each key, in the same order.
+        """
+        from engine import ITEMS_PER_MEAL, MEALS
+
+        self.fingerprint = fingerprint
+        self.meals = MEALS
+        self.index = {key: i for i, key in enumerate(keys)}
+        self.names = []
+        codes_by_name = {}
+        # -1 pads meals with fewer than ITEMS_PER_MEAL foods
+        self.codes = np.full((len(keys), len(MEALS), ITEMS_PER_MEAL), -1, dtype=np.int32)
+        for i, meal_plan in enumerate(plans):
+            for m, meal in enumerate(MEALS):
+                for j, name in enumerate(meal_plan[meal]):
+                    code = codes_by_name.get(name)
+                    if code is None:
+                        code = codes_by_name[name] = len(self.names)
+                        self.names.append(name)
+                    self.codes[i, m, j] = code
+
+    def __len__(self):
+        return len(self.index)
+
+    def plan(self, key):
+        """The meal plan of `key`, or None when the key isn't in the table."""
+        i = self.index.get(key)
+        if i is None:
+            return None
+        names = self.names
+        return {
+            meal: [names[code] for code in codes if code >= 0]
+            for meal, codes in zip(self.meals, self.codes[i].tolist())
+        }
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + sum(len(name) for name in self.names)
+
+
+def _build_plans(path, keys):
+    """Plans for `keys` from the shared catalog of `path` (runs in the workers)."""
+    from engine import build_plan
+
+    catalog = get_catalog(path)
+    return [build_plan(catalog, key) for key in keys]
+
+
+def build_table(catalog, keys=None, executor=None, chunks=4):
+    """
+    Build the plan of every key, in `executor` when given one.
+    Worker processes load the catalog from its path, so an executor is only
+    used for catalogs read from a file.
+    :param chunks: Number of pieces the keys are split into for the executor,
+        best one per worker.
+    """
+    from engine import build_plan
+
+    keys = all_keys() if keys is None else list(keys)
+    catalog = catalog.snapshot()
+    with instrument.span("plan_table.build"):
+        if executor is None or catalog.path is None:
+            plans = [build_plan(catalog, key) for key in keys]
+        else:
+            size = -(-len(keys) // chunks)
+            futures = [
+                executor.submit(_build_plans, catalog.path, keys[i : i + size])
+                for i in range(0, len(keys), size)
+            ]
+            plans = [plan for future in futures for plan in future.result()]
+    return PlanTable(catalog.fingerprint, keys, plans)
+
+
+def verify_table(table, catalog, sample=None, seed=None):
+    """
+    Compare table plans with engine.build_plan() on `catalog`.
+    :param sample: Number of random keys to check, None for all of them.
+    :return: The keys whose plans differ.
+    """
+    from engine import build_plan
+
+    keys = list(table.index)
+    if sample is not None and sample < len(keys):
+        keys = random.Random(seed).sample(keys, sample)
+    with instrument.span("plan_table.verify"):
+        return [key for key in keys if table.plan(key) != build_plan(catalog, key)]
+
+
+class PrecomputedPlans:
+    """
+    The plan table of the current catalog, rebuilt when the catalog changes
+    once start() has been called (engine.recommend() and server.py read it).
+    """
+
+    def __init__(self, auto_build=False, executor=None, chunks=4, verify_sample=VERIFY_SAMPLE):
+        self.auto_build = auto_build
+        self.executor = executor
+        self.chunks = chunks
+        self.verify_sample = verify_sample
+        self.table = None
+        self.counts = {"builds": 0, "discarded": 0}
+        self._discarded = None  # fingerprint whose table failed verification
+        self._building = threading.Lock()
+
+    def start(self, catalog):
+        """
+        Turn on `auto_build` and build the table of `catalog` in the background.
+        :return: The building thread, or None when a build is already running.
+        """
+        self.auto_build = True
+        return self._rebuild_in_background(catalog)
+
+    def get(self, key, catalog):
+        """The precomputed plan of `key`, or None if there is none (yet)."""
+        table = self.table
+        if table is None or table.fingerprint != catalog.fingerprint:
+            if self.auto_build:
+                self._rebuild_in_background(catalog)
+            return None
+        return table.plan(key)
+
+    def _rebuild_in_background(self, catalog):
+        if catalog.fingerprint == self._discarded or self._building.locked():
+            return None
+        thread = threading.Thread(
+            target=self.rebuild, args=(catalog,), name="plan-table", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def rebuild(self, catalog):
+        """Build and verify the table of `catalog`; returns it, or None if discarded."""
+        with self._building:
+            if self.table is not None and self.table.fingerprint == catalog.fingerprint:
+                return self.table
+            snapshot = catalog.snapshot()
+            table = build_table(snapshot, executor=self.executor, chunks=self.chunks)
+            mismatches = verify_table(table, snapshot, self.verify_sample)
+            # an edit during the build makes the table stale, not wrong
+            if table.fingerprint != catalog.fingerprint:
+                return None
+            if mismatches:
+                # not retried until the catalog changes again
+                self._discarded = table.fingerprint
+                self.counts["discarded"] += 1
+                instrument.count("plan_table.discarded")
+                return None
+            self.table = table
+            self.counts["builds"] += 1
+            return table
+
+    def stats(self):
+        table = self.table
+        return {
+            **self.counts,
+            "keys": len(table) if table is not None else 0,
+            "bytes": table.nbytes if table is not None else 0,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and check the precomputed plan table")
+    parser.add_argument("--catalog", help="catalog csv or store (default: food_data.csv)")
+    parser.add_argument("--workers", type=int, default=1, help="processes to build in")
+    parser.add_argument(
+        "--verify",
+        default=str(VERIFY_SAMPLE),
+        help="number of random keys to check against the engine, or 'all'",
+    )
+    args = parser.parse_args(argv)
+
+    catalog = get_catalog(args.catalog) if args.catalog else get_catalog()
+    executor = None
+    if args.workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=get_catalog)
+    try:
+        start = time.perf_counter()
+        table = build_table(catalog, executor=executor, chunks=args.workers)
+        elapsed = time.perf_counter() - start
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    print(
+        f"{len(table)} plans for {len(catalog)} foods in {elapsed * 1000:.1f} ms, "
+        f"{len(table.names)} distinct foods, {table.nbytes} bytes"
+    )
+    sample = None if args.verify == "all" else int(args.verify)
+    mismatches = verify_table(table, catalog, sample)
+    checked = len(table) if sample is None else min(sample, len(table))
+    print(f"verified {checked} plans against the engine: {len(mismatches)} mismatches")
+    for key in mismatches:
+        print(f"  {key}", file=sys.stderr)
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
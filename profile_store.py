@@ -0,0 +1,317 @@
+"""
+User profiles and their meal plan history, in SQLite.
+
+    python profile_store.py dietify.db [--user alice] [--history 5]
+
+Profiles are keyed by a user id string and upserted, every generated plan is
+appended to the user's history. Writes from the GUI and the HTTP service go
+through a BatchedWriter: save() only queues the plan, and a background
+thread commits whatever has queued up in one transaction, so saving never
+waits on the disk.
+"""
+import argparse
+import copy
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_DB_PATH = "dietify.db"
+
+PROFILE_FIELDS = (
+    "age",
+    "height",
+    "weight",
+    "bmi",
+    "diet_type",
+    "diet_preference",
+    "health_condition",
+    "diet_goal",
+)
+NUMBER_FIELDS = ("age", "height", "weight", "bmi")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL UNIQUE,
+    age INTEGER,
+    height REAL,
+    weight REAL,
+    bmi REAL,
+    diet_type TEXT,
+    diet_preference TEXT,
+    health_condition TEXT,
+    diet_goal TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER PRIMARY KEY,
+    user INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    created_at REAL NOT NULL,
+    meal_plan TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plans_by_user ON plans (user, created_at);
+CREATE INDEX IF NOT EXISTS users_by_filters
+    ON users (diet_type, diet_preference, diet_goal);
+"""
+
+UPSERT_PROFILE = f"""
+INSERT INTO users (user_id, {", ".join(PROFILE_FIELDS)}, updated_at)
+VALUES (?, {", ".join("?" for _ in PROFILE_FIELDS)}, ?)
+ON CONFLICT (user_id) DO UPDATE SET
+    {", ".join(f"{field} = COALESCE(excluded.{field}, {field})" for field in PROFILE_FIELDS)},
+    updated_at = excluded.updated_at
+"""
+
+INSERT_PLAN = """
+INSERT INTO plans (user, created_at, meal_plan)
+SELECT id, ?, ? FROM users WHERE user_id = ?
+"""
+
+
+def _health_condition_text(value):
+    # several conditions are kept the way the GUI and batch files write them
+    if value is None or isinstance(value, str):
+        return value
+    return "; ".join(value)
+
+
+def checked_profile(profile):
+    """
+    Copy of `profile` with every field in the type the store keeps: numbers
+    as float, the rest as text, several health conditions joined.
+    :raise ValueError: For a missing user id or a field that can't be stored.
+    """
+    if profile.get("user_id") is None:
+        raise ValueError("profile has no user_id")
+    checked = {"user_id": str(profile["user_id"])}
+    for field in PROFILE_FIELDS:
+        value = profile.get(field)
+        if value is None:
+            checked[field] = None
+        elif field in NUMBER_FIELDS:
+            try:
+                checked[field] = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{field} must be a number, not {value!r}") from None
+        elif field == "health_condition" and isinstance(value, (list, tuple)):
+            if not all(isinstance(condition, str) for condition in value):
+                raise ValueError(f"{field} must be a string or a list of strings")
+            checked[field] = _health_condition_text(value)
+        elif isinstance(value, str):
+            checked[field] = value
+        else:
+            raise ValueError(f"{field} must be a string, not {value!r}")
+    return checked
+
+
+class ProfileStore:
+    """
+    One SQLite connection. Like any sqlite3 connection it must only be used
+    from the thread that opened it; other threads use a BatchedWriter.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        # WAL lets readers carry on while the writer commits
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def _profile_row(self, profile, now):
+        return (
+            str(profile["user_id"]),
+            *(
+                _health_condition_text(profile.get(field))
+                if field == "health_condition"
+                else profile.get(field)
+                for field in PROFILE_FIELDS
+            ),
+            now,
+        )
+
+    def upsert_profiles(self, profiles):
+        """
+        Insert or update profiles in one transaction. Fields missing from
+        a profile keep their stored value.
+        :param profiles: Iterable of dicts with "user_id" and PROFILE_FIELDS.
+        :return: Number of profiles written.
+        """
+        now = time.time()
+        with self.connection:
+            cursor = self.connection.executemany(
+                UPSERT_PROFILE, (self._profile_row(p, now) for p in profiles)
+            )
+        return cursor.rowcount
+
+    def add_plans(self, plans):
+        """
+        Append plans to their users' histories in one transaction.
+        :param plans: Iterable of (user_id, meal_plan) pairs; plans of
+            unknown users are dropped.
+        """
+        now = time.time()
+        with self.connection:
+            cursor = self.connection.executemany(
+                INSERT_PLAN,
+                ((now, json.dumps(meal_plan), str(user_id)) for user_id, meal_plan in plans),
+            )
+        return cursor.rowcount
+
+    def save(self, entries):
+        """
+        Upsert profiles and append their plans, all in one transaction.
+        :param entries: Iterable of (profile, meal_plan) pairs.
+        """
+        entries = list(entries)
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                UPSERT_PROFILE, (self._profile_row(p, now) for p, _ in entries)
+            )
+            self.connection.executemany(
+                INSERT_PLAN,
+                ((now, json.dumps(plan), str(p["user_id"])) for p, plan in entries),
+            )
+        return len(entries)
+
+    def get_profile(self, user_id):
+        row = self.connection.execute(
+            f"SELECT user_id, {', '.join(PROFILE_FIELDS)}, updated_at "
+            "FROM users WHERE user_id = ?",
+            (str(user_id),),
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def plan_history(self, user_id, limit=10):
+        """The user's latest plans, newest first, as (created_at, meal_plan)."""
+        rows = self.connection.execute(
+            """
+            SELECT plans.created_at, plans.meal_plan
+            FROM plans JOIN users ON plans.user = users.id
+            WHERE users.user_id = ?
+            ORDER BY plans.created_at DESC, plans.id DESC
+            LIMIT ?
+            """,
+            (str(user_id), limit),
+        ).fetchall()
+        return [(row["created_at"], json.loads(row["meal_plan"])) for row in rows]
+
+    def counts(self):
+        return {
+            table: self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("users", "plans")
+        }
+
+    def close(self):
+        self.connection.close()
+
+
+class BatchedWriter:
+    """
+    Saves (profile, meal_plan) pairs from any thread without blocking.
+    A background thread owns the ProfileStore and commits the queued pairs
+    in batches of up to `max_batch`, at least every `flush_interval` seconds.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, max_batch=1000, flush_interval=0.2):
+        self.path = path
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.counts = {"saved": 0, "batches": 0, "errors": 0}
+        self._queue = queue.Queue()
+        self._ready = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="profile-writer", daemon=True)
+        self._thread.start()
+        # the store is opened on the writer thread, wait until it is usable
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def save(self, profile, meal_plan):
+        """
+        Queue one plan for `profile` (a dict with "user_id"), returns at once.
+        The plan is copied, so the caller can go on editing its own.
+        :raise ValueError: If the profile can't be stored, see checked_profile().
+        """
+        self._queue.put((checked_profile(profile), copy.deepcopy(meal_plan)))
+
+    def _write(self, store, batch):
+        try:
+            store.save(batch)
+        except Exception:
+            if len(batch) == 1:
+                self.counts["errors"] += 1
+                return
+            # one bad entry must not cost the rest of the batch
+            for entry in batch:
+                self._write(store, [entry])
+            return
+        self.counts["saved"] += len(batch)
+        self.counts["batches"] += 1
+
+    def _run(self):
+        try:
+            store = ProfileStore(self.path)
+        except sqlite3.Error as e:
+            self._error = e
+            return
+        finally:
+            self._ready.set()
+        closing = False
+        while not closing:
+            try:
+                entry = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            # take whatever queued up meanwhile, up to max_batch
+            batch = []
+            while True:
+                if entry is None:
+                    closing = True
+                    break
+                batch.append(entry)
+                if len(batch) >= self.max_batch:
+                    break
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(store, batch)
+        store.close()
+
+    def close(self):
+        """Commit everything queued so far and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show stored profiles and plans")
+    parser.add_argument("db", nargs="?", default=DEFAULT_DB_PATH)
+    parser.add_argument("--user", help="user id to show")
+    parser.add_argument("--history", type=int, default=5, help="plans to show")
+    args = parser.parse_args(argv)
+
+    store = ProfileStore(args.db)
+    try:
+        print(store.counts())
+        if args.user:
+            print(store.get_profile(args.user))
+            for created_at, meal_plan in store.plan_history(args.user, args.history):
+                print(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created_at)))
+                for meal, items in meal_plan.items():
+                    print(f"  {meal.capitalize():<10} {', '.join(items)}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
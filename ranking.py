@@ -0,0 +1,53 @@
+"""
+Ranking of the filtered foods by diet preference.
+
+Each preference is one lexicographic key over nutrient columns. Only the
+first few foods per meal are ever shown, so instead of sorting every
+matching row, top_k() partitions on the most significant key and only
+sorts the handful of rows that can make the cut.
+"""
+import numpy as np
+
+
+# preference -> sort keys as (column, descending), most significant first
+PREFERENCE_KEYS = {
+    "High-Protein": [("Protein", True)],  # Prioritize high-protein foods
+    "Keto": [("Fats", True), ("Carbohydrates", False)],  # High-fat, then low-carb
+}
+
+
+def sort_keys(columns, rows, diet_preference):
+    """
+    Ascending sort key arrays for `rows` under the preference, most
+    significant first. Descending columns are negated and missing values
+    always rank last. Returns an empty list when the preference has no order.
+    """
+    keys = []
+    for column, descending in PREFERENCE_KEYS.get(diet_preference, ()):
+        values = columns[column][rows].astype(np.float64)
+        if descending:
+            values = -values
+        values[np.isnan(values)] = np.inf
+        keys.append(values)
+    return keys
+
+
+def top_k(rows, keys, k):
+    """
+    The k best rows by the lexicographic `keys`, best first; ties keep the
+    row order. Runs in O(n) plus a sort of the rows tied with the k-th one,
+    rather than a full O(n log n) sort.
+    :param rows: Row positions, ascending.
+    :param keys: Ascending key arrays aligned with `rows`, from sort_keys().
+    """
+    if not keys:
+        return rows[:k]
+    if len(rows) > k:
+        primary = keys[0]
+        kth = np.partition(primary, k - 1)[k - 1]
+        candidates = primary <= kth
+        rows = rows[candidates]
+        keys = [key[candidates] for key in keys]
+    # np.lexsort treats its last key as the most significant one
+    order = np.lexsort([rows] + keys[::-1])
+    return rows[order[:k]]
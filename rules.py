@@ -0,0 +1,103 @@
+"""
+Health condition and goal thresholds, read from diet_rules.csv.
+
+Each row of the rule table is one predicate "<column> <op> <value>"; a
+condition or goal matches a food when all of its predicates hold. Adding a
+condition is a matter of adding rows to the table.
+"""
+import csv
+import operator
+import os
+
+import numpy as np
+
+
+DEFAULT_RULES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "diet_rules.csv"
+)
+
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+def load_rules(path=DEFAULT_RULES_PATH):
+    """
+    Read the rule table.
+    :return: Dict of (kind, name) -> list of (column, op, value) predicates.
+    """
+    rules = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            op = row["op"].strip()
+            if op not in OPERATORS:
+                raise ValueError(f"Unknown operator {op!r} in {path}")
+            predicate = (row["column"].strip(), op, float(row["value"]))
+            rules.setdefault((row["kind"].strip(), row["name"].strip()), []).append(
+                predicate
+            )
+    return rules
+
+
+_rules = None
+
+
+def get_rules():
+    """The default rule table, read on first use."""
+    global _rules
+    if _rules is None:
+        _rules = load_rules()
+    return _rules
+
+
+def rule_names(kind, rules=None):
+    """Names of the rules of `kind` ("condition" or "goal"), in table order."""
+    if rules is None:
+        rules = get_rules()
+    return tuple(name for rule_kind, name in rules if rule_kind == kind)
+
+
+def rule_bits(columns, rules=None):
+    """
+    Evaluate every rule once over the whole catalog and pack the results
+    into one integer per row, bit i being set when the row passes rule i.
+    Any combination of rules can then be checked with a single AND against
+    this array, however many rules are selected.
+    :return: (bits, index) where index maps (kind, name) -> bit value.
+    """
+    if rules is None:
+        rules = get_rules()
+    if len(rules) > 64:
+        raise ValueError("At most 64 rules fit in the rule bitmask")
+    length = len(next(iter(columns.values())))
+    bits = np.zeros(length, dtype=np.uint64)
+    index = {}
+    evaluated = {}
+    for i, (rule, predicates) in enumerate(rules.items()):
+        mask = np.ones(length, dtype=bool)
+        for predicate in predicates:
+            if predicate not in evaluated:
+                evaluated[predicate] = compile_mask(columns, [predicate])
+            mask &= evaluated[predicate]
+        bit = np.uint64(1) << np.uint64(i)
+        bits[mask] |= bit
+        index[rule] = bit
+    return bits, index
+
+
+def compile_mask(columns, predicates, out=None):
+    """
+    AND all predicates into one boolean mask over the column arrays.
+    :param columns: Dict of column name -> numpy array, all the same length.
+    :param out: Optional boolean array to AND into (modified in place).
+    """
+    if out is None:
+        out = np.ones(len(next(iter(columns.values()))), dtype=bool)
+    for column, op, value in predicates:
+        np.logical_and(out, OPERATORS[op](columns[column], value), out=out)
+    return out
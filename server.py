@@ -0,0 +1,443 @@
+"""
+HTTP service for meal plan recommendations.
+
+    python server.py [--host 127.0.0.1] [--port 8080] [--workers 4]
+
+Endpoints:
+
+- POST /recommend with a JSON body holding the fields the GUI collects
+  (age, height, weight, diet_type, diet_preference, health_condition,
+  diet_goal); health_condition may be a list. Returns {"meal_plan": {...}}.
+  With --db, bodies carrying a "user_id" also get the profile and plan
+  saved to the profile store, by a background writer.
+- POST /catalog with {"upsert": [{"Food_items": ..., "Protein": ...}],
+  "remove": ["name", ...]} edits single foods of the resident catalog,
+  see FoodCatalog.upsert(). Process workers pick the edits up from the
+  catalog's write-ahead log. Changes of the file or log made by others are
+  loaded off the event loop every CATALOG_REFRESH_INTERVAL seconds.
+- GET /health, GET /metrics (including the instrument.py spans)
+- GET /debug/requests?limit=10: the slowest recent requests with their
+  span breakdown, see `python instrument.py --url ...`
+
+Plans of single-condition profiles come from the precomputed table (see
+plan_table.py), rebuilt in the worker pool whenever the catalog changes.
+Those and plans that are already in the engine's cache are answered
+straight from the event loop. Misses are collected for a couple of milliseconds, grouped by
+filter key and evaluated as one batch in a worker pool, so a burst of
+identical requests costs a single evaluation.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import engine
+import instrument
+from catalog import get_catalog
+from profile_store import PROFILE_FIELDS, BatchedWriter
+from validation import ERROR_MISSING, first_error, validate
+
+
+MAX_BODY_BYTES = 64 * 1024
+# seconds between checks of the catalog file and log, off the event loop
+CATALOG_REFRESH_INTERVAL = 0.5
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def evaluate_keys(keys):
+    """Build the plans for a batch of filter keys (runs in the worker pool)."""
+    catalog = get_catalog().snapshot()
+    return [
+        engine.recommend(
+            diet_type=diet_type,
+            diet_preference=diet_preference,
+            health_condition=health_conditions,
+            diet_goal=diet_goal,
+            catalog=catalog,
+        )
+        for diet_type, diet_preference, health_conditions, diet_goal in keys
+    ]
+
+
+def profile_key(body):
+    """Validate a /recommend body and return its filter key."""
+    if not isinstance(body, dict):
+        raise BadRequest("Expected a JSON object")
+    for field in ("age", "height", "weight"):
+        value = body.get(field)
+        if value is not None and not isinstance(value, (int, float)):
+            raise BadRequest(f"{field} must be a number")
+    # the fields are optional, but the ones given must be in the GUI's ranges
+    measurements = [body.get(field) for field in ("age", "height", "weight")]
+    if any(value is not None for value in measurements):
+        age, height, weight = (
+            [float("nan") if value is None else float(value)] for value in measurements
+        )
+        codes = validate(age, height, weight)[3]
+        error = first_error(int(codes[0]) & ~ERROR_MISSING)
+        if error is not None:
+            raise BadRequest(error[1])
+    for field in ("diet_type", "diet_preference", "diet_goal"):
+        value = body.get(field)
+        if value is not None and not isinstance(value, str):
+            raise BadRequest(f"{field} must be a string")
+    conditions = body.get("health_condition", "None")
+    if not (
+        conditions is None
+        or isinstance(conditions, str)
+        or isinstance(conditions, list)
+        and all(isinstance(condition, str) for condition in conditions)
+    ):
+        raise BadRequest("health_condition must be a string or a list of strings")
+    if not isinstance(body.get("user_id", ""), (str, int)):
+        raise BadRequest("user_id must be a string")
+    try:
+        return engine.filter_key(
+            body.get("diet_type", "All"),
+            body.get("diet_preference", "None"),
+            body.get("health_condition", "None"),
+            body.get("diet_goal", "None"),
+        )
+    except ValueError as e:
+        raise BadRequest(str(e))
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.counts = {
+            "requests": 0,
+            "errors": 0,
+            "table_answers": 0,
+            "cache_answers": 0,
+            "batches": 0,
+            "batched_requests": 0,
+            "evaluated_keys": 0,
+            "saved_plans": 0,
+        }
+        self.latencies = deque(maxlen=10000)
+
+    def snapshot(self):
+        ordered = sorted(self.latencies)
+
+        def percentile(p):
+            return ordered[min(int(len(ordered) * p), len(ordered) - 1)] * 1000
+
+        latency = {}
+        if ordered:
+            latency = {
+                "p50_ms": percentile(0.5),
+                "p95_ms": percentile(0.95),
+                "p99_ms": percentile(0.99),
+                "max_ms": ordered[-1] * 1000,
+            }
+        return {
+            "uptime_s": time.time() - self.started,
+            **self.counts,
+            "latency": latency,
+            "plan_cache": engine.plan_cache.stats(),
+            "plan_table": engine.precomputed.stats(),
+        }
+
+
+class Batcher:
+    """
+    Collects cache misses for up to `window` seconds (or `max_size` requests),
+    then evaluates each distinct filter key once in the pool.
+    """
+
+    def __init__(self, pool, metrics, catalog, window=0.002, max_size=256):
+        self.pool = pool
+        self.catalog = catalog
+        self.metrics = metrics
+        self.window = window
+        self.max_size = max_size
+        self._waiting = {}  # filter key -> futures waiting for its plan
+        self._size = 0
+        self._flush_handle = None
+
+    def submit(self, key):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiting.setdefault(key, []).append(future)
+        self._size += 1
+        if self._size >= self.max_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        waiting, self._waiting = self._waiting, {}
+        self.metrics.counts["batches"] += 1
+        self.metrics.counts["batched_requests"] += self._size
+        self.metrics.counts["evaluated_keys"] += len(waiting)
+        self._size = 0
+        # the plans belong to the catalog as it is now, not after the batch
+        fingerprint = self.catalog.fingerprint
+        asyncio.ensure_future(self._evaluate(waiting, fingerprint))
+
+    async def _evaluate(self, waiting, fingerprint):
+        keys = list(waiting)
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            plans = await loop.run_in_executor(self.pool, evaluate_keys, keys)
+            instrument.recorder.observe("server.evaluate_batch", time.perf_counter() - start)
+        except Exception as e:
+            for futures in waiting.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for key, plan in zip(keys, plans):
+            engine.plan_cache.put(key, fingerprint, plan)
+            for future in waiting[key]:
+                if not future.done():
+                    future.set_result(plan)
+
+
+def edit_catalog(body):
+    """Apply a /catalog body to the shared catalog (runs off the event loop)."""
+    if not isinstance(body, dict):
+        raise BadRequest("Expected a JSON object")
+    upserts, removals = body.get("upsert", []), body.get("remove", [])
+    if not isinstance(upserts, list) or not all(isinstance(item, dict) for item in upserts):
+        raise BadRequest("upsert must be a list of objects")
+    if not isinstance(removals, list):
+        raise BadRequest("remove must be a list of names")
+    catalog = get_catalog()
+    try:
+        added = catalog.upsert(upserts) if upserts else 0
+        removed = catalog.remove(removals) if removals else 0
+    except ValueError as e:
+        raise BadRequest(str(e))
+    return {"added": added, "removed": removed, "catalog_rows": len(catalog)}
+
+
+class RecommendationServer:
+    """
+    Handlers only read the catalog version published last; reloads and log
+    replays run in refresh_catalog(), off the event loop.
+    """
+
+    def __init__(self, pool, batch_window=0.002, plan_writer=None):
+        self.catalog = get_catalog(refresh=False)
+        self.metrics = Metrics()
+        self.batcher = Batcher(pool, self.metrics, self.catalog, window=batch_window)
+        self.plan_writer = plan_writer
+
+    async def refresh_catalog(self, interval=CATALOG_REFRESH_INTERVAL):
+        """Pick up changes of the catalog file and log every `interval` seconds."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, self.catalog.refresh)
+            except Exception as e:
+                # keep serving the last good version
+                self.metrics.counts["errors"] += 1
+                print("Error refreshing the catalog:", e)
+
+    async def recommend(self, body):
+        key = profile_key(body)
+        catalog = self.catalog
+        meal_plan = engine.precomputed.get(key, catalog)
+        if meal_plan is not None:
+            self.metrics.counts["table_answers"] += 1
+        else:
+            meal_plan = engine.plan_cache.get(key, catalog.fingerprint)
+            if meal_plan is not None:
+                self.metrics.counts["cache_answers"] += 1
+            else:
+                with instrument.span("server.batch_wait"):
+                    meal_plan = await self.batcher.submit(key)
+        user_id = body.get("user_id")
+        if self.plan_writer is not None and user_id is not None:
+            # only queued here, the writer thread commits it
+            profile = {field: body.get(field) for field in PROFILE_FIELDS}
+            try:
+                self.plan_writer.save({**profile, "user_id": user_id}, meal_plan)
+            except ValueError as e:
+                raise BadRequest(str(e))
+            self.metrics.counts["saved_plans"] += 1
+        return {"meal_plan": meal_plan}
+
+    async def route(self, method, path, body, query=""):
+        if path == "/recommend":
+            if method != "POST":
+                return 405, {"error": "Use POST"}
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                return 400, {"error": "Invalid JSON"}
+            return 200, await self.recommend(payload)
+        if path == "/catalog":
+            if method != "POST":
+                return 405, {"error": "Use POST"}
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                return 400, {"error": "Invalid JSON"}
+            loop = asyncio.get_running_loop()
+            return 200, await loop.run_in_executor(None, edit_catalog, payload)
+        if path == "/health":
+            catalog = self.catalog.snapshot()
+            return 200, {
+                "status": "ok",
+                "catalog_rows": len(catalog),
+                "catalog_version": catalog.version,
+            }
+        if path == "/metrics":
+            return 200, {**self.metrics.snapshot(), "instrument": instrument.snapshot()}
+        if path == "/debug/requests":
+            try:
+                limit = int(parse_qs(query).get("limit", ["10"])[0])
+            except ValueError:
+                raise BadRequest("limit must be an integer")
+            return 200, {"requests": instrument.slowest(limit)}
+        return 404, {"error": f"No route for {path}"}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0) or 0)
+                keep_alive = headers.get("connection", "").lower() != "close" and (
+                    version == "HTTP/1.1"
+                    or headers.get("connection", "").lower() == "keep-alive"
+                )
+                self.metrics.counts["requests"] += 1
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": "Request body too large"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    path, _, query = path.partition("?")
+                    try:
+                        with instrument.request("http", method=method, path=path):
+                            status, payload = await self.route(method, path, body, query)
+                    except BadRequest as e:
+                        status, payload = 400, {"error": str(e)}
+                    except Exception as e:
+                        status, payload = 500, {"error": str(e)}
+                if status >= 400:
+                    self.metrics.counts["errors"] += 1
+
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(data)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                        "\r\n"
+                    ).encode("latin-1")
+                    + data
+                )
+                await writer.drain()
+                self.metrics.latencies.append(time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, pool, batch_window, plan_writer=None):
+    # load the catalog before accepting requests, it stays resident
+    get_catalog()
+    server = RecommendationServer(pool, batch_window, plan_writer)
+    refresher = asyncio.ensure_future(server.refresh_catalog())
+    listener = await asyncio.start_server(server.handle_connection, host, port)
+    print(f"Serving on http://{host}:{port}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        refresher.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Meal plan recommendation service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument(
+        "--pool",
+        choices=["process", "thread"],
+        default="process",
+        help="worker pool for the ranking (default: process)",
+    )
+    parser.add_argument(
+        "--batch-window-ms",
+        type=float,
+        default=2.0,
+        help="how long cache misses are collected into one batch",
+    )
+    parser.add_argument("--db", help="profile store to save plans with a user_id to")
+    parser.add_argument(
+        "--profile",
+        help="capture cprofile and/or tracemalloc data per request, comma separated",
+    )
+    args = parser.parse_args(argv)
+    if args.profile:
+        instrument.set_profiling(args.profile.split(","))
+
+    plan_writer = BatchedWriter(args.db) if args.db else None
+    if args.pool == "process":
+        pool = ProcessPoolExecutor(max_workers=args.workers, initializer=get_catalog)
+    else:
+        pool = ThreadPoolExecutor(max_workers=args.workers)
+    # the plan table is built in the same pool, one chunk of keys per worker
+    engine.precomputed.executor = pool
+    engine.precomputed.chunks = args.workers
+    engine.precomputed.start(get_catalog())
+    try:
+        asyncio.run(
+            serve(args.host, args.port, pool, args.batch_window_ms / 1000, plan_writer)
+        )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.shutdown(cancel_futures=True)
+        if plan_writer is not None:
+            plan_writer.close()
+
+
+if __name__ == "__main__":
+    main()
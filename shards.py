@@ -0,0 +1,200 @@
+"""
+Sharded, multiprocess evaluation for very large food catalogs.
+
+The catalog's filter and ranking arrays are copied once into shared memory.
+Worker processes attach to those blocks (no copy), and each request is split
+into contiguous row ranges, one per shard. Every worker filters its range and
+keeps the per-meal top-k, and the parent merges the partial top-k lists. The
+merge uses the same keys and tie-breaking as the engine, so the result is the
+same as engine.recommend() on the whole catalog.
+
+    python shards.py --rows 5000000 --workers 4 --requests 50
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from catalog import MEAL_BITS, get_catalog
+from engine import ITEMS_PER_MEAL, MEALS, filter_key
+from ranking import sort_keys, top_k
+
+
+# per-worker views of the shared arrays, set up by _attach()
+_blocks = []
+_arrays = {}
+
+
+def _attach(specs):
+    for name, (block_name, dtype, length) in specs.items():
+        # workers share the parent's resource tracker, so attaching doesn't
+        # hand ownership over; the parent unlinks the blocks in close()
+        block = shared_memory.SharedMemory(name=block_name)
+        _blocks.append(block)
+        _arrays[name] = np.ndarray((length,), dtype=dtype, buffer=block.buf)
+
+
+def _shard_top_k(start, stop, category_codes, required_bits, diet_preference, k):
+    """Filter rows [start, stop) and return each meal's top k with its keys."""
+    rows = np.arange(start, stop)
+    mask = np.ones(stop - start, dtype=bool)
+    if category_codes is not None:
+        mask &= np.isin(_arrays["category_codes"][start:stop], category_codes)
+    rule_bits = _arrays["rule_bits"][start:stop]
+    mask &= (rule_bits & required_bits) == required_bits
+    rows = rows[mask]
+
+    columns = {
+        name.split(":", 1)[1]: values
+        for name, values in _arrays.items()
+        if name.startswith("column:")
+    }
+    meal_bits = _arrays["meal_bits"][rows]
+    partial = {}
+    for meal in MEALS:
+        in_meal = rows[(meal_bits & MEAL_BITS[meal]) != 0]
+        best = top_k(in_meal, sort_keys(columns, in_meal, diet_preference), k)
+        partial[meal] = (best, sort_keys(columns, best, diet_preference))
+    return partial
+
+
+class ShardedEngine:
+    """
+    Evaluates recommendations for one catalog across `workers` processes.
+    Use as a context manager, or call close() to free the shared memory.
+    """
+
+    def __init__(self, catalog=None, workers=None, shards=None):
+        self.catalog = (catalog if catalog is not None else get_catalog()).snapshot()
+        self.workers = workers or os.cpu_count() or 1
+        self.shards = shards or self.workers
+        self._blocks = []
+
+        arrays = {
+            "category_codes": np.asarray(self.catalog.category_codes),
+            "meal_bits": np.asarray(self.catalog.meal_bits),
+            "rule_bits": np.asarray(self.catalog.rule_bits),
+            **{
+                "column:" + name: np.asarray(values)
+                for name, values in self.catalog.columns.items()
+            },
+        }
+        specs = {}
+        for name, values in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+            self._blocks.append(block)
+            specs[name] = (block.name, values.dtype.str, len(values))
+
+        bounds = np.linspace(0, len(self.catalog), self.shards + 1).astype(int)
+        self.ranges = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_attach, initargs=(specs,)
+        )
+
+    def recommend(
+        self,
+        diet_type="All",
+        diet_preference="None",
+        health_condition="None",
+        diet_goal="None",
+    ):
+        """Same result as engine.recommend() with use_cache=False."""
+        diet_type, diet_preference, health_conditions, diet_goal = filter_key(
+            diet_type, diet_preference, health_condition, diet_goal
+        )
+        catalog = self.catalog
+        category_codes = None
+        if diet_type != "All":
+            category_codes = [
+                code
+                for code, name in enumerate(catalog.categories)
+                if name.lower() == diet_type.lower()
+            ]
+        rules = [("condition", condition) for condition in health_conditions]
+        rules.append(("goal", diet_goal))
+        required_bits = np.uint64(0)
+        for rule in rules:
+            required_bits |= catalog.rule_index.get(rule, np.uint64(0))
+        # the preference only orders the foods once a goal is picked
+        if diet_goal == "None":
+            diet_preference = "None"
+
+        futures = [
+            self.pool.submit(
+                _shard_top_k,
+                start,
+                stop,
+                category_codes,
+                required_bits,
+                diet_preference,
+                ITEMS_PER_MEAL,
+            )
+            for start, stop in self.ranges
+        ]
+        partials = [future.result() for future in futures]
+
+        # shards are contiguous and in order, so the merged rows stay ascending
+        meal_plan = {}
+        for meal in MEALS:
+            rows = np.concatenate([partial[meal][0] for partial in partials])
+            keys = [
+                np.concatenate([partial[meal][1][i] for partial in partials])
+                for i in range(len(partials[0][meal][1]))
+            ]
+            meal_plan[meal] = catalog.names[top_k(rows, keys, ITEMS_PER_MEAL)].tolist()
+        return meal_plan
+
+    def close(self):
+        self.pool.shutdown()
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    from engine import DIET_PREFERENCES, diet_goals, recommend
+    from synthetic import synthetic_catalog
+
+    parser = argparse.ArgumentParser(description="Benchmark sharded evaluation")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    catalog = synthetic_catalog(args.rows)
+    profiles = [
+        {"diet_preference": preference, "diet_goal": goal}
+        for preference in DIET_PREFERENCES
+        for goal in diet_goals()
+    ]
+    requests = [profiles[i % len(profiles)] for i in range(args.requests)]
+
+    start = time.perf_counter()
+    expected = [recommend(catalog=catalog, use_cache=False, **p) for p in requests]
+    single = time.perf_counter() - start
+
+    with ShardedEngine(catalog, workers=args.workers) as sharded:
+        sharded.recommend()  # warm up the workers
+        start = time.perf_counter()
+        results = [sharded.recommend(**p) for p in requests]
+        parallel = time.perf_counter() - start
+
+    assert results == expected, "sharded results differ from the engine"
+    print(f"{args.rows} rows, {args.requests} requests")
+    print(f"  single process: {args.requests / single:.1f} req/s")
+    print(f"  {args.workers} workers:     {args.requests / parallel:.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
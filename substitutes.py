@@ -0,0 +1,226 @@
+"""
+Nearest-neighbour food substitutions over the nutrient columns.
+
+    python substitutes.py "Chicken Burger" [--k 5] [--diet-type Non-Veg] ...
+
+Every food is a point in the standardized (z-scored) space of the eight
+nutrient columns. Small catalogs are searched exactly with one vectorized
+distance computation; larger ones use a KD-tree when scipy is installed.
+When the catalog changes, only changed or appended rows are re-featurized;
+they are searched exactly next to the tree until enough of them pile up to
+make rebuilding the tree worthwhile.
+"""
+import argparse
+import importlib.util
+import threading
+import time
+import weakref
+
+import numpy as np
+
+from catalog import MEAL_BITS, NUTRIENT_COLUMNS, get_catalog
+from engine import filter_key, filter_mask
+from ranking import top_k
+
+# optional, the exact search covers every catalog size. scipy.spatial is
+# only imported once a catalog is large enough to need a tree.
+HAVE_SCIPY = importlib.util.find_spec("scipy") is not None
+
+
+EXACT_SEARCH_ROWS = 20_000  # below this many candidates brute force wins
+REBUILD_FRACTION = 0.1  # rebuild the tree once this share of rows changed
+
+
+class SubstitutionIndex:
+    def __init__(self, catalog, exact_search_rows=EXACT_SEARCH_ROWS):
+        self.catalog = catalog
+        self.exact_search_rows = exact_search_rows
+        self.counts = {"full_builds": 0, "incremental_updates": 0}
+        self._lock = threading.Lock()
+        with self._lock:
+            self._build(catalog.snapshot())
+
+    def _raw_features(self, snapshot):
+        return np.column_stack(
+            [
+                np.asarray(snapshot.columns[column], dtype=np.float32)
+                for column in NUTRIENT_COLUMNS
+            ]
+        )
+
+    def _normalize(self, raw):
+        # missing values sit at the column mean
+        return np.nan_to_num((raw - self.mean) / self.scale, nan=0.0)
+
+    def _build(self, snapshot):
+        raw = self._raw_features(snapshot)
+        if len(raw):
+            self.mean = np.nan_to_num(np.nanmean(raw, axis=0))
+            std = np.nan_to_num(np.nanstd(raw, axis=0))
+        else:
+            self.mean = std = np.zeros(raw.shape[1], dtype=np.float32)
+        self.scale = np.where(std > 0, std, 1).astype(np.float32)
+        self.features = self._normalize(raw)
+        self._raw = raw
+        self.tree = None
+        if HAVE_SCIPY and len(raw) > self.exact_search_rows:
+            from scipy.spatial import cKDTree
+
+            self.tree = cKDTree(self.features)
+        # rows whose tree entry is stale or missing, searched exactly
+        self.dirty = np.zeros(len(raw), dtype=bool)
+        self.version = snapshot.version
+        self.counts["full_builds"] += 1
+
+    def refresh(self, snapshot=None):
+        """
+        Catch up with catalog changes, rebuilding only when needed.
+        :param snapshot: The catalog version to match, default the current one.
+        :return: (features, tree, dirty) of that version.
+        """
+        if snapshot is None:
+            snapshot = self.catalog.snapshot()
+        with self._lock:
+            if snapshot.version != self.version:
+                self._update(snapshot)
+            return self.features, self.tree, self.dirty
+
+    def _update(self, snapshot):
+        raw = self._raw_features(snapshot)
+        old = self._raw
+        if len(raw) < len(old):
+            self._build(snapshot)
+            return
+        common = old.shape[0]
+        same = (raw[:common] == old) | (np.isnan(raw[:common]) & np.isnan(old))
+        changed = np.flatnonzero(~same.all(axis=1))
+        # the scaling stays frozen until the next full build
+        features = np.concatenate([self.features, self._normalize(raw[common:])])
+        features[changed] = self._normalize(raw[changed])
+        dirty = np.concatenate([self.dirty, np.ones(len(raw) - common, dtype=bool)])
+        dirty[changed] = True
+
+        self.features = features
+        self._raw = raw
+        self.dirty = dirty
+        self.version = snapshot.version
+        self.counts["incremental_updates"] += 1
+        if self.tree is None and len(raw) > self.exact_search_rows and HAVE_SCIPY:
+            self._build(snapshot)
+        elif self.tree is not None and dirty.sum() > REBUILD_FRACTION * len(raw):
+            self._build(snapshot)
+
+    def _exact(self, features, query, candidates, k):
+        candidates = np.unique(candidates)
+        distances = ((features[candidates] - query) ** 2).sum(axis=1)
+        return top_k(candidates, [distances], k)
+
+    def nearest(self, row, k=5, mask=None, snapshot=None):
+        """
+        The k rows closest to `row` (excluding it), closest first.
+        :param mask: Optional boolean array, only rows where it is True count.
+        :param snapshot: Catalog version `row` and `mask` refer to, default
+            the current one.
+        """
+        features, tree, dirty = self.refresh(snapshot)
+        allowed = np.ones(len(features), dtype=bool) if mask is None else mask.copy()
+        allowed[row] = False
+        query = features[row]
+        if tree is None or np.count_nonzero(allowed) <= self.exact_search_rows:
+            return self._exact(features, query, np.flatnonzero(allowed), k)
+
+        # query the tree for more and more neighbours until k usable ones
+        # show up, then merge them with the stale rows searched exactly
+        usable = allowed & ~dirty
+        wanted = k * 4
+        while True:
+            distances, rows = tree.query(query, k=min(wanted, tree.n))
+            rows = np.atleast_1d(rows)[np.isfinite(np.atleast_1d(distances))]
+            found = rows[usable[rows]]
+            if len(found) >= k or wanted >= tree.n:
+                break
+            wanted *= 4
+        stale = np.flatnonzero(allowed & dirty)
+        return self._exact(features, query, np.concatenate([found[:k], stale]), k)
+
+
+_indexes = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_index(catalog):
+    """The substitution index for `catalog`, built on first use."""
+    with _indexes_lock:
+        index = _indexes.get(catalog)
+        if index is None:
+            index = _indexes[catalog] = SubstitutionIndex(catalog)
+    return index
+
+
+def find_substitutes(
+    food_name,
+    k=5,
+    diet_type="All",
+    health_condition="None",
+    diet_goal="None",
+    meal=None,
+    exclude=(),
+    catalog=None,
+):
+    """
+    Names of the k foods most similar to `food_name` that still pass the
+    diet type, health condition and goal filters.
+    :param meal: Optional meal ("lunch", ...) the substitutes must fit.
+    :param exclude: Food names to leave out, e.g. the rest of the plan.
+    """
+    if catalog is None:
+        catalog = get_catalog()
+    index = get_index(catalog)
+    # rows and mask of one version, the index is brought to the same one
+    snapshot = catalog.snapshot()
+    row = snapshot.row_of(food_name)
+    if row is None:
+        raise ValueError(f"Unknown food {food_name!r}")
+    diet_type, _, health_conditions, diet_goal = filter_key(
+        diet_type, "None", health_condition, diet_goal
+    )
+    mask = filter_mask(snapshot, diet_type, health_conditions, diet_goal)
+    if meal is not None:
+        mask &= (snapshot.meal_bits & MEAL_BITS[meal.lower()]) != 0
+    for name in exclude:
+        excluded = snapshot.row_of(name)
+        if excluded is not None:
+            mask[excluded] = False
+    rows = index.nearest(row, k, mask, snapshot)
+    return snapshot.names[rows].tolist()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find similar foods")
+    parser.add_argument("food")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--diet-type", default="All")
+    parser.add_argument("--health-condition", default="None")
+    parser.add_argument("--diet-goal", default="None")
+    parser.add_argument("--meal")
+    args = parser.parse_args(argv)
+
+    catalog = get_catalog()
+    get_index(catalog)
+    start = time.perf_counter()
+    names = find_substitutes(
+        args.food,
+        args.k,
+        args.diet_type,
+        args.health_condition,
+        args.diet_goal,
+        args.meal,
+        catalog=catalog,
+    )
+    elapsed = time.perf_counter() - start
+    print("\n".join(names))
+    print(f"({elapsed * 1000:.3f} ms)")
+
+
+if __name__ == "__main__":
+    main()
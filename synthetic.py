@@ -0,0 +1,40 @@
+"""
+Synthetic food catalogs of any size, for benchmarks.
+
+Rows are drawn from food_data.csv, so Category and Meal Type keep their
+real distributions, and the nutrient values are jittered so that filters
+and rankings don't just see the same 86 rows over and over.
+"""
+import numpy as np
+
+from catalog import DEFAULT_PATH, FoodCatalog, read_csv_columns
+from catalog_store import StringTable
+
+
+def synthetic_data(rows, seed=0, base_path=DEFAULT_PATH):
+    """Column arrays for a catalog of `rows` rows, see read_csv_columns."""
+    base = read_csv_columns(base_path)
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(base["names"]), size=rows)
+
+    # names are interned, rows drawn from the same base item share a string
+    names = base["names"]
+    if not isinstance(names, StringTable):
+        names = StringTable.from_strings(names)
+    columns = {}
+    for column, values in base["columns"].items():
+        noise = rng.lognormal(0.0, 0.15, size=rows).astype(np.float32)
+        columns[column] = values[picks] * noise
+    return {
+        "names": StringTable(names.codes[picks], names.offsets, names.blob),
+        "categories": base["categories"],
+        "category_codes": base["category_codes"][picks],
+        "meal_types": base["meal_types"],
+        "meal_type_codes": base["meal_type_codes"][picks],
+        "meal_bits": base["meal_bits"][picks],
+        "columns": columns,
+    }
+
+
+def synthetic_catalog(rows, seed=0):
+    return FoodCatalog.from_data(synthetic_data(rows, seed))
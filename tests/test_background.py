@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+from PIL import Image
+
+import background
+from background import BackgroundResizer
+
+
+class FakeRoot:
+    """Runs after() callbacks when run() is called, instead of a Tk loop."""
+
+    def __init__(self):
+        self.callbacks = {}
+        self.ids = 0
+
+    def after(self, ms, callback, *args):
+        self.ids += 1
+        self.callbacks[self.ids] = (callback, args)
+        return self.ids
+
+    def after_cancel(self, callback_id):
+        self.callbacks.pop(callback_id, None)
+
+    def run(self):
+        while self.callbacks:
+            callback, args = self.callbacks.pop(min(self.callbacks))
+            callback(*args)
+
+
+class FakeLabel:
+    def config(self, image):
+        self.shown = image
+
+
+def test_a_cached_size_is_shown_without_a_new_photo_image(monkeypatch):
+    created = []
+
+    def photo_image(image):
+        created.append(image.size)
+        return SimpleNamespace(size=image.size)
+
+    monkeypatch.setattr(background.ImageTk, "PhotoImage", photo_image)
+    root, label = FakeRoot(), FakeLabel()
+    resizer = BackgroundResizer(root, label, Image.new("RGB", (64, 48)), poll_ms=1)
+
+    for size in [(30, 20), (40, 30), (30, 20), (30, 20), (40, 30)]:
+        resizer.on_configure(SimpleNamespace(widget=root, width=size[0], height=size[1]))
+        root.run()
+        assert label.shown.size == size
+    resizer.close()
+
+    assert created == [(30, 20), (40, 30)]
+    assert resizer.counts["cache_hits"] == 2
+    assert resizer.counts["renders"] == 4
+    assert resizer.counts["ignored"] == 1
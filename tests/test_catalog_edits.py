@@ -0,0 +1,237 @@
+import shutil
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from catalog import DEFAULT_PATH, FoodCatalog, read_csv_columns
+from engine import build_plan, filter_key, filter_mask
+from meal_optimizer import daily_targets
+from weekly_planner import WeeklyPlanner
+
+OATS = {
+    "Food_items": "Test Oats",
+    "Category": "Veg",
+    "Calories": 389,
+    "Protein": 16.9,
+    "Meal Type": "Breakfast",
+}
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "food_data.csv"
+    shutil.copy(DEFAULT_PATH, path)
+    return str(path)
+
+
+def contents(catalog):
+    snapshot = catalog.snapshot()
+    return snapshot.frame.to_csv(index=False)
+
+
+def test_edits_are_replayed_from_the_log(csv_path):
+    catalog = FoodCatalog(csv_path).refresh()
+    first = catalog.names[0]
+    removed = catalog.names[1]
+    with open(csv_path) as f:
+        base = f.read()
+
+    assert catalog.upsert([OATS, {"Food_items": first, "Calories": 123}]) == 1
+    assert catalog.remove([removed, "no such food"]) == 1
+
+    # the base file is untouched until compaction
+    with open(csv_path) as f:
+        assert f.read() == base
+    # loaded from the memory-mapped store, then the log on top
+    reloaded = FoodCatalog(csv_path).refresh()
+    assert reloaded.loaded_from != csv_path
+    assert contents(reloaded) == contents(catalog)
+    assert reloaded.row_of("test oats") is not None
+    assert reloaded.row_of(removed) is None
+    assert reloaded.columns["Calories"][reloaded.row_of(first)] == 123
+
+
+def test_refresh_replays_edits_of_another_catalog(csv_path):
+    writer = FoodCatalog(csv_path, use_store=False).refresh()
+    reader = FoodCatalog(csv_path, use_store=False).refresh()
+    version = reader.version
+
+    writer.upsert([OATS])
+    assert reader.row_of("Test Oats") is None
+    reader.refresh()
+    assert reader.row_of("Test Oats") is not None
+    assert reader.version > version
+    assert contents(reader) == contents(writer)
+
+
+def test_compaction_writes_the_edits_into_the_base_file(csv_path):
+    catalog = FoodCatalog(csv_path, compact_after=10**6).refresh()
+    catalog.upsert([OATS])
+    catalog.remove([catalog.names[0]])
+    expected = contents(catalog)
+    fingerprint = catalog.fingerprint
+
+    catalog.compact()
+    assert catalog.wal.size() == 0
+    assert catalog.fingerprint != fingerprint
+    assert contents(catalog) == expected
+    assert contents(FoodCatalog(csv_path, use_store=False).refresh()) == expected
+
+    # later edits go to the log again and are replayed on top of the new base
+    catalog.upsert([{"Food_items": "Test Oats", "Protein": 20}])
+    assert catalog.wal.size() > 0
+    assert contents(FoodCatalog(csv_path).refresh()) == contents(catalog)
+
+
+def test_compaction_starts_once_enough_edits_are_logged(csv_path):
+    catalog = FoodCatalog(csv_path, use_store=False, compact_after=3).refresh()
+    for protein in range(3):
+        catalog.upsert([{**OATS, "Protein": protein}])
+    # compacts in the background
+    with catalog._compacting:
+        pass
+    for _ in range(100):
+        if catalog.wal.size() == 0:
+            break
+        threading.Event().wait(0.05)
+    assert catalog.wal.size() == 0
+    reloaded = FoodCatalog(csv_path, use_store=False).refresh()
+    assert reloaded.columns["Protein"][reloaded.row_of("Test Oats")] == 2
+
+
+def test_edits_past_the_threshold_start_one_compaction(csv_path, fast_thread_switches):
+    catalog = FoodCatalog(csv_path, use_store=False, compact_after=1).refresh()
+    started = []
+    release = threading.Event()
+
+    def compact():
+        started.append(threading.current_thread())
+        release.wait()
+
+    catalog._compact = compact
+    editors = [
+        threading.Thread(target=catalog.upsert, args=([{**OATS, "Protein": i}],))
+        for i in range(8)
+    ]
+    for thread in editors:
+        thread.start()
+    for thread in editors:
+        thread.join()
+    release.set()
+    # held until the background compaction is done
+    with catalog._compacting:
+        pass
+    assert len(started) == 1
+
+
+def test_a_snapshot_is_not_changed_by_later_edits():
+    catalog = FoodCatalog.from_data(read_csv_columns(DEFAULT_PATH))
+    snapshot = catalog.snapshot()
+    names = snapshot.names.copy()
+    calories = snapshot.columns["Calories"].copy()
+
+    catalog.upsert([OATS, {"Food_items": names[0], "Calories": 1}])
+    catalog.remove([names[1]])
+
+    assert snapshot is not catalog.snapshot()
+    assert snapshot.fingerprint != catalog.fingerprint
+    np.testing.assert_array_equal(snapshot.names, names)
+    np.testing.assert_array_equal(snapshot.columns["Calories"], calories)
+    assert len(catalog) == len(names)
+
+
+@pytest.fixture
+def fast_thread_switches():
+    # switch threads often enough to land between two array updates
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_readers_see_one_version_while_the_catalog_is_edited(fast_thread_switches):
+    catalog = FoodCatalog.from_data(read_csv_columns(DEFAULT_PATH))
+    key = filter_key("Veg", "High-Protein", "Diabetes", "Weight Loss")
+    done = threading.Event()
+    errors = []
+
+    def edit():
+        try:
+            for i in range(200):
+                # appends and removals change the length of every array
+                catalog.upsert([{**OATS, "Food_items": f"Test Oats {i}", "Fibre": 5}])
+                if i % 2:
+                    catalog.remove([f"Test Oats {i - 1}"])
+        finally:
+            done.set()
+
+    def read():
+        try:
+            while not done.is_set():
+                snapshot = catalog.snapshot()
+                lengths = {
+                    len(snapshot.names),
+                    len(snapshot.rule_bits),
+                    len(snapshot.meal_bits),
+                    len(snapshot.category_codes),
+                    *(len(values) for values in snapshot.columns.values()),
+                }
+                assert len(lengths) == 1
+                build_plan(catalog, key)
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for thread in readers:
+        thread.start()
+    edit()
+    for thread in readers:
+        thread.join()
+    assert errors == []
+    assert len(catalog) == len(read_csv_columns(DEFAULT_PATH)["names"]) + 100
+
+
+def test_weekly_planner_sees_one_version_while_the_catalog_is_edited(fast_thread_switches):
+    catalog = FoodCatalog.from_data(read_csv_columns(DEFAULT_PATH))
+    front = [
+        {column: value for column, value in item.items() if not pd.isna(value)}
+        for item in catalog.frame.iloc[:20].to_dict("records")
+    ]
+    key = filter_key("Veg", "High-Protein", "Diabetes", "Weight Loss")
+    targets = daily_targets(30, 175, 70, key[3])
+    done = threading.Event()
+    errors = []
+
+    def edit():
+        try:
+            for _ in range(30):
+                # moving the first rows to the end shifts every other row
+                catalog.remove([item["Food_items"] for item in front])
+                catalog.upsert(front)
+        finally:
+            done.set()
+
+    def read():
+        try:
+            while not done.is_set():
+                planner = WeeklyPlanner(catalog, key, days=2, targets=targets)
+                snapshot = planner.catalog
+                passing = set(
+                    snapshot.names[filter_mask(snapshot, "Veg", key[2], key[3])].tolist()
+                )
+                for day in planner.plan():
+                    for items in day.values():
+                        assert set(items) <= passing
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for thread in readers:
+        thread.start()
+    edit()
+    for thread in readers:
+        thread.join()
+    assert errors == []
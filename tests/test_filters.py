@@ -0,0 +1,86 @@
+import itertools
+import shutil
+
+import numpy as np
+import pytest
+
+import rules
+from catalog import DEFAULT_PATH, FoodCatalog, read_csv_columns
+from engine import diet_goals, filter_key, filter_mask, health_conditions
+from plan_table import all_keys
+from synthetic import synthetic_catalog
+
+
+@pytest.fixture
+def low_sodium_rules(tmp_path, monkeypatch):
+    path = tmp_path / "diet_rules.csv"
+    shutil.copy(rules.DEFAULT_RULES_PATH, path)
+    with open(path, "a") as f:
+        f.write("condition,Low sodium,Sodium,<,100\n")
+    monkeypatch.setattr(rules, "_rules", rules.load_rules(str(path)))
+
+
+def test_a_condition_added_to_the_rule_table_is_a_filter(low_sodium_rules):
+    assert health_conditions()[-1] == "Low sodium"
+    key = filter_key(health_condition="low sodium")
+    assert key == ("All", "None", ("Low sodium",), "None")
+
+    catalog = FoodCatalog.from_data(read_csv_columns(DEFAULT_PATH))
+    mask = filter_mask(catalog, "All", key[2], "None")
+    np.testing.assert_array_equal(mask, catalog.columns["Sodium"] < 100)
+    assert 0 < mask.sum() < len(catalog)
+
+    assert len(all_keys()) == 3 * 3 * len(health_conditions()) * len(diet_goals())
+    assert ("All", "None", ("Low sodium",), "Healthy") in all_keys()
+
+
+@pytest.mark.parametrize(
+    "inputs",
+    [
+        {"health_condition": "Low sodium"},
+        {"health_condition": ["Diabetes", "Gout"]},
+        {"diet_goal": "Bulk"},
+        {"diet_type": "Vegan"},
+        {"diet_preference": "Paleo"},
+        {"diet_type": 5},
+    ],
+)
+def test_unknown_names_are_rejected(inputs):
+    with pytest.raises(ValueError, match="Unknown"):
+        filter_key(**inputs)
+
+
+def test_blank_and_none_values_fall_back_to_the_defaults():
+    assert filter_key(None, "", "None", " ") == ("All", "None", (), "None")
+    assert filter_key("veg", " KETO ", "Hypertension; diabetes", "healthy") == (
+        "Veg",
+        "Keto",
+        ("Diabetes", "Hypertension"),
+        "Healthy",
+    )
+
+
+def per_condition_mask(frame, diet_type, conditions, diet_goal):
+    # one filter per condition on the frame, the way the form used to do it
+    table = rules.get_rules()
+    if diet_type != "All":
+        frame = frame[frame["Category"] == diet_type]
+    for rule in [("condition", condition) for condition in conditions] + [("goal", diet_goal)]:
+        for column, op, value in table.get(rule, ()):
+            frame = frame[rules.OPERATORS[op](frame[column], value)]
+    return frame.index.to_numpy()
+
+
+@pytest.mark.parametrize("diet_type", ["All", "Veg", "Non-Veg"])
+@pytest.mark.parametrize("diet_goal", ["None", "Weight Loss", "Healthy"])
+def test_several_conditions_match_one_filter_per_condition(diet_type, diet_goal):
+    catalog = synthetic_catalog(5000, seed=1)
+    frame = catalog.frame
+    conditions = health_conditions()[1:]
+    for count in range(1, len(conditions) + 1):
+        for combination in itertools.combinations(conditions, count):
+            key = filter_key(diet_type, "None", list(combination), diet_goal)
+            mask = filter_mask(catalog, diet_type, key[2], diet_goal)
+            np.testing.assert_array_equal(
+                np.flatnonzero(mask), per_condition_mask(frame, diet_type, key[2], diet_goal)
+            )
@@ -0,0 +1,14 @@
+import statistics
+
+import pytest
+
+from bench_import import BUDGET_MS, ENGINE_MODULES, time_import
+
+
+@pytest.mark.parametrize("module", ENGINE_MODULES)
+def test_engine_modules_import_within_budget_without_gui_or_pandas(module):
+    # each run imports the module in a fresh interpreter
+    runs = [time_import(module) for _ in range(3)]
+    assert [run["forbidden"] for run in runs] == [[], [], []]
+    median_ms = statistics.median(run["seconds"] for run in runs) * 1000
+    assert median_ms <= BUDGET_MS
@@ -0,0 +1,79 @@
+import pytest
+
+from catalog import FoodCatalog
+from catalog_store import read_store
+from importer import import_catalog, map_columns
+
+HEADER = "\t".join(
+    [
+        "Food Name",
+        "Veg/Non-Veg",
+        "Energy (kcal)",
+        "fat",
+        "Protein",
+        "Fiber",
+        "BreakFast",
+        "Lucnch",
+        "Dinner",
+        "Notes",
+    ]
+)
+ROWS = [
+    # name, category, kcal, fat, protein, fibre, breakfast, lunch, dinner, notes
+    "Oats\tvegetarian\t389\t6.9\t16.9\t10.6\tyes\t\t\tplain",
+    "Chicken Curry\tNV\t240\t14\t25\t\tno\ty\tY\t",
+    "oats\tVeg\t1\t1\t1\t1\tyes\t\t\tsame name, other case",
+    "\tVeg\t100\t1\t1\t1\tyes\t\t\tno name",
+    "Fish Fry\tpescatarian\t200\t10\t20\t0\t\ty\t\tunknown category",
+    "Paneer\tVeg\tlots\t20\t18\t0\t\ty\ty\tcalories not a number",
+    # the rejected row above doesn't claim the name
+    "Paneer\tveg\t265\t20\t18\t0\t\ty\ty\t",
+    "Ghee\tVeg\t5000\t100\t0\t0\t\t\t\tcalories out of range",
+    "Water\tVeg\t0\t0\t0\t0\t\t\t\tno meal",
+]
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "external.tsv"
+    path.write_text("\n".join([HEADER] + ROWS) + "\n")
+    return str(path)
+
+
+def test_columns_are_matched_by_alias_and_fuzzily():
+    columns, meal_flags, ignored = map_columns(HEADER.split("\t"))
+    assert columns == {
+        "Food_items": "Food Name",
+        "Category": "Veg/Non-Veg",
+        "Calories": "Energy (kcal)",
+        "Fats": "fat",
+        "Protein": "Protein",
+        "Fibre": "Fiber",
+    }
+    assert meal_flags == {"breakfast": "BreakFast", "lunch": "Lucnch", "dinner": "Dinner"}
+    assert ignored == ["Notes"]
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 100])
+def test_import_rejects_and_deduplicates(source, tmp_path, chunk_rows):
+    output = str(tmp_path / "foods.dietcat")
+    report = import_catalog(source, output, chunk_rows=chunk_rows)
+
+    assert report["rows_read"] == len(ROWS)
+    assert report["rows_written"] == 4
+    assert report["duplicates"] == 1
+    assert report["no_meal_type"] == 1
+    assert {reason: count for reason, count in report["rejected"].items() if count} == {
+        "missing name": 1,
+        "unknown category": 1,
+        "Calories not a number": 1,
+        "Calories out of range": 1,
+    }
+
+    frame = FoodCatalog.from_data(read_store(output)).frame
+    assert frame["Food_items"].tolist() == ["Oats", "Chicken Curry", "Paneer", "Water"]
+    assert frame["Category"].tolist() == ["Veg", "Non-Veg", "Veg", "Veg"]
+    assert frame["Calories"].tolist() == [389, 240, 265, 0]
+    assert frame["Meal Type"].tolist()[:3] == ["Breakfast", "Lunch, Dinner", "Lunch, Dinner"]
+    assert frame["Fibre"].isna().tolist() == [False, True, False, False]
+    assert frame["Sugar"].isna().all()
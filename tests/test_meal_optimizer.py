@@ -0,0 +1,71 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from meal_optimizer import (
+    CALORIE_BUCKET,
+    CALORIE_TOLERANCE,
+    PROTEIN_BUCKET,
+    PROTEIN_SHORTFALL_PENALTY,
+    optimize_meal,
+)
+
+
+def score(chosen, calories, values, target_calories, protein, target_protein):
+    """(within tolerance, -calorie error, value) of a choice, as the DP sees it."""
+    total = sum(int(np.rint(calories[i] / CALORIE_BUCKET)) for i in chosen) * CALORIE_BUCKET
+    error = abs(total - target_calories)
+    value = sum(values[i] for i in chosen)
+    if protein is not None and target_protein > 0:
+        cap = int(np.ceil(target_protein / PROTEIN_BUCKET))
+        buckets = sum(int(np.rint(protein[i] / PROTEIN_BUCKET)) for i in chosen)
+        shortfall = max(target_protein - min(buckets, cap) * PROTEIN_BUCKET, 0)
+        value -= PROTEIN_SHORTFALL_PENALTY * shortfall
+    within = error <= CALORIE_TOLERANCE * target_calories
+    # outside the tolerance only the closest totals count
+    return (within, 0 if within else -error, value)
+
+
+def brute_force(calories, values, target_calories, k, protein=None, target_protein=0):
+    choices = [
+        chosen
+        for count in range(1, k + 1)
+        for chosen in itertools.combinations(range(len(calories)), count)
+        # the DP has no states at or beyond twice the target
+        if sum(np.rint(calories[i] / CALORIE_BUCKET) for i in chosen) * CALORIE_BUCKET
+        < 2 * target_calories + CALORIE_BUCKET
+    ]
+    return max(
+        score(chosen, calories, values, target_calories, protein, target_protein)
+        for chosen in choices
+    )
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_optimize_meal_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 11))
+    k = int(rng.integers(1, 5))
+    target_calories = float(rng.integers(150, 900))
+    calories = rng.uniform(20, target_calories, n)
+    values = rng.uniform(0, 30, n)
+    if seed % 2:
+        protein, target_protein = rng.uniform(0, 25, n), float(rng.integers(5, 40))
+    else:
+        protein, target_protein = None, 0
+
+    chosen = optimize_meal(
+        calories, values, target_calories, k, protein=protein, target_protein=target_protein
+    )
+    assert 1 <= len(chosen) <= k
+    assert len(set(chosen)) == len(chosen)
+    got = score(chosen, calories, values, target_calories, protein, target_protein)
+    expected = brute_force(calories, values, target_calories, k, protein, target_protein)
+    assert got[:2] == expected[:2]
+    assert got[2] == pytest.approx(expected[2])
+
+
+def test_nothing_to_choose_from():
+    assert optimize_meal(np.array([]), np.array([]), 500, 4) == []
+    assert optimize_meal(np.array([100.0]), np.array([1.0]), 500, 0) == []
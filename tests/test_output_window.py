@@ -0,0 +1,78 @@
+import tkinter as tk
+from concurrent.futures import Future
+
+import pandas as pd
+import pytest
+
+import main
+from engine import MEALS
+
+
+@pytest.fixture
+def root():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("Tk can't open a display")
+    root.withdraw()
+    main.root = root
+    yield root
+    main.output_window = None
+    main.meal_item_labels.clear()
+    root.destroy()
+
+
+def plan(n_items, offset=0):
+    return {meal: [f"{meal} {offset + i}" for i in range(n_items)] for meal in MEALS}
+
+
+def widget_count(widget):
+    return sum(1 + widget_count(child) for child in widget.winfo_children())
+
+
+def test_repeated_clicks_reuse_the_output_widgets(root):
+    main.show_output_popup(plan(4))
+    root.update_idletasks()
+    window = main.output_window
+    children = len(window.winfo_children())
+    widgets = widget_count(window)
+    labels = {meal: list(pool) for meal, pool in main.meal_item_labels.items()}
+
+    for click in range(50):
+        # plans with fewer items hide labels instead of destroying them
+        main.show_output_popup(plan(click % 5, offset=click))
+        root.update_idletasks()
+
+    assert main.output_window is window
+    assert len(window.winfo_children()) == children
+    assert widget_count(window) == widgets
+    assert main.meal_item_labels == labels
+    assert [label.cget("text") for label in labels["lunch"][:3]] == [
+        "Lunch 49",
+        "Lunch 50",
+        "Lunch 51",
+    ]
+
+
+@pytest.mark.parametrize(
+    "error, title, message",
+    [
+        (FileNotFoundError("food_data.csv"), "File Error", "Error reading food_data.csv"),
+        (pd.errors.ParserError("bad line 3"), "File Error", "Error reading food_data.csv"),
+        (ValueError("Unknown health condition 'Gout'"), "Recommendation Error", "ValueError: "),
+        (KeyError("Protein"), "Recommendation Error", "KeyError: 'Protein'"),
+    ],
+)
+def test_a_failed_recommendation_shows_what_went_wrong(monkeypatch, error, title, message):
+    shown = []
+    monkeypatch.setattr(main.messagebox, "showerror", lambda *args: shown.append(args))
+    future = Future()
+    future.set_exception(error)
+    monkeypatch.setattr(main, "pending_request", (1, future, {}, 0.0))
+
+    main.poll_recommendation(1, future)
+    [(shown_title, shown_message)] = shown
+    assert shown_title == title
+    assert shown_message.startswith(message)
+    assert str(error) in shown_message
+    assert main.pending_request is None
@@ -0,0 +1,57 @@
+from catalog import DEFAULT_PATH, FoodCatalog, read_csv_columns
+from engine import plan_cache, recommend
+from plan_cache import PlanCache
+
+
+def test_a_new_fingerprint_misses_and_empties_the_cache():
+    cache = PlanCache()
+    cache.put("veg", "v1", {"breakfast": ["Oats"]})
+    assert cache.get("veg", "v1") == {"breakfast": ["Oats"]}
+
+    assert cache.get("veg", "v2") is None
+    # going back doesn't bring the old entries back either
+    assert cache.get("veg", "v1") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 0, "maxsize": 1024}
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = PlanCache(maxsize=2)
+    cache.put("a", "v1", 1)
+    cache.put("b", "v1", 2)
+    assert cache.get("a", "v1") == 1
+    cache.put("c", "v1", 3)
+    assert cache.get("b", "v1") is None
+    assert cache.get("a", "v1") == 1
+    assert cache.get("c", "v1") == 3
+
+
+def test_expired_entries_miss():
+    cache = PlanCache(ttl=0)
+    cache.put("a", "v1", 1)
+    assert cache.get("a", "v1") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_recommend_rebuilds_the_plan_after_a_catalog_edit():
+    catalog = FoodCatalog.from_data(read_csv_columns(DEFAULT_PATH))
+    profile = {"diet_type": "Veg", "diet_preference": "High-Protein", "diet_goal": "Healthy"}
+    plan_cache.clear()
+    first = recommend(catalog=catalog, **profile)
+    assert recommend(catalog=catalog, **profile) == first
+    assert plan_cache.stats()["hits"] == 1
+
+    # a food with more protein than any other tops every meal once added
+    best = {
+        "Food_items": "Test Protein Bar",
+        "Category": "Veg",
+        "Meal Type": "Breakfast, Lunch, Snack, Dinner",
+        "Calories": 150,
+        "Protein": 1000,
+    }
+    catalog.upsert([best])
+    plan = recommend(catalog=catalog, **profile)
+    assert plan_cache.stats()["misses"] == 2
+    assert plan == recommend(catalog=catalog, use_cache=False, **profile)
+    assert all(items[0] == "Test Protein Bar" for items in plan.values())
+    assert plan != first
+    plan_cache.clear()
@@ -0,0 +1,60 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from catalog import DEFAULT_PATH, FoodCatalog, get_catalog, read_csv_columns
+from engine import DIET_PREFERENCES, DIET_TYPES, build_plan, diet_goals, health_conditions
+from plan_table import PrecomputedPlans, all_keys, build_table
+from synthetic import synthetic_catalog
+
+
+def test_all_keys_cover_every_input_combination():
+    keys = all_keys()
+    assert len(keys) == len(set(keys)) == 180
+    assert set(keys) == {
+        (diet_type, preference, () if condition == "None" else (condition,), goal)
+        for diet_type, preference, condition, goal in itertools.product(
+            DIET_TYPES, DIET_PREFERENCES, health_conditions(), diet_goals()
+        )
+    }
+
+
+def test_every_plan_in_the_table_matches_build_plan():
+    catalog = synthetic_catalog(3000, seed=2)
+    table = build_table(catalog)
+    assert len(table) == 180
+    assert table.fingerprint == catalog.fingerprint
+    for key in all_keys():
+        assert table.plan(key) == build_plan(catalog, key), key
+    assert table.plan(("All", "None", ("Diabetes", "Gout"), "None")) is None
+
+
+def test_a_table_built_in_worker_processes_is_the_same():
+    catalog = get_catalog(DEFAULT_PATH)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        table = build_table(catalog, executor=executor, chunks=3)
+    local = build_table(catalog)
+    assert table.index == local.index
+    assert all(table.plan(key) == local.plan(key) for key in all_keys())
+
+
+def test_precomputed_plans_follow_catalog_edits():
+    catalog = FoodCatalog.from_data(read_csv_columns(DEFAULT_PATH))
+    plans = PrecomputedPlans(verify_sample=None)
+    key = ("Veg", "High-Protein", (), "Healthy")
+    assert plans.get(key, catalog) is None
+    plans.start(catalog).join()
+    assert plans.get(key, catalog) == build_plan(catalog, key)
+
+    bar = {
+        "Food_items": "Test Protein Bar",
+        "Category": "Veg",
+        "Calories": 150,
+        "Protein": 1000,
+        "Meal Type": "Breakfast",
+    }
+    catalog.upsert([bar])
+    # answers None until the table of the new version is built
+    assert plans.get(key, catalog) is None
+    plans.rebuild(catalog)
+    assert plans.get(key, catalog)["breakfast"][0] == "Test Protein Bar"
+    assert plans.stats()["builds"] == 2
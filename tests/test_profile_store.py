@@ -0,0 +1,96 @@
+import pytest
+
+from profile_store import BatchedWriter, ProfileStore
+
+ALICE = {
+    "user_id": "alice",
+    "age": 30,
+    "height": 165.0,
+    "weight": 60.0,
+    "bmi": 22.04,
+    "diet_type": "Veg",
+    "diet_preference": "High-Protein",
+    "health_condition": ["Diabetes", "Hypertension"],
+    "diet_goal": "Healthy",
+}
+PLAN = {"breakfast": ["Oats", "Milk"], "lunch": ["Dal"], "snack": [], "dinner": ["Paneer"]}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "profiles.db")
+
+
+def test_profiles_and_plans_round_trip(db_path):
+    store = ProfileStore(db_path)
+    assert store.save([(ALICE, PLAN)]) == 1
+    # fields left out keep their stored value
+    store.upsert_profiles([{"user_id": "alice", "weight": 58.5}])
+    store.add_plans([("alice", {"breakfast": ["Poha"]}), ("nobody", PLAN)])
+
+    profile = store.get_profile("alice")
+    assert profile["weight"] == 58.5
+    assert profile["health_condition"] == "Diabetes; Hypertension"
+    assert {field: profile[field] for field in ("age", "diet_type", "diet_goal")} == {
+        "age": 30,
+        "diet_type": "Veg",
+        "diet_goal": "Healthy",
+    }
+    assert [plan for _, plan in store.plan_history("alice")] == [{"breakfast": ["Poha"]}, PLAN]
+    assert store.counts() == {"users": 1, "plans": 2}
+    assert store.get_profile("nobody") is None
+    store.close()
+
+
+def test_batched_writer_commits_everything_on_close(db_path):
+    writer = BatchedWriter(db_path, max_batch=7, flush_interval=0.01)
+    for i in range(50):
+        writer.save({**ALICE, "user_id": f"user {i % 10}", "age": 20 + i}, PLAN)
+    writer.close()
+    assert writer.counts["saved"] == 50
+    assert writer.counts["errors"] == 0
+    assert writer.counts["batches"] >= 50 // 7
+
+    store = ProfileStore(db_path)
+    assert store.counts() == {"users": 10, "plans": 50}
+    assert store.get_profile("user 3")["age"] == 20 + 43
+    assert len(store.plan_history("user 3", limit=100)) == 5
+    store.close()
+
+
+def test_a_bad_profile_is_rejected_when_queued(db_path):
+    writer = BatchedWriter(db_path)
+    with pytest.raises(ValueError):
+        writer.save({**ALICE, "age": "thirty"}, PLAN)
+    with pytest.raises(ValueError):
+        writer.save({"age": 30}, PLAN)
+    writer.save(ALICE, PLAN)
+    writer.close()
+    assert writer.counts == {"saved": 1, "batches": 1, "errors": 0}
+
+
+def test_an_entry_that_fails_to_write_costs_only_itself(db_path):
+    writer = BatchedWriter(db_path, flush_interval=0.5)
+    writer.save({**ALICE, "user_id": "first"}, PLAN)
+    writer.save({**ALICE, "user_id": "broken"}, {"breakfast": {"not", "json"}})
+    writer.save({**ALICE, "user_id": "last"}, PLAN)
+    writer.close()
+    assert writer.counts["saved"] == 2
+    assert writer.counts["errors"] == 1
+
+    store = ProfileStore(db_path)
+    assert store.counts() == {"users": 2, "plans": 2}
+    store.close()
+
+
+def test_the_plan_is_saved_as_it_was_when_queued(db_path):
+    writer = BatchedWriter(db_path, flush_interval=0.5)
+    plan = {meal: list(items) for meal, items in PLAN.items()}
+    writer.save(ALICE, plan)
+    # the GUI swaps items of the plan on screen for substitutes
+    plan["breakfast"][0] = "Substitute"
+    writer.close()
+
+    store = ProfileStore(db_path)
+    assert store.plan_history("alice")[0][1] == PLAN
+    store.close()
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ranking import PREFERENCE_KEYS, sort_keys, top_k
+
+
+def full_sort(frame, rows, diet_preference, k):
+    # the full, stable sort top_k() stands in for
+    columns = [column for column, _ in PREFERENCE_KEYS[diet_preference]]
+    ascending = [not descending for _, descending in PREFERENCE_KEYS[diet_preference]]
+    ordered = frame.iloc[rows].sort_values(
+        columns, ascending=ascending, kind="stable", na_position="last"
+    )
+    return ordered.index.to_numpy()[:k]
+
+
+@pytest.mark.parametrize("diet_preference", ["High-Protein", "Keto"])
+@pytest.mark.parametrize("k", [1, 4, 50])
+@pytest.mark.parametrize("seed", range(5))
+def test_top_k_matches_a_full_sort(diet_preference, k, seed):
+    rng = np.random.default_rng(seed)
+    size = 2000
+    # few distinct values, so there are plenty of ties on every key
+    frame = pd.DataFrame(
+        {
+            column: rng.integers(0, 6, size).astype(np.float64)
+            for column in ("Protein", "Fats", "Carbohydrates")
+        }
+    )
+    for column in frame:
+        frame.loc[rng.random(size) < 0.1, column] = np.nan
+    columns = {column: frame[column].to_numpy() for column in frame}
+    rows = np.sort(rng.choice(size, size // 2, replace=False))
+
+    best = top_k(rows, sort_keys(columns, rows, diet_preference), k)
+    np.testing.assert_array_equal(best, full_sort(frame, rows, diet_preference, k))
+
+
+def test_top_k_with_fewer_rows_than_k():
+    columns = {"Protein": np.array([1.0, np.nan, 3.0])}
+    rows = np.arange(3)
+    assert top_k(rows, sort_keys(columns, rows, "High-Protein"), 4).tolist() == [2, 0, 1]
+
+
+def test_no_preference_keeps_the_catalog_order():
+    rows = np.array([3, 5, 8, 9, 12])
+    assert sort_keys({}, rows, "None") == []
+    assert top_k(rows, [], 4).tolist() == [3, 5, 8, 9]
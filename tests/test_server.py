@@ -0,0 +1,64 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from server import BadRequest, RecommendationServer, profile_key
+
+
+@pytest.fixture
+def server():
+    pool = ThreadPoolExecutor(max_workers=2)
+    yield RecommendationServer(pool, batch_window=0.001)
+    pool.shutdown()
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"diet_type": 5},
+        {"diet_type": ["Veg"]},
+        {"diet_preference": {"name": "Keto"}},
+        {"diet_goal": 1},
+        {"health_condition": [1, 2]},
+        {"health_condition": "Gout"},
+        {"diet_type": "Vegan"},
+        {"age": 200},
+    ],
+)
+def test_bad_bodies_are_rejected(body):
+    with pytest.raises(BadRequest):
+        profile_key(body)
+
+
+def test_missing_and_null_fields_get_the_defaults():
+    assert profile_key({}) == ("All", "None", (), "None")
+    assert profile_key({"diet_type": None, "diet_goal": None}) == ("All", "None", (), "None")
+
+
+def test_handlers_do_not_refresh_the_catalog_on_the_event_loop(server, monkeypatch):
+    refreshed_on = []
+
+    def refresh():
+        refreshed_on.append(threading.current_thread())
+        return server.catalog
+
+    monkeypatch.setattr(server.catalog, "refresh", refresh)
+
+    async def requests():
+        refresher = asyncio.ensure_future(server.refresh_catalog(interval=0.01))
+        body = json.dumps({"diet_type": "Veg", "diet_goal": "Healthy"}).encode()
+        answers = [await server.route("POST", "/recommend", body) for _ in range(3)]
+        answers.append(await server.route("GET", "/health", b""))
+        await asyncio.sleep(0.05)
+        refresher.cancel()
+        return answers
+
+    answers = asyncio.run(requests())
+    assert [status for status, _ in answers] == [200] * 4
+    assert answers[-1][1]["catalog_rows"] == len(server.catalog)
+    # the background refresh ran, but never on the loop's own thread
+    assert refreshed_on
+    assert threading.main_thread() not in refreshed_on
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from validation import (
+    ERROR_AGE_INVALID,
+    ERROR_AGE_MISSING,
+    ERROR_AGE_RANGE,
+    ERROR_HEIGHT_INVALID,
+    ERROR_HEIGHT_MISSING,
+    ERROR_HEIGHT_RANGE,
+    ERROR_MESSAGES,
+    ERROR_WEIGHT_INVALID,
+    ERROR_WEIGHT_MISSING,
+    ERROR_WEIGHT_RANGE,
+    error_counts,
+    evaluate,
+    first_error,
+    parse_numbers,
+    validate,
+)
+
+
+def test_parse_numbers_tells_missing_from_invalid():
+    values = np.array(
+        [" 12 ", "1e3", "abc", "", None, np.nan, "None", "nan", " 7.5\t", 5], dtype=object
+    )
+    numbers, missing, invalid = parse_numbers(values)
+    np.testing.assert_array_equal(
+        numbers, [12, 1000, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, 7.5, 5]
+    )
+    assert missing.tolist() == [False, False, False, True, True, True, True, True, False, False]
+    assert invalid.tolist() == [False, False, True] + [False] * 7
+
+
+@pytest.mark.parametrize(
+    "age, height, weight, code",
+    [
+        (30, 175, 70, 0),
+        (5, 60, 30, 0),
+        (80, 300, 500, 0),
+        ("", 175, 70, ERROR_AGE_MISSING),
+        ("thirty", 175, 70, ERROR_AGE_INVALID),
+        (30.5, 175, 70, ERROR_AGE_INVALID),
+        (4, 175, 70, ERROR_AGE_RANGE),
+        (81, 175, 70, ERROR_AGE_RANGE),
+        (30, None, 70, ERROR_HEIGHT_MISSING),
+        (30, "1,75", 70, ERROR_HEIGHT_INVALID),
+        (30, 59.9, 70, ERROR_HEIGHT_RANGE),
+        (30, 175, "nan", ERROR_WEIGHT_MISSING),
+        (30, 175, "70kg", ERROR_WEIGHT_INVALID),
+        (30, 175, 501, ERROR_WEIGHT_RANGE),
+        ("", "abc", 1000, ERROR_AGE_MISSING | ERROR_HEIGHT_INVALID | ERROR_WEIGHT_RANGE),
+        (20.5, 10, "", ERROR_AGE_INVALID | ERROR_HEIGHT_RANGE | ERROR_WEIGHT_MISSING),
+    ],
+)
+def test_error_codes(age, height, weight, code):
+    as_text = [
+        np.array([None if value is None else str(value)], dtype=object)
+        for value in (age, height, weight)
+    ]
+    assert validate(*as_text)[3].tolist() == [code]
+    if all(isinstance(value, (int, float)) for value in (age, height, weight)):
+        assert validate([age], [height], [weight])[3].tolist() == [code]
+
+
+def test_text_and_numeric_columns_give_the_same_result():
+    rng = np.random.default_rng(0)
+    age = rng.integers(0, 100, 1000).astype(np.float64)
+    age[::7] += 0.5
+    height = rng.uniform(40, 320, 1000)
+    weight = rng.uniform(20, 520, 1000)
+    weight[::11] = np.nan
+
+    numeric = evaluate(age, height, weight)
+    text = evaluate(
+        *(
+            np.array([f" {value!r} " for value in column.tolist()], dtype=object)
+            for column in (age, height, weight)
+        )
+    )
+    np.testing.assert_array_equal(text["codes"], numeric["codes"])
+    np.testing.assert_allclose(text["bmr"], numeric["bmr"], rtol=1e-12)
+    assert np.isnan(numeric["bmi"][numeric["codes"] != 0]).all()
+    assert not np.isnan(numeric["bmi"][numeric["codes"] == 0]).any()
+    assert error_counts(numeric["codes"])["weight_missing"] == len(weight[::11])
+
+
+def test_first_error_reports_the_most_important_problem():
+    code = (
+        ERROR_WEIGHT_RANGE
+        | ERROR_HEIGHT_RANGE
+        | ERROR_AGE_RANGE
+        | ERROR_HEIGHT_INVALID
+        | ERROR_WEIGHT_MISSING
+    )
+    errors = []
+    # fix one problem at a time, the way the GUI user would
+    for fixed in (
+        ERROR_WEIGHT_MISSING,
+        ERROR_HEIGHT_INVALID,
+        ERROR_AGE_RANGE,
+        ERROR_HEIGHT_RANGE,
+        ERROR_WEIGHT_RANGE,
+    ):
+        errors.append(first_error(code))
+        code &= ~fixed
+    assert errors == [(title, message) for _, title, message in ERROR_MESSAGES]
+    assert first_error(code) is None
+    assert first_error(ERROR_WEIGHT_INVALID | ERROR_AGE_RANGE)[1] == ERROR_MESSAGES[1][2]
@@ -0,0 +1,252 @@
+"""
+Range checks, BMI and BMR for whole columns of user profiles at once.
+
+    python validation.py user_data.csv [-o checked.csv] [--chunk-rows 1000000]
+
+prints how many rows have each error; with -o the rows are written out
+again with Computed BMI, BMR and Error Code columns.
+
+Every row gets an error code instead of a warning dialog: the bitwise OR of
+the ERROR_* flags below, 0 for a valid profile. A row with several problems
+carries all of them, so `codes & ERROR_WEIGHT_RANGE` picks out the rows
+with an implausible weight whatever else is wrong. BMI and BMR are NaN for
+rows with an error.
+
+The GUI checks its single profile with the same validate() and shows the
+message of the first error (see first_error()).
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from meal_optimizer import bmr
+
+
+AGE_RANGE = (5, 80)
+HEIGHT_RANGE = (60, 300)  # cm
+WEIGHT_RANGE = (30, 500)  # kg
+
+ERROR_AGE_MISSING = 1 << 0
+ERROR_AGE_INVALID = 1 << 1  # not a whole number
+ERROR_AGE_RANGE = 1 << 2
+ERROR_HEIGHT_MISSING = 1 << 3
+ERROR_HEIGHT_INVALID = 1 << 4
+ERROR_HEIGHT_RANGE = 1 << 5
+ERROR_WEIGHT_MISSING = 1 << 6
+ERROR_WEIGHT_INVALID = 1 << 7
+ERROR_WEIGHT_RANGE = 1 << 8
+
+ERROR_MISSING = ERROR_AGE_MISSING | ERROR_HEIGHT_MISSING | ERROR_WEIGHT_MISSING
+ERROR_INVALID = ERROR_AGE_INVALID | ERROR_HEIGHT_INVALID | ERROR_WEIGHT_INVALID
+
+# (flags, dialog title, message), in the order the GUI reports them
+ERROR_MESSAGES = [
+    (ERROR_MISSING, "Input Error", "Please fill in all the required fields!"),
+    (ERROR_INVALID, "Input Error", "Invalid numerical values entered!"),
+    (ERROR_AGE_RANGE, "Age Value Error", "Please provide age between 5 and 80"),
+    (
+        ERROR_HEIGHT_RANGE,
+        "Height Value Error",
+        "Please provide height ( in cm ) between 60 and 300",
+    ),
+    (
+        ERROR_WEIGHT_RANGE,
+        "Weight Value Error",
+        "Please provide weight ( in kg ) between 30 and 500",
+    ),
+]
+
+ERROR_NAMES = {
+    ERROR_AGE_MISSING: "age_missing",
+    ERROR_AGE_INVALID: "age_invalid",
+    ERROR_AGE_RANGE: "age_range",
+    ERROR_HEIGHT_MISSING: "height_missing",
+    ERROR_HEIGHT_INVALID: "height_invalid",
+    ERROR_HEIGHT_RANGE: "height_range",
+    ERROR_WEIGHT_MISSING: "weight_missing",
+    ERROR_WEIGHT_INVALID: "weight_invalid",
+    ERROR_WEIGHT_RANGE: "weight_range",
+}
+
+# user_data.csv columns
+AGE_COLUMN = "Age"
+HEIGHT_COLUMN = "Height (cm)"
+WEIGHT_COLUMN = "Weight (kg)"
+
+
+def parse_numbers(values):
+    """
+    Parse a column into float64.
+    :param values: Numbers, or strings as read from a file (None/NaN/blank
+        for missing values).
+    :return: (numbers, missing, invalid); numbers are NaN wherever the value
+        is missing or isn't a number.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in "iuf":
+        numbers = values.astype(np.float64)
+        missing = np.isnan(numbers)
+        return numbers, missing, np.zeros(len(numbers), dtype=bool)
+    try:
+        # a column of well-formed numbers, only padding allowed
+        numbers = values.astype(np.float64)
+    except (TypeError, ValueError):
+        import pandas as pd
+
+        # some values aren't numbers: pandas turns them into NaN without a
+        # Python call per value (its parser, the one read_csv uses, can be
+        # off by one in the last bit of a double)
+        numbers = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(
+            dtype=np.float64
+        )
+    # only the NaN values need a closer look: missing, or not a number
+    unparsed = np.flatnonzero(np.isnan(numbers))
+    missing = np.zeros(len(numbers), dtype=bool)
+    if len(unparsed):
+        # None and NaN in an object column come out as "None" and "nan"
+        text = np.char.strip(values[unparsed].astype(str))
+        missing[unparsed] = (text == "") | (text == "None") | (text == "nan")
+    return numbers, missing, np.isnan(numbers) & ~missing
+
+
+def _check(values, valid_range, missing_flag, invalid_flag, range_flag, whole=False):
+    numbers, missing, invalid = parse_numbers(values)
+    if whole:
+        invalid |= ~missing & ~invalid & (np.floor(numbers) != numbers)
+    low, high = valid_range
+    # NaN compares False both ways, so only parsed numbers can be out of range
+    out_of_range = (numbers < low) | (numbers > high)
+    codes = missing * np.uint16(missing_flag)
+    codes |= invalid * np.uint16(invalid_flag)
+    codes |= out_of_range * np.uint16(range_flag)
+    return numbers, codes
+
+
+def validate(age, height, weight):
+    """
+    Check whole columns of ages, heights (cm) and weights (kg).
+    :return: (age, height, weight, codes); the columns as float64 arrays and
+        the uint16 error code of each row.
+    """
+    age, codes = _check(
+        age, AGE_RANGE, ERROR_AGE_MISSING, ERROR_AGE_INVALID, ERROR_AGE_RANGE, whole=True
+    )
+    height, height_codes = _check(
+        height, HEIGHT_RANGE, ERROR_HEIGHT_MISSING, ERROR_HEIGHT_INVALID, ERROR_HEIGHT_RANGE
+    )
+    weight, weight_codes = _check(
+        weight, WEIGHT_RANGE, ERROR_WEIGHT_MISSING, ERROR_WEIGHT_INVALID, ERROR_WEIGHT_RANGE
+    )
+    codes |= height_codes
+    codes |= weight_codes
+    return age, height, weight, codes
+
+
+def bmi(height, weight):
+    """Body mass index, height in cm and weight in kg (scalars or arrays)."""
+    meters = np.asarray(height, dtype=np.float64) / 100
+    return np.asarray(weight, dtype=np.float64) / (meters * meters)
+
+
+def evaluate(age, height, weight):
+    """
+    Validate the columns and compute BMI and BMR (kcal/day) of the valid rows.
+    :return: Dict of float64 arrays "age", "height", "weight", "bmi", "bmr"
+        and the uint16 "codes"; bmi and bmr are NaN where codes != 0.
+    """
+    age, height, weight, codes = validate(age, height, weight)
+    valid = codes == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        body_mass = np.where(valid, bmi(height, weight), np.nan)
+        metabolic_rate = np.where(valid, bmr(age, height, weight), np.nan)
+    return {
+        "age": age,
+        "height": height,
+        "weight": weight,
+        "bmi": body_mass,
+        "bmr": metabolic_rate,
+        "codes": codes,
+    }
+
+
+def first_error(code):
+    """(title, message) for the most important error in `code`, or None."""
+    for flags, title, message in ERROR_MESSAGES:
+        if code & flags:
+            return title, message
+    return None
+
+
+def error_counts(codes):
+    """Rows per error flag, for the flags that occur."""
+    counts = {}
+    for flag, name in ERROR_NAMES.items():
+        count = int(np.count_nonzero(codes & flag))
+        if count:
+            counts[name] = count
+    return counts
+
+
+def evaluate_file(path, chunk_rows=1_000_000):
+    """
+    Evaluate a user_data.csv style file chunk by chunk.
+    :return: Iterator of (frame, result) pairs, `result` as evaluate() returns
+        it for the rows of `frame`.
+    """
+    import pandas as pd
+
+    # numeric columns are parsed by pandas, a column holding text falls back
+    # to parse_numbers() in evaluate(). Only blanks are missing values, so a
+    # "None" health condition is written back as it was read.
+    reader = pd.read_csv(
+        path,
+        chunksize=chunk_rows,
+        skipinitialspace=True,
+        keep_default_na=False,
+        na_values=[""],
+    )
+    for frame in reader:
+        yield frame, evaluate(
+            frame[AGE_COLUMN].to_numpy(),
+            frame[HEIGHT_COLUMN].to_numpy(),
+            frame[WEIGHT_COLUMN].to_numpy(),
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate profiles and compute BMI/BMR")
+    parser.add_argument("users", help="user_data.csv style input file")
+    parser.add_argument("-o", "--output", help="csv with BMI, BMR and Error Code columns added")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rows = invalid = 0
+    errors = {}
+    header = True
+    for frame, result in evaluate_file(args.users, args.chunk_rows):
+        rows += len(frame)
+        invalid += int(np.count_nonzero(result["codes"]))
+        for name, count in error_counts(result["codes"]).items():
+            errors[name] = errors.get(name, 0) + count
+        if args.output:
+            # the file's own BMI column is left as it is
+            frame["Computed BMI"] = result["bmi"].round(2)
+            frame["BMR"] = result["bmr"].round(1)
+            frame["Error Code"] = result["codes"]
+            frame.to_csv(args.output, mode="w" if header else "a", header=header, index=False)
+            header = False
+    elapsed = time.perf_counter() - start
+    print(
+        f"{rows} rows, {invalid} with errors, in {elapsed:.2f} s "
+        f"({rows / elapsed if elapsed else 0:,.0f} rows/s)",
+        file=sys.stderr,
+    )
+    for name, count in errors.items():
+        print(f"  {name:<16} {count}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Multi-day meal plans without repeated items.
+
+    python weekly_planner.py [--days 7] [--diet-type Veg] [--diet-goal Healthy] ...
+
+Each meal gets a ranked candidate list once, under the same diet type,
+health condition and goal filters as engine.recommend(). Days are then
+filled one after another from the least used candidates, best ranked first,
+so no food shows up twice in the week while enough distinct foods pass the
+filters (and none twice on the same day). With calorie targets, the meal
+optimizer picks among the least used candidates instead.
+
+Re-planning one day or swapping one item only releases and re-picks those
+items; the rest of the week stays as it is.
+"""
+import argparse
+from collections import Counter
+
+import numpy as np
+
+from catalog import MEAL_BITS, get_catalog
+from engine import ITEMS_PER_MEAL, MEALS, filter_key, filter_mask
+from meal_optimizer import (
+    CANDIDATES_PER_MEAL,
+    MEAL_SHARES,
+    daily_targets,
+    item_values,
+    optimize_meal,
+)
+from ranking import sort_keys, top_k
+
+
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+# ranked candidates kept per meal, as a multiple of the items a week needs
+CANDIDATE_DEPTH = 2
+
+
+class WeeklyPlanner:
+    """
+    Plan for `days` days, built on creation. Use plan() to read it, and
+    replan_day() / swap_item() to change parts of it.
+    :param key: Normalized filter key, see engine.filter_key().
+    :param targets: Optional daily_targets() dict, see engine.recommend().
+    """
+
+    def __init__(self, catalog, key, days=7, targets=None, k=ITEMS_PER_MEAL):
+        # one catalog version for the whole plan, edits publish a new one
+        self.catalog = catalog = catalog.snapshot()
+        self.key = key
+        self.targets = targets
+        self.k = k
+        self.uses = Counter()  # catalog row -> days it is planned on
+
+        diet_type, diet_preference, health_conditions, diet_goal = key
+        rows = np.flatnonzero(
+            filter_mask(catalog, diet_type, health_conditions, diet_goal)
+        )
+        # the preference only orders the foods once a goal is picked
+        if diet_goal == "None":
+            diet_preference = "None"
+        self.diet_preference = diet_preference
+
+        depth = max(days * k * CANDIDATE_DEPTH, CANDIDATES_PER_MEAL)
+        meal_bits = catalog.meal_bits[rows]
+        self.candidates = {}
+        for meal in MEALS:
+            in_meal = rows[(meal_bits & MEAL_BITS[meal]) != 0]
+            self.candidates[meal] = top_k(
+                in_meal, sort_keys(catalog.columns, in_meal, diet_preference), depth
+            )
+
+        self.days = []
+        for day in range(days):
+            self.days.append({})
+            for meal in MEALS:
+                self._fill(day, meal)
+
+    def _least_used(self, day, meal, exclude=()):
+        """Candidates for `meal` not on `day` yet, least used first."""
+        candidates = self.candidates[meal]
+        taken = set(exclude)
+        for rows in self.days[day].values():
+            taken.update(rows.tolist())
+        available = np.array([row not in taken for row in candidates.tolist()], dtype=bool)
+        candidates = candidates[available]
+        uses = np.array([self.uses[row] for row in candidates.tolist()], dtype=np.int64)
+        # stable, so equally used candidates keep their ranking order
+        return candidates[np.argsort(uses, kind="stable")], np.sort(uses)
+
+    def _pick(self, day, meal, exclude=(), targets=None):
+        candidates, uses = self._least_used(day, meal, exclude)
+        if len(candidates) == 0:
+            return candidates
+        # only the least used level(s) holding at least k candidates compete
+        level = uses[min(self.k, len(uses)) - 1]
+        pool = candidates[uses <= level]
+        targets = targets if targets is not None else self.targets
+        if targets is None:
+            return pool[: self.k]
+        pool = pool[:CANDIDATES_PER_MEAL]
+        return pool[
+            optimize_meal(
+                self.catalog.columns["Calories"][pool],
+                item_values(self.catalog.columns, pool, self.diet_preference),
+                targets["calories"] * MEAL_SHARES[meal],
+                self.k,
+                protein=self.catalog.columns["Protein"][pool],
+                target_protein=targets["protein"] * MEAL_SHARES[meal],
+            )
+        ]
+
+    def _fill(self, day, meal, exclude=(), targets=None):
+        rows = self._pick(day, meal, exclude, targets)
+        self.days[day][meal] = rows
+        self.uses.update(rows.tolist())
+
+    def _release(self, day, meal):
+        self.uses.subtract(self.days[day][meal].tolist())
+
+    def replan_day(self, day, targets=None, exclude=()):
+        """
+        Pick a day's meals again, the other days stay as they are.
+        :param targets: daily_targets() dict for this day only.
+        :param exclude: Food names this day must not use.
+        """
+        rows = [self.catalog.row_of(name) for name in exclude]
+        exclude = [row for row in rows if row is not None]
+        for meal in MEALS:
+            self._release(day, meal)
+            self.days[day][meal] = np.array([], dtype=np.int64)
+        for meal in MEALS:
+            self._fill(day, meal, exclude, targets)
+        return self.day_plan(day)
+
+    def swap_item(self, day, meal, index):
+        """
+        Replace one item with the least used, best ranked alternative.
+        :return: The new food name, or None when there is no alternative.
+        """
+        rows = self.days[day][meal]
+        old = int(rows[index])
+        candidates, _ = self._least_used(day, meal, exclude=[old])
+        if len(candidates) == 0:
+            return None
+        new = int(candidates[0])
+        rows = rows.copy()
+        rows[index] = new
+        self.days[day][meal] = rows
+        self.uses[old] -= 1
+        self.uses[new] += 1
+        return str(self.catalog.names[new])
+
+    def day_plan(self, day):
+        return {meal: self.catalog.names[rows].tolist() for meal, rows in self.days[day].items()}
+
+    def plan(self):
+        """List with one meal -> food names dict per day."""
+        return [self.day_plan(day) for day in range(len(self.days))]
+
+    def repeats(self):
+        """Number of planned items that also appear on another day."""
+        return sum(count - 1 for count in self.uses.values() if count > 1)
+
+
+def weekly_plan(
+    days=7,
+    age=None,
+    height=None,
+    weight=None,
+    diet_type="All",
+    diet_preference="None",
+    health_condition="None",
+    diet_goal="None",
+    catalog=None,
+    optimize=False,
+):
+    """
+    WeeklyPlanner for one user profile, with the same arguments as
+    engine.recommend(). Call .plan() on it for the meal names.
+    """
+    if catalog is None:
+        catalog = get_catalog()
+    key = filter_key(diet_type, diet_preference, health_condition, diet_goal)
+    targets = None
+    if optimize and None not in (age, height, weight):
+        targets = daily_targets(age, height, weight, key[3])
+    return WeeklyPlanner(catalog, key, days, targets)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print a multi-day meal plan")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--diet-type", default="All")
+    parser.add_argument("--diet-preference", default="None")
+    parser.add_argument("--health-condition", default="None")
+    parser.add_argument("--diet-goal", default="None")
+    args = parser.parse_args(argv)
+
+    planner = weekly_plan(
+        args.days,
+        diet_type=args.diet_type,
+        diet_preference=args.diet_preference,
+        health_condition=args.health_condition,
+        diet_goal=args.diet_goal,
+    )
+    for day, meal_plan in enumerate(planner.plan()):
+        print(DAYS[day % len(DAYS)])
+        for meal, items in meal_plan.items():
+            print(f"  {meal.capitalize():<10} {', '.join(items)}")
+    print(f"{planner.repeats()} repeated items")
+
+
+if __name__ == "__main__":
+    main()